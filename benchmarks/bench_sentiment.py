@@ -0,0 +1,168 @@
+"""
+Microbenchmark CPU cho pipeline sentiment (server/modules/ai/service.py).
+
+Đo riêng từng stage trên đúng input của stage đó (đã tính sẵn từ stage trước),
+và end-to-end qua classify_news:
+
+    preprocess  text_preprocessing (title + description)
+    tokenize    tokenizer.texts_to_sequences
+    pad         pad_sequences(maxlen=MAX_LEN)
+    predict     model.predict
+    normalize   normalize_predictions (chuẩn hoá pos/neg/neu)
+    build       build_classification_output (dựng ClassificationNewOutput)
+    end_to_end  classify_news
+
+Corpus cố định (benchmarks.corpus, seed cố định): headline (chỉ title),
+standard (title + description), long (thêm ~200 từ article vào description).
+
+    MODEL_DIR=... MODEL_VERSION=... python -m benchmarks.bench_sentiment \\
+        --batch-sizes 1,8,64,512 --repeats 30 --output bench_output.json
+
+Mỗi (corpus, stage, batch) một dòng JSON: latency theo batch (p50/p95/p99 ms),
+throughput (item/s), peak_py_kb (tracemalloc, chạy riêng ngoài phần đo thời gian)
+và max_rss_kb của process sau stage.
+"""
+import argparse
+import gc
+import json
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+from tensorflow.keras.preprocessing.sequence import pad_sequences
+
+from benchmarks.corpus import DEFAULT_SEED, make_news_row
+from benchmarks.stats import percentile
+from server.modules.ai.schemas import NewsInput
+from server.modules.ai.service import (
+    MAX_LEN,
+    _get_model_and_tokenizer,
+    model_registry,
+    build_classification_output,
+    classification_input_text,
+    classify_news,
+    normalize_predictions,
+)
+
+CORPORA = ("headline", "standard", "long")
+STAGES = ("preprocess", "tokenize", "pad", "predict", "normalize", "build", "end_to_end")
+
+
+def make_corpus(name: str, size: int, seed: int = DEFAULT_SEED):
+    items = []
+    for i in range(size):
+        row = make_news_row(seed, i, article_words=200)
+        if name == "headline":
+            items.append(NewsInput(title=row["title"], description=""))
+        elif name == "standard":
+            items.append(NewsInput(title=row["title"], description=row["description"], publish_date=row["published_time"]))
+        else:
+            items.append(NewsInput(title=row["title"], description=f"{row['description']} {row['article']}"))
+    return items
+
+
+def stage_inputs(news, model, tokenizer):
+    """Input thật cho từng stage: (hàm, tham số) chạy trên một batch."""
+    texts = [classification_input_text(n) for n in news]
+    seqs = tokenizer.texts_to_sequences(texts)
+    padded = pad_sequences(seqs, maxlen=MAX_LEN, padding="post")
+    preds = model.predict(padded, verbose=0)
+    normalized = normalize_predictions(preds)
+    return {
+        "preprocess": lambda: [classification_input_text(n) for n in news],
+        "tokenize": lambda: tokenizer.texts_to_sequences(texts),
+        "pad": lambda: pad_sequences(seqs, maxlen=MAX_LEN, padding="post"),
+        "predict": lambda: model.predict(padded, verbose=0),
+        "normalize": lambda: normalize_predictions(preds),
+        "build": lambda: build_classification_output(news, normalized),
+        "end_to_end": lambda: classify_news(news),
+    }
+
+
+def _peak_python_kb(fn) -> float:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def measure(fn, batch: int, repeats: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        fn()
+    ms = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        ms.append((time.perf_counter() - t0) * 1000)
+    total = sum(ms) / 1000
+    return {
+        "p50_ms": round(percentile(ms, 0.50), 4),
+        "p95_ms": round(percentile(ms, 0.95), 4),
+        "p99_ms": round(percentile(ms, 0.99), 4),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "items_per_sec": round(batch * repeats / total, 1) if total > 0 else None,
+        "peak_py_kb": _peak_python_kb(fn),
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", default="1,8,64,512")
+    parser.add_argument("--corpora", default=",".join(CORPORA))
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--repeats", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", help="Ghi JSON ra file (mặc định stdout)")
+    args = parser.parse_args()
+
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",") if b.strip()]
+    corpora = [c.strip() for c in args.corpora.split(",") if c.strip()]
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    bad = [c for c in corpora if c not in CORPORA] + [s for s in stages if s not in STAGES]
+    if bad:
+        parser.error(f"unknown corpus/stage: {', '.join(bad)}")
+
+    started = time.perf_counter()
+    model, tokenizer = _get_model_and_tokenizer()
+    model_version = model_registry.active_version()
+    load_seconds = time.perf_counter() - started
+
+    results = []
+    for corpus in corpora:
+        full = make_corpus(corpus, max(batch_sizes), args.seed)
+        for batch in batch_sizes:
+            fns = stage_inputs(full[:batch], model, tokenizer)
+            for stage in stages:
+                r = measure(fns[stage], batch, args.repeats, args.warmup)
+                results.append({"corpus": corpus, "stage": stage, "batch": batch, **r})
+                print(
+                    f"{corpus:<9} {stage:<11} batch={batch:<4} p50={r['p50_ms']:>9.3f}ms "
+                    f"{r['items_per_sec'] or 0:>10.1f} item/s",
+                    file=sys.stderr,
+                )
+
+    report = {
+        "model_version": model_version,
+        "model_load_seconds": round(load_seconds, 3),
+        "repeats": args.repeats,
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
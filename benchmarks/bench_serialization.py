@@ -0,0 +1,112 @@
+"""
+So sánh chi phí serialize response của GET /api/news (không cần DB).
+
+- model: đường cũ của FastAPI với response_model=NewsListResponse
+  (validate từng item -> dump mode="json" -> JSONResponse).
+- trusted: trusted_json() (bỏ validate, encode bằng orjson nếu có).
+
+Hai đường phải cho ra cùng một JSON; script kiểm tra điều đó trước khi đo.
+
+    python -m benchmarks.bench_serialization --limits 20,200,1000 --iterations 200
+
+Kết quả in ra dạng JSON (p50/p95/p99 theo ms, bytes) cho từng (path, limit).
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from benchmarks.stats import percentile
+from server.http_cache import orjson, trusted_json
+from server.modules.news.router import _news_item_out
+from server.modules.news.schemas import NewsListResponse
+from server.modules.news.service import _normalize_fields
+
+_SECTIONS = ["World / China", "Business / Markets", "Technology", "Science", "Sport / Football"]
+
+
+def fake_rows(n: int, seed: int = 0):
+    """Dòng giống asyncpg trả về cho bộ cột mặc định của list_news."""
+    rnd = random.Random(seed)
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(n):
+        slug = f"story-{seed}-{i}-" + "-".join(rnd.choice(["market", "china", "ai", "rates", "cup"]) for _ in range(4))
+        rows.append({
+            "id": f"{seed:02d}{i:08d}",
+            "title": f"Headline {i} " + "lorem ipsum " * rnd.randint(2, 6),
+            "url": f"https://example.com/{rnd.choice(_SECTIONS).split(' / ')[0].lower()}/{slug}",
+            "description": "Dolor sit amet, consectetur adipiscing elit. " * rnd.randint(1, 4),
+            "published_time": base + timedelta(seconds=rnd.randint(0, 86400 * 365), microseconds=rnd.randint(0, 999999)),
+            "section": rnd.choice(_SECTIONS),
+            "thumbnail": f"https://cdn.example.com/img/{i}.jpg" if i % 5 else None,
+            "view_count": rnd.randint(0, 100000),
+        })
+    return rows
+
+
+def payload(rows, limit):
+    return {
+        "items": [_news_item_out(r) for r in rows],
+        "page": {"limit": limit, "offset": 0, "total": 1_000_000},
+        "meta": {"fields": _normalize_fields(None), "order_by": "published_time", "order_dir": "DESC"},
+    }
+
+
+_ADAPTER = TypeAdapter(NewsListResponse)
+
+
+def model_path(data) -> bytes:
+    value = _ADAPTER.validate_python(data)
+    return JSONResponse(_ADAPTER.dump_python(value, mode="json")).body
+
+
+_REQUEST = SimpleNamespace(headers={})
+
+
+def trusted_path(data) -> bytes:
+    return trusted_json(_REQUEST, data).body
+
+
+def _measure(fn, data, iterations):
+    for _ in range(min(10, iterations)):
+        fn(data)
+    ms = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        body = fn(data)
+        ms.append((time.perf_counter() - t0) * 1000)
+    return {
+        "p50_ms": round(percentile(ms, 0.50), 3),
+        "p95_ms": round(percentile(ms, 0.95), 3),
+        "p99_ms": round(percentile(ms, 0.99), 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "bytes": len(body),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limits", default="20,200,1000")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    results = []
+    for limit in [int(x) for x in args.limits.split(",") if x.strip()]:
+        data = payload(fake_rows(limit), limit)
+        if json.loads(model_path(data)) != json.loads(trusted_path(data)):
+            raise SystemExit(f"output mismatch at limit={limit}")
+        for name, fn in (("model", model_path), ("trusted", trusted_path)):
+            r = _measure(fn, data, args.iterations)
+            results.append({"path": name, "limit": limit, "orjson": orjson is not None, **r})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
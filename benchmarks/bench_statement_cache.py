@@ -0,0 +1,105 @@
+"""
+So sánh latency query giữa các DB_STATEMENT_CACHE_MODE.
+
+Chạy trực tiếp các hàm service/route thật (list_news, get_news_detail,
+increase_view) trên một pool tạo bằng create_db_pool(), lần lượt với từng mode.
+
+    DB_SSL=disable DATABASE_URL=postgresql://... \\
+        python -m benchmarks.bench_statement_cache --modes off,on --iterations 500 --concurrency 5
+
+Kết quả in ra dạng JSON (p50/p95/p99 theo ms, throughput) cho từng (mode, query).
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from types import SimpleNamespace
+
+from benchmarks.stats import percentile
+from server.database import DATABASE_URL, DatabaseRouter, create_db_pool
+from server.modules.news.router import get_news_detail, increase_view
+from server.modules.news.service import list_news
+
+
+def fake_request(pool):
+    """Đủ thuộc tính để gọi trực tiếp service/route (get_read_pool, get_write_pool)."""
+    state = SimpleNamespace(pool=pool, db=DatabaseRouter(pool, []))
+    return SimpleNamespace(app=SimpleNamespace(state=state), state=SimpleNamespace(), headers={}, cookies={})
+
+
+async def _run(name, fn, iterations, concurrency):
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            t0 = time.perf_counter()
+            await fn()
+            latencies.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(iterations)))
+    wall = time.perf_counter() - started
+    ms = [x * 1000 for x in latencies]
+    return {
+        "query": name,
+        "iterations": iterations,
+        "p50_ms": round(percentile(ms, 0.50), 3),
+        "p95_ms": round(percentile(ms, 0.95), 3),
+        "p99_ms": round(percentile(ms, 0.99), 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "throughput_rps": round(iterations / wall, 1),
+    }
+
+
+async def bench_mode(dsn, mode, iterations, concurrency, with_writes):
+    pool = await create_db_pool(dsn, mode)
+    request = fake_request(pool)
+    try:
+        sample = await list_news(request, fields=["id", "url", "section"], limit=1)
+        row = (sample["items"] or [{}])[0]
+        news_id, url, section = row.get("id"), row.get("url") or "", row.get("section")
+        slug = url.rstrip("/").split("/")[-1]
+
+        cases = [
+            ("list_news", lambda: list_news(request, limit=20)),
+            ("list_news_section", lambda: list_news(request, sections=[section] if section else None, limit=20)),
+            ("list_news_search", lambda: list_news(request, q="market stocks", limit=20)),
+        ]
+        if slug:
+            cases.append(("get_news_detail", lambda: get_news_detail(slug, request)))
+        if with_writes and news_id is not None:
+            cases.append(("increase_view", lambda: increase_view(str(news_id), request)))
+
+        # warm-up: mở đủ connection và (nếu bật) fill statement cache
+        for _, fn in cases:
+            await asyncio.gather(*(fn() for _ in range(concurrency)))
+
+        results = []
+        for name, fn in cases:
+            r = await _run(name, fn, iterations, concurrency)
+            r["mode"] = mode
+            results.append(r)
+        return results
+    finally:
+        await pool.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=DATABASE_URL)
+    parser.add_argument("--modes", default="off,on", help="CSV: off,on,pgbouncer")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--with-writes", action="store_true", help="Đo cả increase_view (ghi vào DB)")
+    args = parser.parse_args()
+
+    results = []
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        results.extend(await bench_mode(args.dsn, mode, args.iterations, args.concurrency, args.with_writes))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
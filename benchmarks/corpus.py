@@ -0,0 +1,76 @@
+"""
+Corpus giả deterministic cho benchmark: dòng thứ i chỉ phụ thuộc (seed, i).
+
+Không import gì từ server -> load driver chạy được ở máy khác, không cần TensorFlow/asyncpg.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_SEED = 42
+ID_PREFIX = "bench-"
+SESSION_PREFIX = "bench-session-"
+# Mốc cố định để hai lần chạy cùng seed cho ra đúng cùng dữ liệu
+EPOCH = datetime(2025, 10, 1, tzinfo=timezone.utc)
+
+# Section -> (trọng số, từ vựng); phân bố lệch giống site tin tức thật
+SECTIONS = {
+    "World / China": (12, ["beijing", "trade", "tariff", "yuan", "exports", "summit", "taiwan", "xi"]),
+    "World / Europe": (10, ["brussels", "eu", "election", "energy", "ukraine", "ecb", "migration", "paris"]),
+    "World / Americas": (8, ["washington", "congress", "senate", "mexico", "brazil", "border", "vote", "canada"]),
+    "Business / Markets": (14, ["stocks", "bonds", "rally", "earnings", "fed", "rates", "investors", "dow"]),
+    "Business / Companies": (9, ["merger", "ceo", "layoffs", "revenue", "startup", "ipo", "profit", "deal"]),
+    "Technology": (13, ["ai", "chip", "nvidia", "apple", "software", "cloud", "privacy", "startup"]),
+    "Science": (6, ["nasa", "climate", "species", "study", "telescope", "vaccine", "ocean", "fossil"]),
+    "Sport / Football": (11, ["goal", "league", "striker", "transfer", "coach", "cup", "derby", "penalty"]),
+    "Sport / Tennis": (4, ["open", "serve", "grand", "slam", "final", "seed", "set", "wimbledon"]),
+    "Lifestyle": (5, ["travel", "food", "fashion", "wellness", "recipe", "design", "home", "style"]),
+}
+_SECTION_NAMES = list(SECTIONS)
+_SECTION_WEIGHTS = [w for w, _ in SECTIONS.values()]
+_COMMON = (
+    "the a new report says after amid as over could may officials year week early plans "
+    "record growth risk talks deal leaders market public data first latest warns rise fall"
+).split()
+
+
+def _words(rnd: random.Random, vocab, n: int) -> str:
+    return " ".join(rnd.choice(vocab) if rnd.random() < 0.55 else rnd.choice(_COMMON) for _ in range(n))
+
+
+def news_id(i: int) -> str:
+    return f"{ID_PREFIX}{i:08d}"
+
+
+def make_news_row(seed: int, i: int, days: int = 730, article_words: int = 120) -> dict:
+    rnd = random.Random(f"{seed}:{i}")
+    section = rnd.choices(_SECTION_NAMES, weights=_SECTION_WEIGHTS)[0]
+    vocab = SECTIONS[section][1]
+    title_words = _words(rnd, vocab, rnd.randint(6, 12))
+    slug = "-".join(title_words.split()[:8]) + f"-{i:08d}"
+    path = "/".join(p.strip().lower() for p in section.split("/"))
+    return {
+        "id": news_id(i),
+        "title": title_words.capitalize(),
+        "url": f"https://news.example.com/{path}/{slug}",
+        "slug": slug,
+        "description": _words(rnd, vocab, rnd.randint(20, 40)).capitalize() + ".",
+        "article": ". ".join(_words(rnd, vocab, 15).capitalize() for _ in range(max(1, article_words // 15))) + ".",
+        "section": section,
+        "thumbnail": f"https://img.example.com/{i % 5000}.jpg" if rnd.random() < 0.8 else None,
+        "published_time": EPOCH - timedelta(seconds=rnd.randint(0, days * 86400)),
+        # phân bố lượt xem đuôi dài
+        "view_count": int((rnd.paretovariate(1.2) - 1) * 50),
+    }
+
+
+def make_chat_messages(seed: int, session: int, count: int):
+    rnd = random.Random(f"{seed}:chat:{session}")
+    for k in range(count):
+        section = rnd.choice(_SECTION_NAMES)
+        text = _words(rnd, SECTIONS[section][1], rnd.randint(8, 60 if k % 2 else 20))
+        yield {
+            "type": "ai" if k % 2 else "human",
+            "content": text.capitalize() + ("." if k % 2 else "?"),
+            "additional_kwargs": {},
+            "response_metadata": {},
+        }
@@ -0,0 +1,195 @@
+"""
+Load test end-to-end qua HTTP cho server đang chạy (dữ liệu từ benchmarks.synthetic_data).
+
+Mỗi scenario chạy với concurrency cố định cho tới khi đủ --requests; ghi p50/p95/p99,
+throughput, tỉ lệ lỗi. Với --baseline, so với kết quả đã lưu và thoát mã 1 nếu có
+scenario chậm/hụt throughput quá --tolerance (hoặc lỗi tăng) -> dùng được trong CI.
+
+    python -m benchmarks.synthetic_data --news 1000000 --reset
+    uvicorn server.main:app --workers 1 &
+    python -m benchmarks.load_test --news 1000000 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.load_test --news 1000000 --baseline benchmarks/baseline.json
+
+Route cần auth (chat-history, classify_news) chỉ chạy khi có --api-key.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import httpx
+
+from benchmarks.stats import percentile
+from benchmarks.corpus import DEFAULT_SEED, SECTIONS, SESSION_PREFIX, make_news_row, news_id
+
+
+def scenarios(args):
+    """name -> hàm (rnd) trả về (method, path, kwargs cho httpx)."""
+    seed, n = args.seed, args.news
+    section_slugs = ["/".join(p.strip().lower() for p in s.split("/")) for s in SECTIONS]
+    words = sorted({w for _, vocab in SECTIONS.values() for w in vocab})
+
+    def pick(rnd):
+        return rnd.randrange(n)
+
+    out = {
+        "list_news": lambda rnd: ("GET", "/api/news/", {"params": {"limit": 20}}),
+        "list_news_section": lambda rnd: (
+            "GET", "/api/news/", {"params": {"sections": rnd.choice(section_slugs), "limit": 20}}
+        ),
+        "list_news_search": lambda rnd: (
+            "GET", "/api/news/", {"params": {"q": " ".join(rnd.sample(words, 2)), "limit": 20}}
+        ),
+        "list_news_large": lambda rnd: ("GET", "/api/news/", {"params": {"limit": 1000}}),
+        "news_detail": lambda rnd: ("GET", f"/api/news/{make_news_row(seed, pick(rnd))['slug']}", {}),
+        "sections_nav": lambda rnd: ("GET", "/api/news/sections", {}),
+    }
+    if args.with_writes:
+        out["increase_view"] = lambda rnd: ("POST", f"/api/news/{news_id(pick(rnd))}/seen", {})
+    if args.api_key:
+        headers = {"X-API-Key": args.api_key}
+        out["chat_history"] = lambda rnd: (
+            "GET", f"/api/ai/chat-history/{SESSION_PREFIX}{rnd.randrange(max(1, args.sessions)):06d}",
+            {"params": {"limit": 50}, "headers": headers},
+        )
+
+        def classify(rnd):
+            rows = [make_news_row(seed, pick(rnd)) for _ in range(args.classify_batch)]
+            body = {"news": [{"title": r["title"], "description": r["description"]} for r in rows]}
+            return "POST", "/api/ai/classify_news", {"json": body, "headers": headers}
+
+        out["classify_news"] = classify
+    return out
+
+
+async def run_scenario(client, name, make, requests, concurrency, seed):
+    latencies, statuses = [], {}
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker(wid):
+        nonlocal errors
+        rnd = random.Random(f"{seed}:{name}:{wid}")
+        for _ in counter:
+            method, path, kwargs = make(rnd)
+            t0 = time.perf_counter()
+            try:
+                resp = await client.request(method, path, **kwargs)
+                await resp.aread()
+                code = resp.status_code
+            except httpx.HTTPError:
+                code = "error"
+            latencies.append((time.perf_counter() - t0) * 1000)
+            statuses[str(code)] = statuses.get(str(code), 0) + 1
+            if code == "error" or code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    wall = time.perf_counter() - started
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / wall, 1) if wall > 0 else 0.0,
+        "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+        "statuses": statuses,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Danh sách regression (chuỗi mô tả) so với baseline."""
+    base = {r["scenario"]: r for r in baseline.get("results", [])}
+    failures = []
+    for r in results:
+        b = base.get(r["scenario"])
+        if b is None:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if b[key] > 0 and r[key] > b[key] * (1 + tolerance):
+                failures.append(f"{r['scenario']}: {key} {r[key]} > {b[key]} (+{tolerance:.0%})")
+        if b["throughput_rps"] > 0 and r["throughput_rps"] < b["throughput_rps"] * (1 - tolerance):
+            failures.append(
+                f"{r['scenario']}: throughput_rps {r['throughput_rps']} < {b['throughput_rps']} (-{tolerance:.0%})"
+            )
+        if r["error_rate"] > b["error_rate"] + 0.01:
+            failures.append(f"{r['scenario']}: error_rate {r['error_rate']} > {b['error_rate']}")
+    return failures
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--news", type=int, default=1_000_000, help="Phải khớp với lúc sinh dữ liệu")
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--scenarios", default="", help="CSV, bỏ trống = tất cả")
+    parser.add_argument("--requests", type=int, default=2000, help="Số request mỗi scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--classify-batch", type=int, default=16)
+    parser.add_argument("--with-writes", action="store_true", help="Chạy cả increase_view (ghi DB)")
+    parser.add_argument("--api-key", default=os.getenv("SUPABASE_API_SECRET", ""))
+    parser.add_argument("--baseline", help="File baseline để so sánh; regression -> exit 1")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Sai lệch cho phép (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", help="Ghi kết quả lần chạy này thành baseline")
+    args = parser.parse_args()
+
+    all_scenarios = scenarios(args)
+    wanted = [s.strip() for s in args.scenarios.split(",") if s.strip()] or list(all_scenarios)
+    unknown = [s for s in wanted if s not in all_scenarios]
+    if unknown:
+        parser.error(f"unknown/unavailable scenarios: {', '.join(unknown)}")
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = []
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60.0) as client:
+        for name in wanted:
+            if args.warmup:
+                await run_scenario(client, name, all_scenarios[name], args.warmup, args.concurrency, args.seed + 1)
+            r = await run_scenario(client, name, all_scenarios[name], args.requests, args.concurrency, args.seed)
+            print(
+                f"{name:<20} p50={r['p50_ms']:>9.2f}ms p95={r['p95_ms']:>9.2f}ms p99={r['p99_ms']:>9.2f}ms "
+                f"rps={r['throughput_rps']:>8.1f} err={r['error_rate']:.2%}",
+                file=sys.stderr,
+            )
+            results.append(r)
+
+    report = {
+        "base_url": args.base_url,
+        "news": args.news,
+        "seed": args.seed,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if (baseline.get("news"), baseline.get("concurrency")) != (args.news, args.concurrency):
+            print("WARNING: baseline was recorded with different --news/--concurrency", file=sys.stderr)
+        failures = compare(results, baseline, args.tolerance)
+        if failures:
+            print("\nREGRESSIONS:", file=sys.stderr)
+            for line in failures:
+                print(f"  - {line}", file=sys.stderr)
+            sys.exit(1)
+        print("\nNo regressions against baseline.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
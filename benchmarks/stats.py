@@ -0,0 +1,9 @@
+"""Helper thống kê dùng chung cho các benchmark."""
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    idx = min(len(samples) - 1, max(0, int(round(q * (len(samples) - 1)))))
+    return samples[idx]
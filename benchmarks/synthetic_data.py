@@ -0,0 +1,118 @@
+"""
+Sinh dữ liệu giả (deterministic) cho load test trên Postgres local.
+
+- news: N bài, section dạng "Parent / Child", url có slug, title/description/article
+  ghép từ bộ từ vựng theo section, published_time rải đều trong DAYS ngày gần nhất.
+- n8n_chat_histories: S session, mỗi session M message (human/ai xen kẽ).
+
+Dòng thứ i chỉ phụ thuộc (seed, i) -> load driver dựng lại id/slug của bất kỳ bài nào
+mà không cần query DB. Mọi id đều có prefix "bench-" nên --reset chỉ xoá dữ liệu giả.
+
+    DB_SSL=disable DATABASE_URL=postgresql://localhost/smartnews \\
+        python -m benchmarks.synthetic_data --news 1000000 --sessions 2000 --reset
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.corpus import DEFAULT_SEED, ID_PREFIX, SESSION_PREFIX, make_chat_messages, make_news_row
+from server.database import DATABASE_URL, create_db_pool
+from server.modules.news.ingest import NEWS_URL_UNIQUE_SQL
+from server.modules.news.service import NEWS_SLUG_INDEX_SQL
+
+NEWS_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS news (
+    id              TEXT PRIMARY KEY,
+    title           TEXT,
+    url             TEXT,
+    description     TEXT,
+    article         TEXT,
+    section         TEXT,
+    thumbnail       TEXT,
+    published_time  TIMESTAMPTZ,
+    view_count      INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS news_published_time_idx ON news (published_time DESC);
+"""
+
+CHAT_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS n8n_chat_histories (
+    id          SERIAL PRIMARY KEY,
+    session_id  VARCHAR(255) NOT NULL,
+    message     JSONB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS n8n_chat_histories_session_id_idx ON n8n_chat_histories (session_id, id);
+"""
+
+_NEWS_COLUMNS = ("id", "title", "url", "description", "article", "section", "thumbnail", "published_time", "view_count")
+
+
+async def _copy(pool, table, columns, records):
+    async with pool.acquire() as conn:
+        await conn.copy_records_to_table(table, records=records, columns=columns)
+
+
+async def generate(pool, news: int, sessions: int, messages: int, seed: int, days: int,
+                   article_words: int, batch: int, reset: bool):
+    async with pool.acquire() as conn:
+        await conn.execute(NEWS_SCHEMA_SQL)
+        await conn.execute(CHAT_SCHEMA_SQL)
+        if reset:
+            await conn.execute("DELETE FROM news WHERE id LIKE $1", ID_PREFIX + "%")
+            await conn.execute("DELETE FROM n8n_chat_histories WHERE session_id LIKE $1", SESSION_PREFIX + "%")
+
+    started = time.perf_counter()
+    for lo in range(0, news, batch):
+        records = []
+        for i in range(lo, min(news, lo + batch)):
+            row = make_news_row(seed, i, days, article_words)
+            records.append(tuple(row[c] for c in _NEWS_COLUMNS))
+        await _copy(pool, "news", _NEWS_COLUMNS, records)
+        done = lo + len(records)
+        print(f"news {done}/{news} ({done / (time.perf_counter() - started):.0f} rows/s)", flush=True)
+
+    records = []
+    for s in range(sessions):
+        for msg in make_chat_messages(seed, s, messages):
+            records.append((f"{SESSION_PREFIX}{s:06d}", msg))
+        if len(records) >= batch or s == sessions - 1:
+            # jsonb đi qua codec của pool (init_connection) -> dùng INSERT thay vì COPY
+            async with pool.acquire() as conn:
+                await conn.executemany(
+                    "INSERT INTO n8n_chat_histories (session_id, message) VALUES ($1, $2)", records
+                )
+            records = []
+    if sessions:
+        print(f"chat {sessions} sessions x {messages} messages", flush=True)
+
+    # Index dùng ở read path; tạo sau khi nạp cho nhanh
+    async with pool.acquire() as conn:
+        await conn.execute(NEWS_URL_UNIQUE_SQL)
+        await conn.execute(NEWS_SLUG_INDEX_SQL)
+        await conn.execute("ANALYZE news")
+        await conn.execute("ANALYZE n8n_chat_histories")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=DATABASE_URL)
+    parser.add_argument("--news", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=40, help="Số message mỗi session")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--days", type=int, default=730, help="published_time rải trong N ngày trước EPOCH")
+    parser.add_argument("--article-words", type=int, default=120)
+    parser.add_argument("--batch", type=int, default=10000)
+    parser.add_argument("--reset", action="store_true", help="Xoá dữ liệu bench-* cũ trước khi nạp")
+    args = parser.parse_args()
+
+    pool = await create_db_pool(args.dsn)
+    try:
+        await generate(pool, args.news, args.sessions, args.messages, args.seed, args.days,
+                       args.article_words, args.batch, args.reset)
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
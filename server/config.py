@@ -11,4 +11,9 @@ TOKENIZER_PATH = MODEL_DIR / DEFAULT_TOKENIZER
 CERTS_DIR = os.getenv("CERTS_DIR", BASE_DIR / "certs")
 SSL_FILE = os.getenv("SSL_FILE", CERTS_DIR / "prod-ca-2021.crt")
 
-SSL_PATH = CERTS_DIR / SSL_FILE
\ No newline at end of file
+SSL_PATH = CERTS_DIR / SSL_FILE
+
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR") or BASE_DIR / "profiles")
+
+TRENDING_SNAPSHOT_PATH = Path(os.getenv("TRENDING_SNAPSHOT_PATH") or BASE_DIR / "data" / "trending.json")
+DEDUP_SNAPSHOT_PATH = Path(os.getenv("DEDUP_SNAPSHOT_PATH") or BASE_DIR / "data" / "dedup.npz")
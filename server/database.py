@@ -1,38 +1,217 @@
-import os, ssl, asyncpg
+import os, ssl, json, asyncpg, itertools
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from typing import List, Optional
+from fastapi import FastAPI, Request
 from dotenv import load_dotenv
 import asyncio
 from server.config import SSL_PATH
+from server.modules.auth.client import close_auth_client
+from server.metrics import InstrumentedPool
 
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-ssl_ctx = ssl.create_default_context(cafile = SSL_PATH)
-ssl_ctx.check_hostname = True
-ssl_ctx.verify_mode = ssl.CERT_REQUIRED
+# ====== Pool / statement config ======
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", "5"))             # giây chờ lấy connection
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "30"))            # timeout phía client cho mỗi query
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))     # statement_timeout phía server (0 = tắt)
+DB_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_MAX_INACTIVE_LIFETIME", "300"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+# off       : không cache prepared statement (an toàn với mọi PgBouncer, parse lại mỗi query)
+# on        : cache named prepared statement theo connection (kết nối thẳng Postgres / session pooling)
+# pgbouncer : cache như `on` nhưng không gửi startup params; cần PgBouncer >= 1.21 với
+#             max_prepared_statements > 0 (PgBouncer tự map tên statement ở transaction pooling)
+DB_STATEMENT_CACHE_MODE = os.getenv("DB_STATEMENT_CACHE_MODE", "off").lower()
+
+# ====== Read replicas ======
+DATABASE_READ_URLS = [u.strip() for u in os.getenv("DATABASE_READ_URLS", "").split(",") if u.strip()]
+DB_READ_POOL_MIN_SIZE = int(os.getenv("DB_READ_POOL_MIN_SIZE", str(DB_POOL_MIN_SIZE)))
+DB_READ_POOL_MAX_SIZE = int(os.getenv("DB_READ_POOL_MAX_SIZE", str(DB_POOL_MAX_SIZE)))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+DB_REPLICA_CHECK_TIMEOUT = float(os.getenv("DB_REPLICA_CHECK_TIMEOUT", "2"))
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "10"))   # giây, 0 = bỏ qua lag
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes"
+
+# verify: bắt buộc TLS với CA của Supabase | disable: Postgres local (benchmark, dev)
+DB_SSL = os.getenv("DB_SSL", "verify").lower()
+
+def get_ssl_context():
+    if DB_SSL == "disable":
+        return False
+    ssl_ctx = ssl.create_default_context(cafile = SSL_PATH)
+    ssl_ctx.check_hostname = True
+    ssl_ctx.verify_mode = ssl.CERT_REQUIRED
+    return ssl_ctx
+
+async def init_connection(conn: asyncpg.Connection):
+    # Decode json/jsonb ngay ở tầng driver -> handler nhận sẵn dict/list
+    for typename in ("json", "jsonb"):
+        await conn.set_type_codec(
+            typename,
+            encoder=json.dumps,
+            decoder=json.loads,
+            schema="pg_catalog",
+        )
+
+def pool_options(mode: str = DB_STATEMENT_CACHE_MODE) -> dict:
+    if mode not in ("off", "on", "pgbouncer"):
+        raise ValueError(f"Invalid DB_STATEMENT_CACHE_MODE: {mode}")
+
+    options = dict(
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        command_timeout=DB_COMMAND_TIMEOUT or None,
+        max_inactive_connection_lifetime=DB_MAX_INACTIVE_LIFETIME,
+        statement_cache_size=0 if mode == "off" else DB_STATEMENT_CACHE_SIZE,
+        init=init_connection,
+    )
+    # PgBouncer từ chối startup parameter lạ -> chỉ set statement_timeout khi nối thẳng
+    if DB_STATEMENT_TIMEOUT_MS > 0 and mode != "pgbouncer":
+        options["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+    return options
+
+async def create_db_pool(
+    dsn: str = DATABASE_URL,
+    mode: str = DB_STATEMENT_CACHE_MODE,
+    name: str = "primary",
+    **overrides,
+) -> InstrumentedPool:
+    options = pool_options(mode)
+    options.update(overrides)
+    pool = await asyncpg.create_pool(dsn=dsn, ssl=get_ssl_context(), **options)
+    # Bọc pool để đo thời gian chờ acquire (xem /api/health/metrics)
+    return InstrumentedPool(pool, acquire_timeout=DB_ACQUIRE_TIMEOUT, name=name)
+
+
+async def create_replica_pool(url: str, idx: int) -> Optional[InstrumentedPool]:
+    """Pool cho replica thứ `idx`; None (kèm log) nếu chưa kết nối được."""
+    name = f"replica{idx}"
+    try:
+        # timeout = connect timeout của asyncpg (mặc định 60s), tránh treo startup
+        return await create_db_pool(
+            url, name=name, min_size=DB_READ_POOL_MIN_SIZE, max_size=DB_READ_POOL_MAX_SIZE, timeout=DB_ACQUIRE_TIMEOUT,
+        )
+    except Exception as e:
+        print(f"Replica {name} unavailable: {e}")
+        return None
+
+
+class DatabaseRouter:
+    """
+    Primary pool (ghi + đọc cần dữ liệu mới nhất) và 0..n read pool (replica).
+    Replica được health-check định kỳ; replica lỗi hoặc lag quá DB_REPLICA_MAX_LAG
+    bị loại khỏi vòng round-robin cho tới lần check kế tiếp thành công.
+    Replica chỉ nhận traffic sau lần check đầu tiên thành công; replica không kết nối
+    được lúc khởi động (pool = None) được tạo lại ở các lần check sau.
+    """
+
+    def __init__(
+        self,
+        primary: InstrumentedPool,
+        replicas: List[Optional[InstrumentedPool]],
+        replica_urls: Optional[List[str]] = None,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.replica_urls = replica_urls or [None] * len(replicas)
+        self.replica_names = [f"replica{i}" for i in range(len(replicas))]
+        self.healthy = [False] * len(replicas)
+        self._rr = itertools.count()
+
+    def reader(self) -> InstrumentedPool:
+        n = len(self.replicas)
+        if n:
+            start = next(self._rr)
+            for i in range(n):
+                idx = (start + i) % n
+                if self.healthy[idx]:
+                    return self.replicas[idx]
+        # Không có replica khoẻ -> failover về primary
+        return self.primary
+
+    async def _check(self, idx: int):
+        pool = self.replicas[idx]
+        if pool is None:
+            pool = self.replicas[idx] = await create_replica_pool(self.replica_urls[idx], idx)
+            if pool is None:
+                self.healthy[idx] = False
+                return
+        try:
+            async with pool.acquire(timeout=DB_REPLICA_CHECK_TIMEOUT) as conn:
+                # Replica đã replay hết WAL nhận được -> lag = 0 (tránh báo lag giả khi primary rảnh)
+                lag = await conn.fetchval(
+                    """
+                    SELECT CASE
+                        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                    END
+                    """,
+                    timeout=DB_REPLICA_CHECK_TIMEOUT,
+                )
+            ok = DB_REPLICA_MAX_LAG <= 0 or float(lag or 0) <= DB_REPLICA_MAX_LAG
+        except Exception as e:
+            print(f"Replica {pool.name} health check failed: {e}")
+            ok = False
+        self.healthy[idx] = ok
+
+    async def check_replicas(self):
+        await asyncio.gather(*(self._check(i) for i in range(len(self.replicas))))
+
+    async def run_health_checks(self, interval: float = DB_REPLICA_CHECK_INTERVAL):
+        while True:
+            await self.check_replicas()
+            await asyncio.sleep(interval)
+
+    def pools(self) -> List[InstrumentedPool]:
+        return [self.primary, *(p for p in self.replicas if p is not None)]
+
+    async def close(self):
+        for pool in self.pools():
+            try:
+                await asyncio.wait_for(pool.close(), timeout=5)
+            except asyncio.TimeoutError:
+                print(f"Pool.close() timeout ({pool.name}), force exit")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Tạo pool và gắn vào app.state
-    app.state.pool = await asyncpg.create_pool(
-        dsn=DATABASE_URL, 
-        ssl=ssl_ctx,
-        min_size=1,
-        max_size=5,
-        statement_cache_size=0,  # Để tránh lỗi khi đi qua PgBouncer
-    )
+    primary = await create_db_pool()
+    # Replica lỗi lúc boot không chặn startup: đọc đi primary tới khi replica khoẻ
+    replicas = await asyncio.gather(*(create_replica_pool(url, i) for i, url in enumerate(DATABASE_READ_URLS)))
+    app.state.db = DatabaseRouter(primary, list(replicas), DATABASE_READ_URLS)
+    app.state.pool = primary  # tương thích ngược: pool chính (ghi)
+    health_task = asyncio.create_task(app.state.db.run_health_checks()) if replicas else None
     try:
         yield
     finally:
+        await close_auth_client()
+        if health_task:
+            health_task.cancel()
         # Đóng pool khi ứng dụng dừng
-        if app.state.pool:
-            try:
-                await asyncio.wait_for(app.state.pool.close(), timeout=5)
-            except asyncio.TimeoutError:
-                print("Pool.close() timeout, force exit")
-            app.state.pool = None
+        await app.state.db.close()
+        app.state.pool = None
 
 # Hàm để lấy pool kết nối từ app.state
 def get_db(app: FastAPI):
-    return app.state.pool
\ No newline at end of file
+    return app.state.pool
+
+def get_write_pool(request: Request) -> InstrumentedPool:
+    # Sau khi ghi, các lần đọc tiếp theo trong cùng request đi primary
+    request.state.read_primary = True
+    return request.app.state.db.primary
+
+def get_read_pool(request: Request) -> InstrumentedPool:
+    """
+    Pool cho truy vấn chỉ đọc. Dùng primary khi:
+    - client gửi header `X-Read-Your-Writes: 1` (vừa ghi xong, cần thấy ngay)
+    - request này đã ghi trước đó (get_write_pool)
+    """
+    db = request.app.state.db
+    if getattr(request.state, "read_primary", False):
+        return db.primary
+    if request.headers.get(READ_YOUR_WRITES_HEADER, "").lower() in ("1", "true"):
+        return db.primary
+    return db.reader()
@@ -0,0 +1,221 @@
+# server/deadline.py
+"""
+Deadline theo endpoint + huỷ request khi client ngắt kết nối.
+
+- Mỗi request nhận một Deadline (request.state.deadline) theo ENDPOINT_DEADLINES;
+  client có thể rút ngắn qua header `X-Request-Timeout` (giây).
+- query_timeout(request): thời gian còn lại -> truyền vào `timeout=` của asyncpg.
+- Deadline.check(stage): gọi trong pipeline AI (kể cả trong threadpool) để bỏ
+  công việc inference còn xếp hàng khi đã hết hạn / client đã đi.
+- DeadlineMiddleware: theo dõi `http.disconnect`; khi client ngắt hoặc vượt hạn
+  (cộng thêm DEADLINE_GRACE) thì cancel task xử lý -> asyncpg huỷ statement
+  đang chạy trên server.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from fastapi import Request
+
+from server.metrics import REQUESTS_CANCELLED, WORK_SKIPPED
+
+DEFAULT_DEADLINE = float(os.getenv("DEFAULT_DEADLINE", "30"))
+DEADLINE_GRACE = float(os.getenv("DEADLINE_GRACE", "1"))
+
+# Prefix path -> số giây; None = không giới hạn thời gian (stream dài) nhưng vẫn huỷ khi client ngắt
+ENDPOINT_DEADLINES: Dict[str, Optional[float]] = {
+    "/api/news": 10.0,
+    "/api/news/ingest": 300.0,
+    "/api/news/export": None,
+    "/api/ai/fetch_and_classify_news": 30.0,
+    "/api/ai/classify_news": 60.0,
+    "/api/ai/analyze-news": 90.0,
+    "/api/ai/chatbot": 65.0,
+    "/api/ai/chat-history": 10.0,
+    "/api/health": 5.0,
+    "/api/realtime": None,
+    "/api/sentiment": 10.0,
+    "/api/jobs": 30.0,
+    "/api/jobs/events": None,
+}
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, stage: str = "request"):
+        super().__init__(f"Deadline exceeded at {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    __slots__ = ("expires_at", "_cancelled")
+
+    def __init__(self, budget: Optional[float]):
+        self.expires_at = time.monotonic() + budget if budget else None
+        # threading.Event vì check() có thể chạy trong worker thread (model.predict)
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def expired(self) -> bool:
+        if self._cancelled.is_set():
+            return True
+        left = self.remaining()
+        return left is not None and left <= 0
+
+    def check(self, stage: str, units: int = 1):
+        if self.expired():
+            WORK_SKIPPED.labels(stage).inc(units)
+            raise DeadlineExceeded(stage)
+
+
+def deadline_for_path(path: str) -> Optional[float]:
+    best, budget = -1, DEFAULT_DEADLINE
+    for prefix, seconds in ENDPOINT_DEADLINES.items():
+        if path.startswith(prefix) and len(prefix) > best:
+            best, budget = len(prefix), seconds
+    return budget
+
+
+def get_deadline(request: Request) -> Optional[Deadline]:
+    return getattr(request.state, "deadline", None)
+
+
+def query_timeout(request: Request) -> Optional[float]:
+    """Timeout (giây) cho một query asyncpg theo deadline còn lại của request."""
+    deadline = get_deadline(request)
+    if deadline is None:
+        return None
+    left = deadline.remaining()
+    if deadline.cancelled or (left is not None and left <= 0):
+        WORK_SKIPPED.labels("db_query").inc()
+        raise DeadlineExceeded("db_query")
+    return left
+
+
+def _has_body(scope) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == b"content-length":
+            return value.strip() not in (b"", b"0")
+        if name == b"transfer-encoding":
+            return True
+    return False
+
+
+def _client_budget(scope, budget: Optional[float]) -> Optional[float]:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-request-timeout":
+            try:
+                requested = float(value)
+            except ValueError:
+                return budget
+            if requested > 0:
+                return min(budget, requested) if budget else requested
+    return budget
+
+
+class _ReceiveProxy:
+    """
+    Cho phép middleware chờ `http.disconnect` song song với app.
+    Request không có body: watcher đọc message body rỗng trước rồi trả lại cho app.
+    Request có body: watcher chỉ bắt đầu nghe sau khi app đã đọc hết body.
+    """
+
+    def __init__(self, receive, has_body: bool):
+        self._receive = receive
+        self._has_body = has_body
+        self._body_done = asyncio.Event()
+        self._first = None if has_body else asyncio.get_running_loop().create_future()
+        self._first_taken = has_body
+
+    async def receive(self):
+        if not self._first_taken:
+            self._first_taken = True
+            return await self._first
+        msg = await self._receive()
+        if msg["type"] == "http.request" and not msg.get("more_body", False):
+            self._body_done.set()
+        return msg
+
+    async def wait_disconnect(self):
+        if not self._has_body:
+            msg = await self._receive()
+            self._first.set_result(msg)
+            if msg["type"] == "http.disconnect":
+                return
+        else:
+            await self._body_done.wait()
+        while True:
+            msg = await self._receive()
+            if msg["type"] == "http.disconnect":
+                return
+
+
+class DeadlineMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        budget = _client_budget(scope, deadline_for_path(scope["path"]))
+        deadline = Deadline(budget)
+        scope.setdefault("state", {})["deadline"] = deadline
+
+        response_started = False
+        response_done = False
+
+        async def send_wrapper(message):
+            nonlocal response_started, response_done
+            if message["type"] == "http.response.start":
+                response_started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_done = True
+            await send(message)
+
+        proxy = _ReceiveProxy(receive, _has_body(scope))
+        app_task = asyncio.ensure_future(self.app(scope, proxy.receive, send_wrapper))
+        watcher = asyncio.ensure_future(proxy.wait_disconnect())
+        try:
+            done, _ = await asyncio.wait(
+                {app_task, watcher},
+                timeout=budget + DEADLINE_GRACE if budget else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            # Server báo "disconnect" sau khi response đã gửi xong -> không phải huỷ,
+            # để app chạy nốt (vd. background tasks)
+            if app_task in done or response_done:
+                return await app_task
+
+            reason = "disconnect" if watcher in done else "deadline"
+            deadline.cancel()
+            app_task.cancel()
+            try:
+                await app_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            REQUESTS_CANCELLED.labels(reason).inc()
+
+            if reason == "deadline" and not response_started:
+                await send({
+                    "type": "http.response.start",
+                    "status": 504,
+                    "headers": [(b"content-type", b"application/json")],
+                })
+                await send({"type": "http.response.body", "body": b'{"detail":"Request deadline exceeded"}'})
+        finally:
+            for task in (app_task, watcher):
+                if not task.done():
+                    task.cancel()
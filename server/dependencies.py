@@ -1,4 +1,9 @@
 import os
+import time
+import hmac
+import hashlib
+import threading
+from collections import OrderedDict
 import jwt
 from fastapi import HTTPException, status, Request
 
@@ -6,28 +11,150 @@ SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_KEY", "")
 SUPABASE_API_SECRET = os.getenv("SUPABASE_API_SECRET", "")
 AUDIENCE = "authenticated"
 
+# Cache payload đã verify, key = sha256(token), hết hạn theo `exp` của token
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_MAX_TTL = float(os.getenv("AUTH_CACHE_MAX_TTL", "300"))
+
+# Verify bất đối xứng (RS256/ES256) qua JWKS, tuỳ chọn. Cần cài `cryptography`.
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL", "")
+JWKS_REFRESH_SECONDS = int(os.getenv("JWKS_REFRESH_SECONDS", "600"))
+ASYMMETRIC_ALGS = ["RS256", "ES256"]
+
+_API_SECRET_BYTES = SUPABASE_API_SECRET.encode()
+
+
+class _VerifiedTokenCache:
+    """LRU giới hạn kích thước; thread-safe vì require_auth chạy trong threadpool."""
+
+    def __init__(self, max_items: int, max_ttl: float):
+        self.max_items = max_items
+        self.max_ttl = max_ttl
+        self._items: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes):
+        now = time.time()
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at <= now:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return payload
+
+    def put(self, key: bytes, payload: dict):
+        now = time.time()
+        expires_at = now + self.max_ttl
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= now:
+            return
+        with self._lock:
+            self._items[key] = (expires_at, payload)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+_token_cache = _VerifiedTokenCache(AUTH_CACHE_SIZE, AUTH_CACHE_MAX_TTL)
+
+# PyJWKClient tự cache JWK set và refresh sau `lifespan` giây
+_jwks_client = (
+    jwt.PyJWKClient(SUPABASE_JWKS_URL, cache_jwk_set=True, lifespan=JWKS_REFRESH_SECONDS)
+    if SUPABASE_JWKS_URL else None
+)
+
+# Thống kê chi phí auth (đọc bởi metrics)
+AUTH_STATS = {
+    "requests": 0,
+    "api_key": 0,
+    "cache_hits": 0,
+    "verified": 0,
+    "failures": 0,
+    "seconds_total": 0.0,
+}
+_stats_lock = threading.Lock()
+
+
+def _record(kind: str, started: float, request: Request):
+    elapsed = time.perf_counter() - started
+    request.state.auth_seconds = elapsed
+    with _stats_lock:
+        AUTH_STATS["requests"] += 1
+        AUTH_STATS[kind] += 1
+        AUTH_STATS["seconds_total"] += elapsed
+
+
+def _decode_token(token: str) -> dict:
+    if _jwks_client is not None:
+        alg = jwt.get_unverified_header(token).get("alg")
+        if alg in ASYMMETRIC_ALGS:
+            signing_key = _jwks_client.get_signing_key_from_jwt(token)
+            return jwt.decode(token, signing_key.key, algorithms=ASYMMETRIC_ALGS, audience=AUDIENCE)
+    return jwt.decode(
+        token,
+        SUPABASE_JWT_SECRET,
+        algorithms=["HS256"],
+        audience=AUDIENCE
+    )
+
+
+def is_service_api_key(api_key) -> bool:
+    """So sánh constant-time với SUPABASE_API_SECRET (nhận str hoặc bytes)."""
+    if not api_key or not _API_SECRET_BYTES:
+        return False
+    if isinstance(api_key, str):
+        api_key = api_key.encode()
+    return hmac.compare_digest(api_key, _API_SECRET_BYTES)
+
+
 def require_auth(request: Request) -> dict:
-    # 1) Nếu có header X-API-Key đúng => cho qua
+    started = time.perf_counter()
+
+    # 1) Nếu có header X-API-Key đúng => cho qua (so sánh constant-time)
     api_key = request.headers.get("X-API-Key")
-    print(api_key)
-    if api_key and SUPABASE_API_SECRET and api_key == SUPABASE_API_SECRET:
+    if is_service_api_key(api_key):
+        _record("api_key", started, request)
         # payload giả định cho service call
         return {"sub": "api-service", "role": "api_bot"}
 
     # 2) Nếu có cookie access_token thì check JWT
     token = request.cookies.get("access_token")
     if not token:
+        _record("failures", started, request)
         raise HTTPException(status_code=401, detail="Missing token")
 
-    try:
-        payload = jwt.decode(
-            token,
-            SUPABASE_JWT_SECRET,
-            algorithms=["HS256"],
-            audience=AUDIENCE
-        )
+    # 3) Fast path: token đã verify trước đó và chưa hết hạn
+    cache_key = hashlib.sha256(token.encode()).digest()
+    payload = _token_cache.get(cache_key)
+    if payload is not None:
+        _record("cache_hits", started, request)
         return payload
+
+    try:
+        payload = _decode_token(token)
     except jwt.ExpiredSignatureError:
+        _record("failures", started, request)
         raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
\ No newline at end of file
+    except (jwt.InvalidTokenError, jwt.PyJWKClientError):
+        _record("failures", started, request)
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    _token_cache.put(cache_key, payload)
+    _record("verified", started, request)
+    return payload
+
+
+def require_api_bot(request: Request) -> dict:
+    """Chỉ cho phép service call (X-API-Key), dùng cho các endpoint vận hành."""
+    payload = require_auth(request)
+    if payload.get("role") != "api_bot":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    return payload
@@ -0,0 +1,286 @@
+# server/http_cache.py
+"""
+HTTP caching + nén response.
+
+- conditional_json(): ETag mạnh từ nội dung kết quả; `If-None-Match` khớp -> 304
+  ngay, bỏ qua bước validate theo response_model và encode JSON.
+- trusted_json(): fast path cho dữ liệu đã đúng shape response_model (dòng SQL
+  theo cột whitelist): bỏ validate, encode bằng orjson, ETag hash trên bytes.
+- CacheControlMiddleware: Cache-Control theo prefix route (CACHE_POLICIES) cho
+  GET/HEAD nếu route chưa tự đặt.
+- CompressionMiddleware: br (nếu có module `brotli`) hoặc gzip theo
+  Accept-Encoding, chỉ với content-type dạng text và body >= HTTP_COMPRESS_MIN_SIZE.
+  Response stream (nhiều chunk) được nén từng chunk + flush.
+"""
+import hashlib
+import json
+import os
+import zlib
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
+from starlette.datastructures import Headers, MutableHeaders
+
+from server.metrics import HTTP_COMPRESSION_BYTES, HTTP_NOT_MODIFIED
+
+try:
+    import orjson
+except ImportError:  # thiếu orjson -> json chuẩn, output giống hệt
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli là tuỳ chọn, thiếu thì chỉ dùng gzip
+    brotli = None
+
+HTTP_COMPRESS_MIN_SIZE = int(os.getenv("HTTP_COMPRESS_MIN_SIZE", "1024"))
+HTTP_GZIP_LEVEL = int(os.getenv("HTTP_GZIP_LEVEL", "6"))
+HTTP_BROTLI_QUALITY = int(os.getenv("HTTP_BROTLI_QUALITY", "4"))
+
+# Prefix path -> Cache-Control (prefix dài nhất thắng)
+CACHE_POLICIES: Dict[str, str] = {
+    "/api/news": "public, max-age=30, stale-while-revalidate=60",
+    "/api/news/sections": "public, max-age=300",
+    "/api/news/trending": "public, max-age=15",
+    "/api/news/export": "private, no-store",
+    "/api/sentiment": "public, max-age=300",
+    "/api/realtime": "no-cache",
+    "/api/ai": "private, no-store",
+    "/api/auth": "private, no-store",
+    "/api/health": "no-store",
+    "/api/jobs": "private, no-cache",
+}
+
+_COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript", "image/svg+xml")
+_ENCODING_SUFFIXES = ("-gzip", "-br")
+
+
+# ---------- ETag ----------
+def make_etag(data) -> str:
+    # repr() của dict/list/datetime ổn định và rẻ hơn nhiều so với validate + json encode
+    return '"%s"' % hashlib.blake2b(repr(data).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _strip_etag(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    for suffix in _ENCODING_SUFFIXES:
+        if tag.endswith(suffix):
+            return tag[: -len(suffix)]
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = _strip_etag(etag)
+    return any(_strip_etag(t) == target for t in if_none_match.split(","))
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        # giống pydantic: UTC -> "Z"
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data) -> bytes:
+    """JSON compact UTF-8, cùng format với JSONResponse + pydantic (datetime ISO 8601, UTC = Z)."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_UTC_Z)
+    return json.dumps(data, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def _adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+def conditional_json(request: Request, data, model=None, headers: Optional[dict] = None) -> Response:
+    """
+    Trả 304 nếu client đã có đúng nội dung; ngược lại serialize `data` theo `model`
+    (giống response_model của route) kèm ETag.
+    """
+    etag = make_etag(data)
+    out_headers = {"ETag": etag, **(headers or {})}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        HTTP_NOT_MODIFIED.inc()
+        return Response(status_code=304, headers=out_headers)
+    if model is not None:
+        adapter = _adapter(model)
+        content = adapter.dump_python(adapter.validate_python(data), mode="json")
+    else:
+        content = data
+    return JSONResponse(content, headers=out_headers)
+
+
+def trusted_json(request: Request, data, headers: Optional[dict] = None) -> Response:
+    """
+    Như conditional_json nhưng không validate: chỉ dùng khi `data` đã có đúng các key
+    của response_model (route vẫn khai báo response_model nên OpenAPI không đổi).
+    Encode bằng orjson rẻ hơn repr() nên ETag lấy từ chính body.
+    """
+    body = dumps(data)
+    etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+    out_headers = {"ETag": etag, **(headers or {})}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        HTTP_NOT_MODIFIED.inc()
+        return Response(status_code=304, headers=out_headers)
+    return Response(body, media_type="application/json", headers=out_headers)
+
+
+# ---------- Cache-Control ----------
+def cache_policy_for_path(path: str) -> Optional[str]:
+    best, policy = -1, None
+    for prefix, value in CACHE_POLICIES.items():
+        if path.startswith(prefix) and len(prefix) > best:
+            best, policy = len(prefix), value
+    return policy
+
+
+class CacheControlMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+        policy = cache_policy_for_path(scope["path"])
+        if policy is None:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if "cache-control" not in headers:
+                    # Chỉ cache response thành công; lỗi (404/5xx, 503 đang nạp...) không được cache
+                    status = message["status"]
+                    headers["Cache-Control"] = policy if 200 <= status < 300 or status == 304 else "no-store"
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+# ---------- Compression ----------
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.lower()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=HTTP_BROTLI_QUALITY)
+        else:
+            self._obj = zlib.compressobj(HTTP_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        # flush để client nhận được dữ liệu của chunk này ngay (response stream)
+        if self.encoding == "br":
+            return self._obj.process(data) + self._obj.flush()
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._obj.process(data) + self._obj.finish()
+        return self._obj.compress(data) + self._obj.flush()
+
+
+def _compressible(message, headers: Headers) -> bool:
+    if message["status"] < 200 or message["status"] >= 300 or message["status"] == 204:
+        return False
+    if "content-encoding" in headers:
+        return False
+    ctype = headers.get("content-type", "")
+    # SSE phải tới client ngay từng event, không nén
+    return ctype.startswith(_COMPRESSIBLE_TYPES) and not ctype.startswith("text/event-stream")
+
+
+class CompressionMiddleware:
+    def __init__(self, app, min_size: int = HTTP_COMPRESS_MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message          # giữ lại tới khi biết kích thước / kiểu body
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+
+            if start is not None:
+                headers = MutableHeaders(scope=start)
+                if not _compressible(start, headers) or (not more and len(body) < self.min_size):
+                    passthrough = True
+                    await send(start)
+                    start = None
+                    return await send(message)
+
+                compressor = _Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if etag and etag.endswith('"') and not etag.startswith("W/"):
+                    headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+                if "content-length" in headers:
+                    del headers["content-length"]
+
+                if not more:
+                    data = compressor.finish(body)
+                    headers["Content-Length"] = str(len(data))
+                    HTTP_COMPRESSION_BYTES.labels("in").inc(len(body))
+                    HTTP_COMPRESSION_BYTES.labels("out").inc(len(data))
+                    await send(start)
+                    start = None
+                    return await send({"type": "http.response.body", "body": data})
+                await send(start)
+                start = None
+
+            data = compressor.chunk(body) if more else compressor.finish(body)
+            HTTP_COMPRESSION_BYTES.labels("in").inc(len(body))
+            HTTP_COMPRESSION_BYTES.labels("out").inc(len(data))
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,6 +1,14 @@
-from fastapi import FastAPI
+import asyncio
+import asyncpg
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from server.database import lifespan
+from server.metrics import MetricsMiddleware, DB_QUERY_CANCELED, DBQueryTimeout
+from server.profiling import ProfilingMiddleware, PROFILING_ENABLED
+from server.deadline import DeadlineMiddleware, DeadlineExceeded
+from server.http_cache import CacheControlMiddleware, CompressionMiddleware
 import os
 
 from fastapi.staticfiles import StaticFiles
@@ -9,13 +17,82 @@ from server.modules.health.router import router as health_router
 from server.modules.auth.router import router as auth_router
 from server.modules.news.router import router as news_router
 from server.modules.ai.router import router as ai_router
+from server.modules.ai.registry import MODEL_WATCH_INTERVAL
+from server.modules.ai.service import model_registry
+from server.modules.realtime.router import router as realtime_router
+from server.modules.realtime.service import NewsFeed, REALTIME_ENABLED
+from server.modules.news.trending import trending_index
+from server.modules.news.ingest import install_url_index
+from server.modules.news.service import NEWS_INSTALL_INDEXES, detect_duplicate_table, install_indexes as install_news_indexes
+from server.modules.news.related import related_index, RELATED_ENABLED
+from server.modules.news.dedup import (
+    DEDUP_ENABLED, DEDUP_INSTALL_SCHEMA, NEWS_DUPLICATE_SCHEMA_SQL, duplicate_detector,
+)
+from server.modules.sentiment.router import router as sentiment_router
+from server.modules.jobs.router import router as jobs_router
+from server.modules.jobs.service import JOB_INSTALL_SCHEMA, JOB_WORKERS, install_schema as install_job_schema, run_workers
+from server.modules.sentiment.service import (
+    SENTIMENT_BACKFILL_ENABLED, SENTIMENT_INSTALL_SCHEMA, install_schema, run_backfill,
+)
 from version import __version__
 print(__version__)  # 1.0.0
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # ra ngoài app/
 STATIC_DIR = os.path.join(BASE_DIR, "server", "static")
 
-app = FastAPI(title="Supa-FastAPI", version=__version__, lifespan=lifespan, docs_url=None)
+@asynccontextmanager
+async def app_lifespan(app: FastAPI):
+    async with lifespan(app):
+        # Một kết nối LISTEN dùng chung cho mỗi worker
+        app.state.news_feed = NewsFeed(app.state.db.primary) if REALTIME_ENABLED else None
+        if app.state.news_feed:
+            await app.state.news_feed.start()
+        # Khôi phục trending từ snapshot, rồi snapshot định kỳ
+        await asyncio.to_thread(trending_index.load)
+        snapshot_task = asyncio.create_task(trending_index.run_snapshots())
+        # Load model sentiment ở nền rồi theo dõi MODEL_DIR/ACTIVE để swap version
+        model_task = asyncio.create_task(model_registry.run_watcher()) if MODEL_WATCH_INTERVAL > 0 else None
+        if NEWS_INSTALL_INDEXES:
+            await install_news_indexes(app.state.db.primary)
+            await install_url_index(app.state.db.primary)
+        # Điểm sentiment lưu sẵn + rollup cho /api/sentiment
+        if SENTIMENT_INSTALL_SCHEMA:
+            await install_schema(app.state.db.primary)
+        backfill_task = asyncio.create_task(run_backfill(app.state.db.primary)) if SENTIMENT_BACKFILL_ENABLED else None
+        # Index bài liên quan: nạp nền, không chặn startup
+        related_task = asyncio.create_task(related_index.run(app.state.db)) if RELATED_ENABLED else None
+        # Phát hiện bài trùng: chỉ cần bật ở một process
+        if DEDUP_INSTALL_SCHEMA:
+            async with app.state.db.primary.acquire() as conn:
+                await conn.execute(NEWS_DUPLICATE_SCHEMA_SQL)
+        await detect_duplicate_table(app.state.db.primary)
+        dedup_task = asyncio.create_task(duplicate_detector.run(app.state.db.primary)) if DEDUP_ENABLED else None
+        # Worker cho job classify bất đồng bộ (/api/jobs)
+        if JOB_INSTALL_SCHEMA:
+            await install_job_schema(app.state.db.primary)
+        jobs_task = asyncio.create_task(run_workers(app.state.db.primary)) if JOB_WORKERS > 0 else None
+        try:
+            yield
+        finally:
+            if jobs_task:
+                jobs_task.cancel()
+            if dedup_task:
+                dedup_task.cancel()
+            if related_task:
+                related_task.cancel()
+            if backfill_task:
+                backfill_task.cancel()
+            if model_task:
+                model_task.cancel()
+            snapshot_task.cancel()
+            try:
+                await trending_index.save_async()
+            except Exception as e:
+                print(f"Trending snapshot failed: {e}")
+            if app.state.news_feed:
+                await app.state.news_feed.stop()
+
+app = FastAPI(title="Supa-FastAPI", version=__version__, lifespan=app_lifespan, docs_url=None)
 
 origins = [
     "http://localhost:3000",
@@ -24,6 +101,9 @@ origins = [
     "https://smart-new-ai-client.vercel.app"
 ]
 
+# Trong cùng: gắn deadline + huỷ request khi client ngắt kết nối
+app.add_middleware(DeadlineMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins, 
@@ -32,6 +112,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cache-Control theo route, rồi nén (gzip/br) phần body đã hoàn chỉnh
+app.add_middleware(CacheControlMiddleware)
+app.add_middleware(CompressionMiddleware)
+
+app.add_middleware(MetricsMiddleware)
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Query vượt statement_timeout (server) hoặc command_timeout (client) -> 504
+@app.exception_handler(asyncpg.exceptions.QueryCanceledError)
+@app.exception_handler(DBQueryTimeout)
+async def query_timeout_handler(request: Request, exc: Exception):
+    DB_QUERY_CANCELED.inc()
+    return JSONResponse(status_code=504, content={"detail": "Database query timeout"})
+
+# Timeout khác (không phải query DB) -> vẫn 504 nhưng không tính vào DB_QUERY_CANCELED
+@app.exception_handler(asyncio.TimeoutError)
+async def timeout_handler(request: Request, exc: Exception):
+    return JSONResponse(status_code=504, content={"detail": "Upstream timeout"})
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": f"Request deadline exceeded ({exc.stage})"})
+
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
 app.include_router(health_router, prefix=f"/api")
@@ -39,3 +143,6 @@ app.include_router(auth_router, prefix=f"/api")
 app.include_router(news_router, prefix=f"/api")
 app.include_router(docs_router, prefix=f"/api")
 app.include_router(ai_router, prefix=f"/api")
+app.include_router(realtime_router, prefix=f"/api")
+app.include_router(sentiment_router, prefix=f"/api")
+app.include_router(jobs_router, prefix=f"/api")
@@ -0,0 +1,205 @@
+# server/metrics.py
+"""
+Metrics kiểu Prometheus cho toàn bộ server.
+
+- MetricsMiddleware: latency histogram theo route template, số request in-flight.
+- InstrumentedPool: bọc asyncpg pool để đo thời gian chờ acquire.
+- observe_stage(): đo từng stage trong pipeline AI (preprocess, tokenize, predict, llm...).
+- render_metrics(app): cập nhật gauge runtime (pool, auth, rate limit) rồi xuất text format.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from fastapi import HTTPException
+from starlette.routing import Match
+
+from server.dependencies import AUTH_STATS
+from server.ratelimit import limiter
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency theo route",
+    ["method", "route", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Số request đang xử lý")
+
+AUTH_SECONDS = Histogram(
+    "auth_duration_seconds",
+    "Thời gian require_auth cho mỗi request",
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05),
+)
+AUTH_EVENTS = Gauge("auth_events", "Số lần require_auth theo kết quả (cộng dồn)", ["kind"])
+
+AI_STAGE_SECONDS = Histogram(
+    "ai_stage_duration_seconds",
+    "Thời gian từng stage trong pipeline AI",
+    ["stage"],
+    buckets=_LATENCY_BUCKETS,
+)
+
+DB_POOL_ACQUIRE_SECONDS = Histogram(
+    "db_pool_acquire_wait_seconds",
+    "Thời gian chờ lấy connection từ pool",
+    ["pool"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+DB_POOL_ACQUIRE_TIMEOUTS = Counter("db_pool_acquire_timeouts", "Số lần acquire connection bị timeout", ["pool"])
+DB_QUERY_CANCELED = Counter("db_query_canceled", "Số query bị huỷ do timeout")
+DB_POOL_SIZE = Gauge("db_pool_size", "Số connection hiện có trong pool", ["pool"])
+DB_POOL_IDLE = Gauge("db_pool_idle", "Số connection rảnh", ["pool"])
+DB_POOL_ACQUIRED = Gauge("db_pool_acquired", "Số connection đang được dùng", ["pool"])
+DB_POOL_MAX = Gauge("db_pool_max_size", "Kích thước tối đa của pool", ["pool"])
+DB_POOL_HEALTHY = Gauge("db_pool_healthy", "Replica đang được dùng để đọc (1) hay bị loại (0)", ["pool"])
+
+REQUESTS_CANCELLED = Counter(
+    "requests_cancelled", "Request bị huỷ giữa chừng (client ngắt / quá deadline)", ["reason"]
+)
+WORK_SKIPPED = Counter(
+    "work_skipped", "Đơn vị công việc được bỏ qua nhờ deadline/huỷ (query, item inference)", ["stage"]
+)
+
+SINGLEFLIGHT_CALLS = Counter(
+    "singleflight_calls", "Request được gộp: leader chạy thật, follower dùng lại kết quả", ["group", "role"]
+)
+
+REALTIME_SUBSCRIBERS = Gauge("realtime_subscribers", "Số subscriber SSE đang kết nối")
+REALTIME_EVENTS = Counter("realtime_events", "Số notify bài viết mới nhận từ Postgres")
+REALTIME_DROPPED = Counter("realtime_dropped", "Số event bị bỏ do subscriber/feed đầy")
+
+HTTP_NOT_MODIFIED = Counter("http_not_modified", "Số response 304 (If-None-Match khớp ETag)")
+HTTP_COMPRESSION_BYTES = Counter(
+    "http_compression_bytes", "Bytes body trước (in) và sau (out) khi nén response", ["stage"]
+)
+
+RATE_LIMIT_SHED = Gauge("rate_limit_shed", "Số request AI bị từ chối (cộng dồn)", ["reason"])
+RATE_LIMIT_IN_FLIGHT = Gauge("rate_limit_in_flight", "Request AI in-flight theo priority class", ["class"])
+
+
+@contextmanager
+def observe_stage(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        AI_STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    app = scope.get("app")
+    router = getattr(app, "router", None)
+    for r in getattr(router, "routes", ()):
+        match, _ = r.matches(scope)
+        if match == Match.FULL:
+            return getattr(r, "path", "unmatched")
+    # Không dùng path gốc làm label để tránh bùng nổ cardinality
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            elapsed = time.perf_counter() - started
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], _route_label(scope), str(status_holder["status"])
+            ).observe(elapsed)
+            auth_seconds = (scope.get("state") or {}).get("auth_seconds")
+            if auth_seconds is not None:
+                AUTH_SECONDS.observe(auth_seconds)
+
+
+class DBQueryTimeout(asyncio.TimeoutError):
+    """Timeout (command_timeout / timeout=) của một query chạy trên connection lấy từ pool."""
+
+
+class _TimedAcquire:
+    __slots__ = ("_ctx", "_name")
+
+    def __init__(self, ctx, name):
+        self._ctx = ctx
+        self._name = name
+
+    async def __aenter__(self):
+        started = time.perf_counter()
+        try:
+            conn = await self._ctx.__aenter__()
+        except asyncio.TimeoutError:
+            DB_POOL_ACQUIRE_TIMEOUTS.labels(self._name).inc()
+            raise HTTPException(status_code=503, detail="Database busy", headers={"Retry-After": "1"})
+        DB_POOL_ACQUIRE_SECONDS.labels(self._name).observe(time.perf_counter() - started)
+        return conn
+
+    async def __aexit__(self, exc_type, exc, tb):
+        suppressed = await self._ctx.__aexit__(exc_type, exc, tb)
+        # asyncpg báo timeout bằng asyncio.TimeoutError chung -> đánh dấu là timeout DB
+        if exc_type is not None and issubclass(exc_type, asyncio.TimeoutError) and not isinstance(exc, DBQueryTimeout):
+            raise DBQueryTimeout("Database query timeout") from exc
+        return suppressed
+
+
+class InstrumentedPool:
+    """Proxy asyncpg.Pool: đo thời gian acquire, các thuộc tính khác chuyển thẳng cho pool gốc."""
+
+    def __init__(self, pool, acquire_timeout=None, name="primary"):
+        self._pool = pool
+        self.acquire_timeout = acquire_timeout
+        self.name = name
+
+    def acquire(self, *, timeout=None):
+        if timeout is None:
+            timeout = self.acquire_timeout
+        return _TimedAcquire(self._pool.acquire(timeout=timeout), self.name)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+def _collect_runtime_stats(app):
+    db = getattr(app.state, "db", None)
+    if db is not None:
+        for pool in db.pools():
+            size, idle = pool.get_size(), pool.get_idle_size()
+            DB_POOL_SIZE.labels(pool.name).set(size)
+            DB_POOL_IDLE.labels(pool.name).set(idle)
+            DB_POOL_ACQUIRED.labels(pool.name).set(size - idle)
+            DB_POOL_MAX.labels(pool.name).set(pool.get_max_size())
+        for name, ok in zip(db.replica_names, db.healthy):
+            DB_POOL_HEALTHY.labels(name).set(1 if ok else 0)
+
+    for kind in ("api_key", "cache_hits", "verified", "failures"):
+        AUTH_EVENTS.labels(kind).set(AUTH_STATS[kind])
+
+    for reason, n in limiter.shed.items():
+        RATE_LIMIT_SHED.labels(reason).set(n)
+    for name, n in limiter.inflight().items():
+        RATE_LIMIT_IN_FLIGHT.labels(name).set(n)
+
+
+def render_metrics(app):
+    _collect_runtime_stats(app)
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,188 @@
+# server/modules/ai/context.py
+"""
+Article context store cho chatbot.
+
+Thay vì client upload toàn bộ `article` mỗi câu hỏi, server load bài viết từ
+bảng `news` một lần, làm sạch HTML, tách đoạn và cache lại. Mỗi câu hỏi chỉ
+forward top-k đoạn liên quan nhất (xếp hạng BM25 đơn giản) sang n8n.
+"""
+import math
+import os
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+CHAT_CONTEXT_CACHE_SIZE = int(os.getenv("CHAT_CONTEXT_CACHE_SIZE", "256"))
+CHAT_CONTEXT_TTL = float(os.getenv("CHAT_CONTEXT_TTL", "900"))
+CHAT_CONTEXT_TOP_K = int(os.getenv("CHAT_CONTEXT_TOP_K", "4"))
+
+# Đoạn quá ngắn (caption, byline...) được gộp vào đoạn kế tiếp
+_MIN_PARAGRAPH_CHARS = 80
+_BLOCK_TAGS = ["p", "li", "h1", "h2", "h3", "h4", "blockquote", "pre"]
+_DROP_TAGS = ["script", "style", "noscript", "iframe", "figure", "figcaption", "aside", "nav", "form"]
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_WS_RE = re.compile(r"\s+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how in is it its of on or "
+    "that the this to was were what when where which who why will with".split()
+)
+
+# BM25 params
+_K1 = 1.2
+_B = 0.75
+
+
+def _tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+def _merge_short(blocks: List[str]) -> List[str]:
+    out: List[str] = []
+    buf = ""
+    for b in blocks:
+        buf = f"{buf} {b}".strip() if buf else b
+        if len(buf) >= _MIN_PARAGRAPH_CHARS:
+            out.append(buf)
+            buf = ""
+    if buf:
+        if out:
+            out[-1] = f"{out[-1]} {buf}"
+        else:
+            out.append(buf)
+    return out
+
+
+def clean_article(raw: Optional[str]) -> List[str]:
+    """
+    HTML/plain text -> list đoạn văn đã gọn (bỏ tag, khoảng trắng thừa, đoạn trùng).
+    """
+    raw = (raw or "").strip()
+    if not raw:
+        return []
+
+    if "<" in raw and ">" in raw:
+        soup = BeautifulSoup(raw, "lxml")
+        for tag in soup(_DROP_TAGS):
+            tag.decompose()
+        blocks = [el.get_text(" ", strip=True) for el in soup.find_all(_BLOCK_TAGS)]
+        if not any(blocks):
+            blocks = soup.get_text("\n").split("\n")
+    else:
+        blocks = re.split(r"\n\s*\n|\n", raw)
+
+    seen = set()
+    cleaned: List[str] = []
+    for b in blocks:
+        text = _WS_RE.sub(" ", b or "").strip()
+        if text and text not in seen:
+            seen.add(text)
+            cleaned.append(text)
+    return _merge_short(cleaned)
+
+
+class ArticleContext:
+    """Bài viết đã tách đoạn + thống kê term cho BM25."""
+
+    __slots__ = ("news_id", "title", "paragraphs", "_tfs", "_lens", "_df", "_avg_len", "created_at")
+
+    def __init__(self, news_id: str, title: Optional[str], paragraphs: List[str]):
+        self.news_id = news_id
+        self.title = title or ""
+        self.paragraphs = paragraphs
+        self._tfs = [Counter(_tokenize(p)) for p in paragraphs]
+        self._lens = [sum(tf.values()) for tf in self._tfs]
+        self._avg_len = (sum(self._lens) / len(self._lens)) if self._lens else 0.0
+        df: Counter = Counter()
+        for tf in self._tfs:
+            df.update(tf.keys())
+        self._df: Dict[str, int] = dict(df)
+        self.created_at = time.monotonic()
+
+    def _scores(self, terms: List[str]) -> List[float]:
+        n = len(self.paragraphs)
+        scores = [0.0] * n
+        avg = self._avg_len or 1.0
+        for term in set(terms):
+            df = self._df.get(term)
+            if not df:
+                continue
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for i, tf in enumerate(self._tfs):
+                f = tf.get(term)
+                if f:
+                    denom = f + _K1 * (1 - _B + _B * self._lens[i] / avg)
+                    scores[i] += idf * f * (_K1 + 1) / denom
+        return scores
+
+    def top_paragraphs(self, question: str, k: int) -> List[str]:
+        """Top-k đoạn liên quan nhất, giữ nguyên thứ tự xuất hiện trong bài."""
+        if k <= 0 or not self.paragraphs:
+            return []
+        if len(self.paragraphs) <= k:
+            return list(self.paragraphs)
+
+        scores = self._scores(_tokenize(question))
+        if not any(scores):
+            # Không khớp từ nào -> lấy phần mở đầu bài viết
+            return self.paragraphs[:k]
+        best = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+        return [self.paragraphs[i] for i in sorted(best)]
+
+    def build_context(self, question: str, k: int) -> str:
+        parts = self.top_paragraphs(question, k)
+        if self.title:
+            parts = [self.title] + parts
+        return "\n\n".join(parts)
+
+
+class ArticleContextStore:
+    """LRU + TTL cache cho ArticleContext theo news_id."""
+
+    def __init__(self, max_items: int = CHAT_CONTEXT_CACHE_SIZE, ttl: float = CHAT_CONTEXT_TTL):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items: "OrderedDict[str, ArticleContext]" = OrderedDict()
+
+    def _get_cached(self, news_id: str) -> Optional[ArticleContext]:
+        ctx = self._items.get(news_id)
+        if ctx is None:
+            return None
+        if time.monotonic() - ctx.created_at > self.ttl:
+            self._items.pop(news_id, None)
+            return None
+        self._items.move_to_end(news_id)
+        return ctx
+
+    def _put(self, ctx: ArticleContext) -> None:
+        self._items[ctx.news_id] = ctx
+        self._items.move_to_end(ctx.news_id)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def invalidate(self, news_id: str) -> None:
+        self._items.pop(news_id, None)
+
+    async def get(self, pool, news_id: str) -> Optional[ArticleContext]:
+        ctx = self._get_cached(news_id)
+        if ctx is not None:
+            return ctx
+
+        sql = "SELECT id, title, article FROM news WHERE id = $1 LIMIT 1"
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow(sql, news_id)
+        if not row:
+            return None
+
+        ctx = ArticleContext(news_id, row["title"], clean_article(row["article"]))
+        self._put(ctx)
+        return ctx
+
+    def stats(self) -> Tuple[int, int]:
+        return len(self._items), self.max_items
+
+
+article_contexts = ArticleContextStore()
@@ -0,0 +1,215 @@
+# server/modules/ai/registry.py
+"""
+Registry model sentiment theo version, đổi model không cần restart.
+
+Bố cục MODEL_DIR:
+- MODEL_DIR/<version>/  chứa một file model (*.keras | *.h5) + tokenizer (DEFAULT_TOKENIZER
+  hoặc *.pkl); version = tên thư mục.
+- Kiểu cũ: MODEL_DIR/DEFAULT_MODEL + MODEL_DIR/DEFAULT_TOKENIZER; version = DEFAULT_MODEL
+  (trùng giá trị model_version đã lưu trước đây).
+- MODEL_DIR/ACTIVE (tuỳ chọn): tên version đang dùng. Mọi worker đọc lại file này mỗi
+  MODEL_WATCH_INTERVAL giây -> deploy model mới = chép thư mục version rồi ghi ACTIVE.
+
+Đổi version: load + warm-up ở thread nền, xong mới ghi ACTIVE (nếu pin) và gán `active`
+(một phép gán dưới lock). Version load lỗi không được pin, watcher cũng không thử lại
+cho tới khi ACTIVE đổi.
+Batch đang chạy giữ tham chiếu tới version cũ qua `use()`; version cũ bị bỏ khi batch
+cuối cùng dùng nó kết thúc.
+"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from server.config import DEFAULT_MODEL, DEFAULT_TOKENIZER, MODEL_DIR
+
+MODEL_VERSION = os.getenv("MODEL_VERSION", "")
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "30"))
+MODEL_ACTIVE_FILE = "ACTIVE"
+_MODEL_SUFFIXES = (".keras", ".h5")
+
+
+class ModelVersion:
+    """Model + tokenizer đã load và warm-up của một version."""
+
+    def __init__(self, version: str, model, tokenizer):
+        self.version = version
+        self.model = model
+        self.tokenizer = tokenizer
+        self.loaded_at = time.time()
+        self.inflight = 0
+        # Dữ liệu dẫn xuất theo version (vd. ma trận embedding)
+        self.extras: Dict[str, object] = {}
+
+
+class ModelRegistry:
+    def __init__(
+        self,
+        loader: Callable[[Path, Path], Tuple[object, object]],
+        warmup: Callable[[object, object], None],
+        model_dir: Path = MODEL_DIR,
+    ):
+        self.loader = loader
+        self.warmup = warmup
+        self.model_dir = Path(model_dir)
+        self.active: Optional[ModelVersion] = None
+        self.retired: List[ModelVersion] = []
+        self.loading: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.failed_version: Optional[str] = None
+        self._lock = threading.Lock()        # active / retired / inflight
+        self._load_lock = threading.Lock()   # mỗi lúc chỉ load một version
+
+    # ---------- version trên đĩa ----------
+    def available(self) -> List[str]:
+        if not self.model_dir.is_dir():
+            return []
+        out = []
+        for p in sorted(self.model_dir.iterdir()):
+            if p.is_dir() and any(f.suffix in _MODEL_SUFFIXES for f in p.iterdir()):
+                out.append(p.name)
+            elif p.is_file() and p.suffix in _MODEL_SUFFIXES:
+                out.append(p.name)
+        return out
+
+    def resolve(self, version: str) -> Tuple[Path, Path]:
+        """version -> (đường dẫn model, đường dẫn tokenizer)."""
+        if version not in self.available():
+            raise FileNotFoundError(f"Model version not found in {self.model_dir}: {version}")
+        path = self.model_dir / version
+        if path.is_file():
+            return path, self.model_dir / DEFAULT_TOKENIZER
+        model_path = next(f for s in _MODEL_SUFFIXES for f in sorted(path.glob(f"*{s}")))
+        tokenizer_path = path / DEFAULT_TOKENIZER
+        if not tokenizer_path.exists():
+            tokenizer_path = next(iter(sorted(path.glob("*.pkl"))), tokenizer_path)
+        return model_path, tokenizer_path
+
+    def pinned_version(self) -> str:
+        """Version cần chạy: file ACTIVE > env MODEL_VERSION > DEFAULT_MODEL."""
+        try:
+            pinned = (self.model_dir / MODEL_ACTIVE_FILE).read_text(encoding="utf-8").strip()
+        except OSError:
+            pinned = ""
+        return pinned or MODEL_VERSION or DEFAULT_MODEL
+
+    def pin(self, version: str):
+        """Ghi ACTIVE (atomic) để các worker khác cũng chuyển sang `version`."""
+        self.resolve(version)
+        target = self.model_dir / MODEL_ACTIVE_FILE
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_text(version + "\n", encoding="utf-8")
+        os.replace(tmp, target)
+
+    # ---------- load / swap ----------
+    def activate(self, version: str, pin: bool = False) -> ModelVersion:
+        """
+        Load + warm-up `version` (blocking) rồi chuyển traffic sang nó. pin=True: ghi
+        ACTIVE sau khi load thành công để các worker khác cũng chuyển.
+        """
+        with self._load_lock:
+            mv = self._activate_locked(version)
+            if pin:
+                self.pin(version)
+            return mv
+
+    def sync(self) -> Optional[ModelVersion]:
+        """Chuyển sang version đang pin (nếu khác); đọc lại ACTIVE dưới lock để không
+        đè lên một activate(pin=True) vừa xong."""
+        with self._load_lock:
+            version = self.pinned_version()
+            if version == self.failed_version:
+                return None
+            return self._activate_locked(version)
+
+    def _activate_locked(self, version: str) -> ModelVersion:
+        current = self.active
+        if current is not None and current.version == version:
+            return current
+        self.loading = version
+        try:
+            model_path, tokenizer_path = self.resolve(version)
+            if not tokenizer_path.exists():
+                raise FileNotFoundError(f"Tokenizer not found: {tokenizer_path}")
+            model, tokenizer = self.loader(model_path, tokenizer_path)
+            self.warmup(model, tokenizer)
+        except Exception as e:
+            self.last_error = f"{version}: {e}"
+            self.failed_version = version
+            raise
+        finally:
+            self.loading = None
+
+        mv = ModelVersion(version, model, tokenizer)
+        with self._lock:
+            old, self.active = self.active, mv
+            if old is not None and old.inflight > 0:
+                self.retired.append(old)
+        self.last_error = None
+        self.failed_version = None
+        print(f"Model {version} active" + (f" (was {old.version})" if old else ""))
+        return mv
+
+    def get(self) -> ModelVersion:
+        mv = self.active
+        if mv is None:
+            # Chưa có version nào: load đồng bộ (giống lazy-load trước đây); nếu watcher
+            # đang load đúng version này thì chỉ chờ nó xong
+            with self._load_lock:
+                mv = self._activate_locked(self.pinned_version())
+        return mv
+
+    @contextmanager
+    def use(self):
+        """Giữ một version cố định cho cả batch; swap giữa chừng không ảnh hưởng batch này."""
+        with self._lock:
+            mv = self.active
+            if mv is not None:
+                mv.inflight += 1
+        if mv is None:
+            mv = self.get()
+            with self._lock:
+                mv.inflight += 1
+        try:
+            yield mv
+        finally:
+            with self._lock:
+                mv.inflight -= 1
+                if mv.inflight == 0 and mv in self.retired:
+                    self.retired.remove(mv)
+                    print(f"Model {mv.version} drained")
+
+    def active_version(self) -> Optional[str]:
+        mv = self.active
+        return mv.version if mv is not None else None
+
+    def status(self) -> dict:
+        with self._lock:
+            active = self.active
+            retired = [{"version": m.version, "inflight": m.inflight} for m in self.retired]
+        return {
+            "active": active.version if active else None,
+            "active_inflight": active.inflight if active else 0,
+            "loaded_at": active.loaded_at if active else None,
+            "pinned": self.pinned_version(),
+            "loading": self.loading,
+            "draining": retired,
+            "available": self.available(),
+            "last_error": self.last_error,
+        }
+
+    async def run_watcher(self, interval: float = MODEL_WATCH_INTERVAL):
+        """Load version ở nền lúc khởi động, rồi theo dõi ACTIVE để swap khi đổi."""
+        while True:
+            try:
+                version = self.pinned_version()
+                if version not in (self.active_version(), self.loading, self.failed_version):
+                    await asyncio.to_thread(self.sync)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Model registry error: {e}")
+            await asyncio.sleep(interval)
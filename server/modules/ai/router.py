@@ -1,9 +1,18 @@
 from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
 from fastapi.responses import JSONResponse
-from server.modules.ai.schemas import ChatBotInput, MultipleNewsInput,ClassificationMultipleNewsOutput, NewsInput, NewsFetchOutput , NewsAnalysisResponse, NewsAnalysisInput, ChatBotResponse
-from server.modules.ai.service import classify_news, analyze_news, get_chat_history
+from server.modules.ai.schemas import ChatBotInput, MultipleNewsInput,ClassificationMultipleNewsOutput, NewsInput, NewsFetchOutput , NewsAnalysisResponse, NewsAnalysisInput, ChatBotResponse, ModelActivateInput, ModelRegistryStatus
+from server.modules.ai.service import classify_news, analyze_news, get_chat_history, model_registry
+from server.modules.ai.context import article_contexts, CHAT_CONTEXT_TOP_K
 from server.modules.news.service import list_news
-from server.dependencies import require_auth
+from server.dependencies import require_api_bot, require_auth
+from server.ratelimit import limiter
+from server.metrics import observe_stage
+from server.database import get_read_pool
+from server.deadline import DeadlineExceeded, get_deadline
+from server.singleflight import SingleFlight, uses_primary
+import asyncio
+import asyncpg
+from fastapi.concurrency import run_in_threadpool
 from typing import List
 from dotenv import load_dotenv
 import requests
@@ -20,43 +29,97 @@ N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL")
 
 router = APIRouter(prefix="/ai", tags=["AI"])
 
+fetch_classify_flight = SingleFlight("fetch_and_classify_news")
+
 @router.post(
     "/classify_news",
     response_model=ClassificationMultipleNewsOutput,
-    dependencies=[Depends(require_auth)],
 )
-async def classify_news_route(news_data: MultipleNewsInput):
-    return classify_news(news_data.news)
+async def classify_news_route(news_data: MultipleNewsInput, request: Request, principal: dict = Depends(require_auth)):
+    async with limiter.admit(principal, "classify_news", units=len(news_data.news)):
+        # model.predict là CPU-bound -> chạy trong threadpool để không block event loop
+        return await run_in_threadpool(classify_news, news_data.news, get_deadline(request))
+
+# Giữ tham chiếu tới task load model nền để không bị GC giữa chừng
+_activation_tasks = set()
+
+
+async def _activate_in_background(version: str):
+    try:
+        # Chỉ ghi ACTIVE (các worker khác chuyển theo) khi load + warm-up thành công
+        await asyncio.to_thread(model_registry.activate, version, True)
+    except Exception as e:
+        print(f"Model activation failed: {e}")
+
+
+@router.get("/models", response_model=ModelRegistryStatus, dependencies=[Depends(require_api_bot)])
+async def list_models():
+    return model_registry.status()
+
 
-@router.post("/analyze-news", response_model=NewsAnalysisResponse, dependencies=[Depends(require_auth)])
-async def analyze_news_route(payload: NewsAnalysisInput):
-    return analyze_news(payload)
+@router.post(
+    "/models/activate",
+    summary="Load + warm up a model version in the background, then switch traffic to it",
+    response_model=ModelRegistryStatus,
+    status_code=202,
+    dependencies=[Depends(require_api_bot)],
+)
+async def activate_model(payload: ModelActivateInput):
+    if payload.version not in model_registry.available():
+        raise HTTPException(status_code=404, detail=f"Model version not found: {payload.version}")
+    task = asyncio.create_task(_activate_in_background(payload.version))
+    _activation_tasks.add(task)
+    task.add_done_callback(_activation_tasks.discard)
+    status = model_registry.status()
+    status["loading"] = status["loading"] or payload.version
+    return status
+
+@router.post("/analyze-news", response_model=NewsAnalysisResponse)
+async def analyze_news_route(payload: NewsAnalysisInput, principal: dict = Depends(require_auth)):
+    async with limiter.admit(principal, "analyze_news"):
+        return await run_in_threadpool(analyze_news, payload)
 
 @router.get("/chat-history/{session_id}", dependencies=[Depends(require_auth)])
 async def get_user_chat_history(
     request: Request,
     session_id: str,
-    limit: int = 100,
-    offset: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0, description="Chỉ dùng khi không có after_id/before_id"),
+    after_id: Optional[int] = Query(None, description="Lấy message có id > after_id (polling)"),
+    before_id: Optional[int] = Query(None, description="Lấy message có id < before_id (trang cũ hơn)"),
 ):
-    return await get_chat_history(request, session_id, limit, offset)
+    return await get_chat_history(request, session_id, limit, offset, after_id, before_id)
+
 
+@router.post("/chatbot", response_model=ChatBotResponse)
+async def chatbot_route(payload: ChatBotInput, request: Request, principal: dict = Depends(require_auth)):
+    async with limiter.admit(principal, "chatbot"):
+        return await _forward_chatbot(payload, request)
 
-@router.post("/chatbot", response_model=ChatBotResponse, dependencies=[Depends(require_auth)])
-async def chatbot_route(payload: ChatBotInput, request: Request):
+
+async def _forward_chatbot(payload: ChatBotInput, request: Request):
     access_token = request.cookies.get("access_token")
     headers = {}
     if access_token:
         headers["Authorization"] = f"Bearer {access_token}"
 
+    body = payload.model_dump(include={"selected", "question", "article"})
+    if payload.news_id:
+        # Chỉ forward các đoạn liên quan tới câu hỏi thay vì toàn bộ bài viết
+        ctx = await article_contexts.get(get_read_pool(request), payload.news_id)
+        if ctx is None:
+            raise HTTPException(status_code=404, detail="News not found")
+        body["article"] = ctx.build_context(payload.question, payload.top_k or CHAT_CONTEXT_TOP_K)
+
     try:
-        async with httpx.AsyncClient() as client:
-            r = await client.post(
-                N8N_WEBHOOK_URL,
-                json=payload.model_dump(),
-                headers=headers,
-                timeout=httpx.Timeout(60.0, connect=5.0)
-            )
+        with observe_stage("llm_chatbot"):
+            async with httpx.AsyncClient() as client:
+                r = await client.post(
+                    N8N_WEBHOOK_URL,
+                    json=body,
+                    headers=headers,
+                    timeout=httpx.Timeout(60.0, connect=5.0)
+                )
     except httpx.ConnectTimeout:
         raise HTTPException(status_code=504, detail="n8n connect timeout")
     except httpx.ReadTimeout:
@@ -92,6 +155,21 @@ async def fetch_and_classify_news(
     ✅ Lấy tin tức trực tiếp từ DB (qua list_news)
     ✅ Phân loại cảm xúc bằng mô hình glove+textcnn+lstm
     """
+    # Route public: giới hạn theo IP client
+    principal = {"sub": request.client.host if request.client else None, "role": "anonymous"}
+    async with limiter.admit(principal, "fetch_and_classify_news", units=limit):
+        q_norm = (q or "").strip() or None
+        key = (q_norm, date_from, date_to, limit, offset, order_by, (order_dir or "DESC").upper(), uses_primary(request))
+        return await fetch_classify_flight.do(
+            key,
+            request,
+            lambda shared_request: _fetch_and_classify(
+                shared_request, q_norm, date_from, date_to, limit, offset, order_by, order_dir
+            ),
+        )
+
+
+async def _fetch_and_classify(request, q, date_from, date_to, limit, offset, order_by, order_dir):
     try:
         # 1️⃣ Gọi trực tiếp hàm list_news() để lấy dữ liệu từ DB
         result = await list_news(
@@ -122,7 +200,7 @@ async def fetch_and_classify_news(
         ]
 
         # 3️⃣ Phân loại cảm xúc
-        classified = classify_news(news_list)
+        classified = await run_in_threadpool(classify_news, news_list, get_deadline(request))
 
         # 4️⃣ Gộp thông tin phân trang và meta
         return {
@@ -131,7 +209,7 @@ async def fetch_and_classify_news(
             "meta": result.get("meta"),
         }
 
-    except HTTPException:
+    except (HTTPException, DeadlineExceeded, asyncio.TimeoutError, asyncpg.exceptions.QueryCanceledError):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi xử lý: {e}")
\ No newline at end of file
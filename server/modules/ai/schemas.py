@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 
@@ -14,15 +14,34 @@ class ClassificationNewOutput(BaseModel):
     pos: float
     neg: float
     neu: float
+    model_version: Optional[str] = None
 
 class MultipleNewsInput(BaseModel):
     news: List[NewsInput]
 
 class ClassificationMultipleNewsOutput(BaseModel):
     news: List[ClassificationNewOutput]
+    model_version: Optional[str] = None
+
+class ModelActivateInput(BaseModel):
+    version: str = Field(..., description="Tên version trong MODEL_DIR (thư mục hoặc file model)")
+
+class ModelDraining(BaseModel):
+    version: str
+    inflight: int
+
+class ModelRegistryStatus(BaseModel):
+    active: Optional[str] = None
+    active_inflight: int = 0
+    loaded_at: Optional[float] = None
+    pinned: str
+    loading: Optional[str] = None
+    draining: List[ModelDraining] = []
+    available: List[str] = []
+    last_error: Optional[str] = None
 
 # server/schemas/ai_schema.py
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional
 
 class NewsAnalysisItem(BaseModel):
@@ -46,7 +65,15 @@ class NewsAnalysisResponse(BaseModel):
 class ChatBotInput(BaseModel):
     selected: str
     question: str
-    article: str
+    article: Optional[str] = Field(None, description="Nội dung bài viết (bỏ qua nếu gửi news_id)")
+    news_id: Optional[str] = Field(None, description="ID bài viết, server tự load & cắt ngữ cảnh liên quan")
+    top_k: Optional[int] = Field(None, ge=1, le=20, description="Số đoạn ngữ cảnh gửi cho LLM khi dùng news_id")
+
+    @model_validator(mode="after")
+    def _require_article_or_news_id(self):
+        if not self.article and not self.news_id:
+            raise ValueError("Cần cung cấp article hoặc news_id")
+        return self
 
 class ChatBotResponse(BaseModel):
     ok: str = Field(..., description="Trạng thái chat bot")
@@ -1,16 +1,20 @@
 from __future__ import annotations
 from fastapi import Request
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
+import os
 from textwrap import dedent
 from joblib import load
 import numpy as np
-import json
 from server.modules.ai.schemas import MultipleNewsInput, ClassificationMultipleNewsOutput, ClassificationNewOutput, NewsAnalysisResponse, NewsInput
-from server.config import TOKENIZER_PATH, MODEL_PATH
+from server.config import MODEL_PATH
+from server.metrics import observe_stage
+from server.database import get_read_pool
+from server.deadline import Deadline, query_timeout
+from server.modules.ai.registry import ModelRegistry, ModelVersion
 import text_hammer as th
 from tensorflow.keras import backend as K
-from tensorflow.keras.layers import Layer
+from tensorflow.keras.layers import Embedding, Layer
 from tensorflow.keras.models import load_model
 from tensorflow.keras.preprocessing.sequence import pad_sequences
 import pickle
@@ -48,26 +52,30 @@ def text_preprocessing(text: str) -> str:
 
 
 MAX_LEN = 81
+MODEL_WARMUP_BATCH = int(os.getenv("MODEL_WARMUP_BATCH", "64"))
 
 _MODEL = None
-_TOKENIZER = None
 
-def _get_model_and_tokenizer():
-    """Cache model và tokenizer."""
-    global _MODEL, _TOKENIZER
+def _load_keras_version(model_path: Path, tokenizer_path: Path):
+    with open(tokenizer_path, "rb") as f:
+        tokenizer = pickle.load(f)
+    model = load_model(model_path, custom_objects={"Attention": Attention})
+    return model, tokenizer
 
-    if _TOKENIZER is None:
-        if not TOKENIZER_PATH.exists():
-            raise FileNotFoundError(f"Tokenizer not found: {TOKENIZER_PATH}")
-        with open(TOKENIZER_PATH, "rb") as f:
-            _TOKENIZER = pickle.load(f)
+def _warmup_keras(model, tokenizer):
+    """Predict thử (batch 1 và batch lớn) để TF build/trace xong trước khi nhận traffic."""
+    seq = tokenizer.texts_to_sequences([text_preprocessing("warm up the sentiment model")])
+    X = pad_sequences(seq, maxlen=MAX_LEN, padding="post")
+    model.predict(X, verbose=0)
+    model.predict(np.repeat(X, MODEL_WARMUP_BATCH, axis=0), verbose=0)
 
-    if _MODEL is None:
-        if not MODEL_PATH.exists():
-            raise FileNotFoundError(f"Model not found: {MODEL_PATH}")
-        _MODEL = load_model(MODEL_PATH, custom_objects={"Attention": Attention})
+# Version model đang phục vụ (xem server/modules/ai/registry.py)
+model_registry = ModelRegistry(_load_keras_version, _warmup_keras)
 
-    return _MODEL, _TOKENIZER
+def _get_model_and_tokenizer():
+    """Model và tokenizer của version đang active."""
+    mv = model_registry.get()
+    return mv.model, mv.tokenizer
 
 def _get_model():
     global _MODEL, _CLASSES
@@ -92,12 +100,20 @@ def _predict_sentiment_keras(model, tokenizer, text_list: List[str]):
         return []
 
     # Encode
-    seq = tokenizer.texts_to_sequences(text_list)
-    X_pad = pad_sequences(seq, maxlen=MAX_LEN, padding="post")
+    with observe_stage("tokenize"):
+        seq = tokenizer.texts_to_sequences(text_list)
+        X_pad = pad_sequences(seq, maxlen=MAX_LEN, padding="post")
 
     # Predict
-    preds = model.predict(X_pad, verbose=0)  # (n_samples, 3)
+    with observe_stage("predict"):
+        preds = model.predict(X_pad, verbose=0)  # (n_samples, 3)
 
+    with observe_stage("normalize"):
+        return normalize_predictions(preds)
+
+
+def normalize_predictions(preds) -> List[Dict[str, float]]:
+    """(n, 3) output của model -> [{pos, neg, neu}] đã chuẩn hoá tổng = 1."""
     results = []
     for p in preds:
         pos, neg, neu = map(float, p)
@@ -105,20 +121,16 @@ def _predict_sentiment_keras(model, tokenizer, text_list: List[str]):
         if s > 0:
             pos, neg, neu = pos / s, neg / s, neu / s
         results.append({"pos": pos, "neg": neg, "neu": neu})
-
     return results
 
 
-def classify_news(news_data: List[NewsInput]) -> ClassificationMultipleNewsOutput:
-    model, tokenizer = _get_model_and_tokenizer()
-
-    texts = [
-        text_preprocessing(f"{n.title or ''} {n.description or ''}".strip())
-        for n in news_data
-    ]
+def classification_input_text(news: NewsInput) -> str:
+    return text_preprocessing(f"{news.title or ''} {news.description or ''}".strip())
 
-    predictions = _predict_sentiment_keras(model, tokenizer, texts)
 
+def build_classification_output(
+    news_data: List[NewsInput], predictions, model_version: Optional[str] = None
+) -> ClassificationMultipleNewsOutput:
     results: List[ClassificationNewOutput] = []
     for news, pred in zip(news_data, predictions):
         results.append(
@@ -129,14 +141,74 @@ def classify_news(news_data: List[NewsInput]) -> ClassificationMultipleNewsOutpu
                 pos=pred["pos"],
                 neg=pred["neg"],
                 neu=pred["neu"],
+                model_version=model_version,
             )
         )
+    return ClassificationMultipleNewsOutput(news=results, model_version=model_version)
+
+
+def _get_embedding_matrix(mv: Optional[ModelVersion] = None) -> np.ndarray:
+    """Ma trận embedding (vocab, dim) lấy từ layer Embedding của model (cache theo version)."""
+    mv = mv or model_registry.get()
+    emb = mv.extras.get("embeddings")
+    if emb is None:
+        layer = next((l for l in mv.model.layers if isinstance(l, Embedding)), None)
+        if layer is None:
+            raise RuntimeError("Model has no Embedding layer")
+        emb = mv.extras["embeddings"] = np.asarray(layer.get_weights()[0], dtype=np.float32)
+    return emb
+
+
+def embed_texts_with_version(texts: List[str]) -> Tuple[str, np.ndarray]:
+    """
+    Vector văn bản = trung bình embedding các token (cùng preprocessing/tokenizer
+    với classify_news), chuẩn hoá L2 -> cosine = dot product. Trả (model version,
+    float32 (n, dim)); văn bản không có token nào trong vocab -> vector 0.
+    """
+    with model_registry.use() as mv:
+        emb = _get_embedding_matrix(mv)
+        vocab = emb.shape[0]
+
+        with observe_stage("preprocess"):
+            seqs = mv.tokenizer.texts_to_sequences([text_preprocessing(t) for t in texts])
 
-    return ClassificationMultipleNewsOutput(news=results)
+        with observe_stage("embed"):
+            out = np.zeros((len(seqs), emb.shape[1]), dtype=np.float32)
+            for i, seq in enumerate(seqs):
+                ids = [t for t in seq if 0 < t < vocab]
+                if ids:
+                    out[i] = emb[ids].mean(axis=0)
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            np.divide(out, norms, out=out, where=norms > 0)
+    return mv.version, out
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    return embed_texts_with_version(texts)[1]
+
+
+def classify_news(news_data: List[NewsInput], deadline: Optional[Deadline] = None) -> ClassificationMultipleNewsOutput:
+    """
+    `deadline`: nếu request đã bị huỷ / hết hạn thì bỏ luôn phần inference còn lại
+    (kiểm tra trước mỗi stage vì hàm này chạy trong threadpool, không cancel được).
+    """
+    if deadline is not None:
+        deadline.check("inference", len(news_data))
+
+    # Cả batch dùng một version; swap giữa chừng chỉ áp dụng cho batch sau
+    with model_registry.use() as mv:
+        with observe_stage("preprocess"):
+            texts = [classification_input_text(n) for n in news_data]
+
+        if deadline is not None:
+            deadline.check("inference", len(news_data))
+        predictions = _predict_sentiment_keras(mv.model, mv.tokenizer, texts)
+
+    with observe_stage("build_output"):
+        return build_classification_output(news_data, predictions, mv.version)
 
 
 # server/services/ai_service.py
-import os
 from typing import List
 from fastapi import HTTPException, Request
 from dotenv import load_dotenv
@@ -200,13 +272,14 @@ def _call_chatgpt(system_prompt: str, user_prompt: str) -> str:
         raise HTTPException(status_code=500, detail="Thiếu OPENAI_API_KEY trong môi trường.")
     
     client = OpenAI(api_key=OPENAI_API_KEY)
-    resp = client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-    )
+    with observe_stage("llm"):
+        resp = client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+        )
     
     text = resp.choices[0].message.content.strip()
     if not text:
@@ -225,41 +298,76 @@ async def get_chat_history(
     session_id: str,
     limit: int = 100,
     offset: int = 0,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
 ):
-    pool = request.app.state.pool
-
-    sql = """
-        SELECT 
-            id,
-            session_id,
-            message
-        FROM n8n_chat_histories
-        WHERE session_id = $1
-        ORDER BY id ASC
-        LIMIT $2 OFFSET $3
     """
+    Keyset pagination trên `id` (cần index (session_id, id)):
+    - after_id: các message mới hơn after_id (dùng cho polling "since id")
+    - before_id: các message cũ hơn before_id (cuộn ngược lịch sử)
+    - không có cursor: LIMIT/OFFSET như cũ (tương thích ngược)
+    Luôn trả items theo id tăng dần; `message` đã được decode bởi codec json/jsonb của pool.
+    """
+    pool = get_read_pool(request)
+
+    if after_id is not None and before_id is not None:
+        raise HTTPException(status_code=400, detail="Chỉ dùng một trong after_id hoặc before_id")
+
+    # Lấy dư 1 dòng để biết còn trang tiếp theo hay không
+    fetch_n = limit + 1
+    if after_id is not None:
+        sql = """
+            SELECT id, session_id, message
+            FROM n8n_chat_histories
+            WHERE session_id = $1 AND id > $2
+            ORDER BY id ASC
+            LIMIT $3
+        """
+        args = (session_id, after_id, fetch_n)
+    elif before_id is not None:
+        sql = """
+            SELECT id, session_id, message
+            FROM n8n_chat_histories
+            WHERE session_id = $1 AND id < $2
+            ORDER BY id DESC
+            LIMIT $3
+        """
+        args = (session_id, before_id, fetch_n)
+    else:
+        sql = """
+            SELECT id, session_id, message
+            FROM n8n_chat_histories
+            WHERE session_id = $1
+            ORDER BY id ASC
+            LIMIT $2 OFFSET $3
+        """
+        args = (session_id, fetch_n, offset)
 
     async with pool.acquire() as conn:
-        rows = await conn.fetch(sql, session_id, limit, offset)
-
-    items = []
-    for r in rows:
-        msg = r["message"]
-        # Nếu message bị lưu dưới dạng string JSON, parse lại
-        if isinstance(msg, str):
-            try:
-                msg = json.loads(msg)
-            except json.JSONDecodeError:
-                pass
-
-        items.append({
-            "id": r["id"],
-            "session_id": r["session_id"],
-            "message": msg,
-        })
+        rows = await conn.fetch(sql, *args, timeout=query_timeout(request))
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before_id is not None:
+        rows = rows[::-1]
+
+    items = [
+        {"id": r["id"], "session_id": r["session_id"], "message": r["message"]}
+        for r in rows
+    ]
 
     return {
         "session_id": session_id,
         "items": items,
-        "page": {"limit": limit, "offset": offset, "total": len(items)},
+        "page": {
+            "limit": limit,
+            "offset": offset if after_id is None and before_id is None else None,
+            "total": len(items),
+            "has_more": has_more,
+            "after_id": after_id,
+            "before_id": before_id,
+            # Cursor cho lần gọi kế tiếp
+            "next_after_id": items[-1]["id"] if items else after_id,
+            "next_before_id": items[0]["id"] if items else before_id,
+        },
     }
@@ -0,0 +1,121 @@
+# server/modules/auth/client.py
+"""
+Async client cho Supabase Auth (GoTrue REST API).
+
+- Một httpx.AsyncClient dùng chung (connection pool + timeout) cho cả worker.
+- Không giữ session trong client: mọi thao tác theo user (sign out) nhận
+  access token của chính request đó -> không rò rỉ trạng thái giữa các user.
+- Semaphore giới hạn số request auth đồng thời để login spike không chiếm
+  hết tài nguyên của worker.
+- SUPABASE_AUTH_URL cho phép trỏ sang fake auth server khi test local.
+"""
+import asyncio
+import os
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv("SUPABASE_URL") or ""
+SUPABASE_KEY = os.getenv("SUPABASE_API_KEY") or ""
+SUPABASE_AUTH_URL = (os.getenv("SUPABASE_AUTH_URL") or f"{SUPABASE_URL.rstrip('/')}/auth/v1").rstrip("/")
+
+AUTH_HTTP_TIMEOUT = float(os.getenv("AUTH_HTTP_TIMEOUT", "10"))
+AUTH_HTTP_CONNECT_TIMEOUT = float(os.getenv("AUTH_HTTP_CONNECT_TIMEOUT", "3"))
+AUTH_HTTP_MAX_CONNECTIONS = int(os.getenv("AUTH_HTTP_MAX_CONNECTIONS", "20"))
+AUTH_MAX_CONCURRENCY = int(os.getenv("AUTH_MAX_CONCURRENCY", "20"))
+
+
+class AuthClient:
+    def __init__(
+        self,
+        base_url: str = SUPABASE_AUTH_URL,
+        api_key: str = SUPABASE_KEY,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"apikey": api_key, "Authorization": f"Bearer {api_key}"},
+            timeout=httpx.Timeout(AUTH_HTTP_TIMEOUT, connect=AUTH_HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=AUTH_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=AUTH_HTTP_MAX_CONNECTIONS,
+            ),
+            transport=transport,
+        )
+        self._sem = asyncio.Semaphore(AUTH_MAX_CONCURRENCY)
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def _request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        async with self._sem:
+            try:
+                r = await self._http.request(method, path, **kwargs)
+            except httpx.TimeoutException:
+                raise HTTPException(status_code=504, detail="Auth server timeout")
+            except httpx.RequestError as e:
+                raise HTTPException(status_code=502, detail=f"Auth server error: {e}")
+
+        try:
+            data = r.json() if r.content else {}
+        except ValueError:
+            data = {"msg": r.text}
+
+        if r.status_code >= 400:
+            message = (
+                data.get("msg")
+                or data.get("error_description")
+                or data.get("message")
+                or data.get("error")
+                or "Auth request failed."
+            )
+            status_code = r.status_code if r.status_code < 500 else 502
+            raise HTTPException(status_code=status_code, detail=message)
+        return data
+
+    async def sign_up(self, email: str, password: str, data: Optional[dict] = None) -> Dict[str, Any]:
+        return await self._request(
+            "POST", "/signup", json={"email": email, "password": password, "data": data or {}}
+        )
+
+    async def sign_in_with_password(self, email: str, password: str) -> Dict[str, Any]:
+        return await self._request(
+            "POST", "/token", params={"grant_type": "password"},
+            json={"email": email, "password": password},
+        )
+
+    async def sign_out(self, access_token: str) -> None:
+        # Chỉ revoke session của chính user này
+        await self._request(
+            "POST", "/logout", headers={"Authorization": f"Bearer {access_token}"}
+        )
+
+    def oauth_url(self, provider: str, redirect_to: Optional[str] = None) -> str:
+        params = {"provider": provider}
+        if redirect_to:
+            params["redirect_to"] = redirect_to
+        return f"{self.base_url}/authorize?{urlencode(params)}"
+
+
+_client: Optional[AuthClient] = None
+
+
+def get_auth_client() -> AuthClient:
+    global _client
+    if _client is None:
+        _client = AuthClient()
+    return _client
+
+
+async def close_auth_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
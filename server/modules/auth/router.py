@@ -10,21 +10,21 @@ router = APIRouter(prefix="/auth", tags=["Auth"])
         summary="Sign up a new user",
 )
 async def sign_up(user: UserSignUp):
-    return signup_user(user.email, user.password, user.username)
+    return await signup_user(user.email, user.password, user.username)
 
 @router.post(
     "/sign_in",
     summary="Sign in an existing user",
 )
 async def sign_in(user: UserSignIn, response: Response):
-    return signin_user(user.email, user.password, response)
+    return await signin_user(user.email, user.password, response)
 
 @router.post(
     "/sign_out",
     summary="Sign out the current user",
 )
-async def sign_out(response: Response):
-    return signout_user(response)
+async def sign_out(request: Request, response: Response):
+    return await signout_user(request, response)
 
 @router.get(
     "/current_user",
@@ -40,5 +40,4 @@ async def get_current_user(request: Request):
     response_model=OAuthURLResponse,
 )
 async def get_google_signin_url():
-    provider_response = signin_with_google()
-    return {"url": provider_response.url}
\ No newline at end of file
+    return signin_with_google()
\ No newline at end of file
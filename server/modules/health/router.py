@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Request
-from server.modules.health.service import ping, db
+from fastapi import APIRouter, Depends, Request
+from server.modules.health.service import ping, db, metrics, list_profiles, get_profile
+from server.dependencies import require_api_bot
 
 router = APIRouter(prefix="/health", tags=["Health"])
 
@@ -9,4 +10,17 @@ async def ping_fastAPI():
 
 @router.get("/database", summary="Check DB connectivity")
 async def health_db(request: Request):  
-    return await db(request)   
\ No newline at end of file
+    return await db(request)   
+
+@router.get("/metrics", summary="Prometheus metrics")
+async def health_metrics(request: Request):
+    return await metrics(request)
+
+
+@router.get("/profiles", summary="List recent request profiles", dependencies=[Depends(require_api_bot)])
+async def health_profiles():
+    return await list_profiles()
+
+@router.get("/profiles/{profile_id}", summary="Download a request profile", dependencies=[Depends(require_api_bot)])
+async def health_profile(profile_id: str):
+    return await get_profile(profile_id)
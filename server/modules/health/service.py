@@ -1,4 +1,7 @@
-from fastapi import Request
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from server.metrics import render_metrics
+from server.profiling import profile_store
 
 
 async def ping():
@@ -8,4 +11,18 @@ async def db(request: Request):
     pool = request.app.state.pool
     async with pool.acquire() as conn:
         row = await conn.fetchrow("SELECT now() AS ts")
-        return {"ok": True, "server_time": row["ts"], "error": None}
\ No newline at end of file
+        return {"ok": True, "server_time": row["ts"], "error": None}
+
+async def metrics(request: Request):
+    body, content_type = render_metrics(request.app)
+    return Response(content=body, media_type=content_type)
+
+
+async def list_profiles():
+    return {"items": profile_store.list()}
+
+async def get_profile(profile_id: str):
+    path = profile_store.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=profile_id, media_type="application/octet-stream")
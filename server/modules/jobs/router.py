@@ -0,0 +1,90 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from server.modules.ai.schemas import MultipleNewsInput
+from server.modules.jobs.schemas import ClassifyJobOut, ClassifyJobResultsPage
+from server.modules.jobs.service import (
+    JOB_MAX_ITEMS, JOB_RESULTS_MAX_PAGE, cancel_job, create_job, get_job, job_events, job_results,
+)
+from server.database import get_write_pool
+from server.dependencies import require_auth
+from server.ratelimit import limiter, principal_key
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+# Tiến độ phải mới nhất -> luôn đọc từ primary, không dùng replica
+
+@router.post(
+    "/classify",
+    summary="Submit a large batch for background sentiment classification",
+    response_model=ClassifyJobOut,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def submit_classify_job(
+    news_data: MultipleNewsInput,
+    request: Request,
+    response: Response,
+    principal: dict = Depends(require_auth),
+):
+    if not news_data.news:
+        raise HTTPException(status_code=400, detail="news không được rỗng")
+    if len(news_data.news) > JOB_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Tối đa {JOB_MAX_ITEMS} bài mỗi job",
+        )
+    async with limiter.admit(principal, "classify_job", units=len(news_data.news)):
+        job = await create_job(get_write_pool(request), principal_key(principal), news_data.news)
+    response.headers["Location"] = f"{request.url.path.rsplit('/', 1)[0]}/{job['job_id']}"
+    return job
+
+
+@router.get(
+    "/events/{job_id}",
+    summary="Server-Sent Events stream of job progress (ends when the job finishes)",
+    response_class=StreamingResponse,
+)
+async def stream_job_events(job_id: str, request: Request, principal: dict = Depends(require_auth)):
+    pool = get_write_pool(request)
+    owner = principal_key(principal)
+    if await get_job(pool, job_id, owner) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(
+        job_events(pool, job_id, owner),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/{job_id}", summary="Job status and progress", response_model=ClassifyJobOut)
+async def get_job_status(job_id: str, request: Request, principal: dict = Depends(require_auth)):
+    job = await get_job(get_write_pool(request), job_id, principal_key(principal))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get(
+    "/{job_id}/results",
+    summary="Page through classified items (in submission order)",
+    response_model=ClassifyJobResultsPage,
+)
+async def get_job_results(
+    job_id: str,
+    request: Request,
+    after: int = Query(-1, ge=-1, description="idx cuối cùng đã nhận (next_after của trang trước)"),
+    limit: int = Query(1000, ge=1, le=JOB_RESULTS_MAX_PAGE),
+    principal: dict = Depends(require_auth),
+):
+    pool = get_write_pool(request)
+    job = await get_job(pool, job_id, principal_key(principal))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await job_results(pool, job, after, limit)
+
+
+@router.delete("/{job_id}", summary="Cancel a queued or running job", response_model=ClassifyJobOut)
+async def delete_job(job_id: str, request: Request, principal: dict = Depends(require_auth)):
+    job = await cancel_job(get_write_pool(request), job_id, principal_key(principal))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+JobStatus = Literal["queued", "running", "done", "failed", "cancelled"]
+
+class ClassifyJobOut(BaseModel):
+    job_id: str
+    status: JobStatus
+    total: int = Field(..., description="Số bài trong job")
+    done: int = Field(..., description="Số bài đã chấm điểm")
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+class ClassifyJobResultItem(BaseModel):
+    idx: int = Field(..., description="Vị trí của bài trong batch đã gửi")
+    title: str
+    description: str
+    publish_date: Optional[datetime] = None
+    pos: float
+    neg: float
+    neu: float
+    model_version: Optional[str] = None
+
+class ClassifyJobResultsPage(BaseModel):
+    job_id: str
+    status: JobStatus
+    items: List[ClassifyJobResultItem]
+    next_after: int = Field(..., description="Truyền vào `after` để lấy trang kế tiếp (không đổi nếu chưa có kết quả mới)")
+    has_more: bool = Field(..., description="Còn kết quả chưa lấy (kể cả phần đang chấm)")
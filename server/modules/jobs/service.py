@@ -0,0 +1,371 @@
+# server/modules/jobs/service.py
+"""
+Job chấm điểm sentiment bất đồng bộ cho batch rất lớn.
+
+- classify_job + classify_job_item trong Postgres: worker/process nào cũng đọc được
+  trạng thái và kết quả, job sống qua restart.
+- Worker trong process lấy việc theo chunk (JOB_CHUNK_SIZE bài). Mỗi lần claim chọn
+  job được phục vụ lâu nhất rồi (served_at) -> các job đan xen round-robin, job nhỏ
+  không phải chờ job 100k bài chạy xong.
+- Item được claim bằng FOR UPDATE SKIP LOCKED + lease (claimed_until): nhiều process
+  chạy song song không trùng việc; process chết giữa chừng -> lease hết hạn, chunk
+  được claim lại.
+- Nhường traffic interactive: trước mỗi chunk, nếu đang có request AI interactive
+  in-flight (limiter) thì chờ tối đa JOB_YIELD_MAX giây.
+"""
+import asyncio
+import os
+import uuid
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from server.http_cache import dumps
+from server.modules.ai.schemas import NewsInput
+from server.modules.ai.service import classify_news
+from server.modules.sentiment.service import SENTIMENT_MODEL_VERSION
+from server.ratelimit import limiter
+
+JOB_INSTALL_SCHEMA = os.getenv("JOB_INSTALL_SCHEMA", "false").lower() in ("1", "true", "yes")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "0"))              # 0 = process này không chạy job
+JOB_CHUNK_SIZE = int(os.getenv("JOB_CHUNK_SIZE", "256"))
+JOB_MAX_ITEMS = int(os.getenv("JOB_MAX_ITEMS", "100000"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_YIELD_MAX = float(os.getenv("JOB_YIELD_MAX", "2"))
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "72"))
+JOB_EVENTS_INTERVAL = float(os.getenv("JOB_EVENTS_INTERVAL", "1"))
+JOB_RESULTS_MAX_PAGE = int(os.getenv("JOB_RESULTS_MAX_PAGE", "5000"))
+
+TERMINAL_STATUSES = ("done", "failed", "cancelled")
+
+JOB_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS classify_job (
+    id           TEXT PRIMARY KEY,
+    owner        TEXT NOT NULL,
+    status       TEXT NOT NULL DEFAULT 'queued',
+    total        INT NOT NULL,
+    done         INT NOT NULL DEFAULT 0,
+    attempts     INT NOT NULL DEFAULT 0,
+    error        TEXT,
+    created_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+    served_at    TIMESTAMPTZ,
+    finished_at  TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS classify_job_active_idx
+    ON classify_job (served_at NULLS FIRST, created_at) WHERE status IN ('queued', 'running');
+
+CREATE TABLE IF NOT EXISTS classify_job_item (
+    job_id         TEXT NOT NULL REFERENCES classify_job(id) ON DELETE CASCADE,
+    idx            INT NOT NULL,
+    title          TEXT NOT NULL,
+    description    TEXT NOT NULL,
+    publish_date   TIMESTAMPTZ,
+    pos            DOUBLE PRECISION,
+    neg            DOUBLE PRECISION,
+    neu            DOUBLE PRECISION,
+    model_version  TEXT,
+    claimed_until  TIMESTAMPTZ,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS classify_job_item_pending_idx ON classify_job_item (job_id, idx) WHERE pos IS NULL;
+"""
+
+_JOB_COLUMNS = "id, status, total, done, error, created_at, updated_at, finished_at"
+
+# Job còn item chưa chấm và chưa bị claim, phục vụ lâu nhất rồi trước
+_PICK_JOB_SQL = """
+    SELECT id FROM classify_job j
+    WHERE j.status IN ('queued', 'running')
+      AND EXISTS (
+          SELECT 1 FROM classify_job_item i
+          WHERE i.job_id = j.id AND i.pos IS NULL
+            AND (i.claimed_until IS NULL OR i.claimed_until < now())
+      )
+    ORDER BY j.served_at NULLS FIRST, j.created_at
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+"""
+
+_CLAIM_ITEMS_SQL = """
+    UPDATE classify_job_item SET claimed_until = now() + make_interval(secs => $2)
+    WHERE job_id = $1 AND idx IN (
+        SELECT idx FROM classify_job_item
+        WHERE job_id = $1 AND pos IS NULL
+          AND (claimed_until IS NULL OR claimed_until < now())
+        ORDER BY idx
+        LIMIT $3
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING idx, title, description, publish_date
+"""
+
+# Chỉ đếm item chưa có điểm -> chunk bị claim lại sau khi hết lease không bị đếm hai lần
+_COMPLETE_SQL = """
+    WITH r AS (
+        SELECT * FROM unnest($2::int[], $3::float8[], $4::float8[], $5::float8[]) AS r(idx, pos, neg, neu)
+    ), upd AS (
+        UPDATE classify_job_item i
+        SET pos = r.pos, neg = r.neg, neu = r.neu, model_version = $6, claimed_until = NULL
+        FROM r
+        WHERE i.job_id = $1 AND i.idx = r.idx AND i.pos IS NULL
+        RETURNING 1
+    ), n AS (SELECT count(*)::int AS c FROM upd)
+    UPDATE classify_job
+    SET done = done + n.c,
+        updated_at = now(),
+        status = CASE WHEN status = 'running' AND done + n.c >= total THEN 'done' ELSE status END,
+        finished_at = CASE WHEN status = 'running' AND done + n.c >= total THEN now() ELSE finished_at END
+    FROM n
+    WHERE id = $1
+"""
+
+_FAIL_SQL = """
+    UPDATE classify_job
+    SET attempts = attempts + 1,
+        error = $2,
+        updated_at = now(),
+        status = CASE WHEN attempts + 1 >= $3 AND status = 'running' THEN 'failed' ELSE status END,
+        finished_at = CASE WHEN attempts + 1 >= $3 AND status = 'running' THEN now() ELSE finished_at END
+    WHERE id = $1
+"""
+
+
+def _job_out(row) -> dict:
+    return {
+        "job_id": row["id"],
+        "status": row["status"],
+        "total": row["total"],
+        "done": row["done"],
+        "error": row["error"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+        "finished_at": row["finished_at"],
+    }
+
+
+async def install_schema(pool):
+    async with pool.acquire() as conn:
+        await conn.execute(JOB_SCHEMA_SQL)
+
+
+# ---------- API ----------
+async def create_job(pool, owner: str, news: List[NewsInput]) -> dict:
+    job_id = uuid.uuid4().hex
+    records = [(job_id, i, n.title or "", n.description or "", n.publish_date) for i, n in enumerate(news)]
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            row = await conn.fetchrow(
+                f"INSERT INTO classify_job (id, owner, total) VALUES ($1, $2, $3) RETURNING {_JOB_COLUMNS}",
+                job_id, owner, len(records),
+            )
+            await conn.copy_records_to_table(
+                "classify_job_item",
+                records=records,
+                columns=("job_id", "idx", "title", "description", "publish_date"),
+            )
+    notify_workers()
+    return _job_out(row)
+
+
+async def get_job(pool, job_id: str, owner: str) -> Optional[dict]:
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            f"SELECT {_JOB_COLUMNS} FROM classify_job WHERE id = $1 AND owner = $2", job_id, owner
+        )
+    return _job_out(row) if row else None
+
+
+async def cancel_job(pool, job_id: str, owner: str) -> Optional[dict]:
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            f"""
+            UPDATE classify_job SET status = 'cancelled', finished_at = now(), updated_at = now()
+            WHERE id = $1 AND owner = $2 AND status IN ('queued', 'running')
+            RETURNING {_JOB_COLUMNS}
+            """,
+            job_id, owner,
+        )
+    return _job_out(row) if row else await get_job(pool, job_id, owner)
+
+
+async def job_results(pool, job: dict, after: int, limit: int) -> dict:
+    """
+    Kết quả theo idx tăng dần, sau `after`. Job đang chạy/xong: dừng ở item đầu tiên
+    chưa có điểm để client đi tiếp bằng next_after mà không bỏ sót. Job failed/cancelled:
+    chỉ trả các item đã có điểm.
+    """
+    finished_only = job["status"] in ("failed", "cancelled")
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            f"""
+            SELECT idx, title, description, publish_date, pos, neg, neu, model_version
+            FROM classify_job_item
+            WHERE job_id = $1 AND idx > $2 {"AND pos IS NOT NULL" if finished_only else ""}
+            ORDER BY idx
+            LIMIT $3
+            """,
+            job["job_id"], after, limit,
+        )
+
+    items = []
+    for r in rows:
+        if r["pos"] is None:
+            break
+        items.append(dict(r))
+
+    next_after = items[-1]["idx"] if items else after
+    if finished_only:
+        has_more = len(rows) == limit
+    else:
+        has_more = next_after < job["total"] - 1
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "items": items,
+        "next_after": next_after,
+        "has_more": has_more,
+    }
+
+
+async def job_events(pool, job_id: str, owner: str, heartbeat: float = 15.0):
+    """SSE tiến độ: gửi `progress` mỗi khi status/done đổi, kết thúc khi job xong."""
+    last = None
+    idle = 0.0
+    yield "retry: 3000\n\n"
+    while True:
+        job = await get_job(pool, job_id, owner)
+        if job is None:
+            yield 'event: error\ndata: {"detail":"Job not found"}\n\n'
+            return
+        state = (job["status"], job["done"], job["error"])
+        if state != last:
+            last = state
+            idle = 0.0
+            yield f"event: progress\ndata: {dumps(job).decode('utf-8')}\n\n"
+        elif idle >= heartbeat:
+            idle = 0.0
+            yield ": ping\n\n"
+        if job["status"] in TERMINAL_STATUSES:
+            return
+        await asyncio.sleep(JOB_EVENTS_INTERVAL)
+        idle += JOB_EVENTS_INTERVAL
+
+
+# ---------- Worker ----------
+_wakeup: Optional[asyncio.Event] = None
+
+
+def notify_workers():
+    """Job mới trong process này -> worker claim ngay thay vì chờ JOB_POLL_INTERVAL."""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def claim_chunk(pool, size: int = JOB_CHUNK_SIZE):
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            job_id = await conn.fetchval(_PICK_JOB_SQL)
+            if job_id is None:
+                return None
+            rows = await conn.fetch(_CLAIM_ITEMS_SQL, job_id, JOB_LEASE_SECONDS, size)
+            await conn.execute(
+                "UPDATE classify_job SET status = 'running', served_at = now(), updated_at = now() "
+                "WHERE id = $1 AND status IN ('queued', 'running')",
+                job_id,
+            )
+    return job_id, sorted(rows, key=lambda r: r["idx"])
+
+
+async def process_chunk(pool, size: int = JOB_CHUNK_SIZE) -> int:
+    claim = await claim_chunk(pool, size)
+    if claim is None:
+        return 0
+    job_id, rows = claim
+    if not rows:
+        return 0
+    idxs = [r["idx"] for r in rows]
+    news = [
+        NewsInput(title=r["title"], description=r["description"], publish_date=r["publish_date"])
+        for r in rows
+    ]
+    try:
+        result = await run_in_threadpool(classify_news, news)
+    except Exception as e:
+        print(f"Classify job {job_id} chunk failed: {e}")
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    "UPDATE classify_job_item SET claimed_until = NULL "
+                    "WHERE job_id = $1 AND idx = ANY($2::int[]) AND pos IS NULL",
+                    job_id, idxs,
+                )
+                await conn.execute(_FAIL_SQL, job_id, str(e)[:500], JOB_MAX_ATTEMPTS)
+        return len(rows)
+
+    preds = result.news
+    async with pool.acquire() as conn:
+        await conn.execute(
+            _COMPLETE_SQL,
+            job_id,
+            idxs,
+            [p.pos for p in preds],
+            [p.neg for p in preds],
+            [p.neu for p in preds],
+            result.model_version or SENTIMENT_MODEL_VERSION,
+        )
+    return len(rows)
+
+
+async def _yield_to_interactive():
+    waited = 0.0
+    while limiter.inflight("interactive") > 0 and waited < JOB_YIELD_MAX:
+        await asyncio.sleep(0.05)
+        waited += 0.05
+
+
+async def _worker_loop(pool, wakeup: asyncio.Event):
+    while True:
+        try:
+            await _yield_to_interactive()
+            n = await process_chunk(pool)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Classify job worker error: {e}")
+            n = 0
+        # Hết việc -> chờ job mới (cùng process) hoặc poll lại (job từ process khác)
+        if n == 0:
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(wakeup.wait(), JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def _cleanup_loop(pool, interval: float = 3600):
+    while True:
+        try:
+            async with pool.acquire() as conn:
+                await conn.execute(
+                    "DELETE FROM classify_job WHERE finished_at < now() - make_interval(secs => $1)",
+                    JOB_RETENTION_HOURS * 3600,
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Classify job cleanup error: {e}")
+        await asyncio.sleep(interval)
+
+
+async def run_workers(pool, workers: int = JOB_WORKERS):
+    global _wakeup
+    async with pool.acquire() as conn:
+        installed = await conn.fetchval("SELECT to_regclass('classify_job') IS NOT NULL")
+    if not installed:
+        print("Classify job workers disabled: table classify_job not found (JOB_INSTALL_SCHEMA=true)")
+        return
+    _wakeup = asyncio.Event()
+    await asyncio.gather(_cleanup_loop(pool), *(_worker_loop(pool, _wakeup) for _ in range(workers)))
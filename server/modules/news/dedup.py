@@ -0,0 +1,292 @@
+# server/modules/news/dedup.py
+"""
+Phát hiện bài trùng gần giống (cùng tin phát lại dưới URL khác) bằng MinHash + LSH.
+
+- Văn bản = text_preprocessing(title + description) (giống classify_news),
+  shingle DEDUP_SHINGLE từ liên tiếp, băm crc32.
+- Chữ ký MinHash DEDUP_NUM_PERM hàm hash; chỉ giữ 16 bit thấp mỗi giá trị
+  (b-bit MinHash) trong một mảng uint16 (N, num_perm) -> 128 byte / bài với 64 perm.
+- LSH: chia chữ ký thành DEDUP_BANDS band, mỗi band -> một khoá uint64. Khoá lưu
+  trong mảng đã sắp xếp (tra bằng searchsorted, O(log N)) + dict nhỏ cho các bài
+  mới thêm, định kỳ gộp vào mảng.
+- Ứng viên có Jaccard ước lượng >= DEDUP_THRESHOLD -> bài trùng, bài gốc (canonical)
+  là bài đầu tiên của nhóm (theo published_time).
+
+Kết quả ghi vào bảng news_duplicate: list_news(collapse_duplicates=True) ẩn bản
+trùng và backfill sentiment chép điểm của bài gốc thay vì chạy model. Chỉ cần
+một process chạy detector (DEDUP_ENABLED); index được snapshot ra .npz.
+"""
+import asyncio
+import os
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from server.config import DEDUP_SNAPSHOT_PATH
+from server.modules.ai.service import text_preprocessing
+from server.modules.sentiment.service import reuse_canonical_scores
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "false").lower() in ("1", "true", "yes")
+DEDUP_INSTALL_SCHEMA = os.getenv("DEDUP_INSTALL_SCHEMA", "false").lower() in ("1", "true", "yes")
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "64"))
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", "16"))
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+DEDUP_SHINGLE = int(os.getenv("DEDUP_SHINGLE", "3"))
+DEDUP_BATCH = int(os.getenv("DEDUP_BATCH", "2000"))
+DEDUP_INTERVAL = float(os.getenv("DEDUP_INTERVAL", "60"))
+
+NEWS_DUPLICATE_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS news_duplicate (
+    news_id       TEXT PRIMARY KEY REFERENCES news(id) ON DELETE CASCADE,
+    canonical_id  TEXT NOT NULL REFERENCES news(id) ON DELETE CASCADE,
+    similarity    REAL NOT NULL,
+    detected_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS news_duplicate_canonical_idx ON news_duplicate (canonical_id);
+"""
+
+_PRIME = np.uint64((1 << 31) - 1)
+_FNV_OFFSET = np.uint64(1469598103934665603)
+_FNV_PRIME = np.uint64(1099511628211)
+_MAX_BUCKET = 64          # giới hạn ứng viên / band (bucket "rác" như văn bản rỗng)
+_MERGE_EVERY = 50000      # số khoá trong dict trước khi gộp vào mảng sắp xếp
+
+
+class MinHashIndex:
+    def __init__(self, num_perm: int = DEDUP_NUM_PERM, bands: int = DEDUP_BANDS,
+                 threshold: float = DEDUP_THRESHOLD, shingle: int = DEDUP_SHINGLE, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("DEDUP_NUM_PERM must be a multiple of DEDUP_BANDS")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.threshold = threshold
+        self.shingle = shingle
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)
+
+        self.size = 0
+        self.sigs = np.zeros((1024, num_perm), dtype=np.uint16)
+        self.canonical = np.zeros(1024, dtype=np.int32)
+        self.ids: List[str] = []
+        self._keys = np.empty(0, dtype=np.uint64)
+        self._key_rows = np.empty(0, dtype=np.int32)
+        self._delta: Dict[int, List[int]] = {}
+        self._delta_count = 0
+        self.watermark: Optional[Tuple[datetime, str]] = None
+        self.dirty = False
+
+    # ---------- signature ----------
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash (giá trị 31 bit, uint64) của văn bản đã preprocess; None nếu rỗng."""
+        tokens = text.split()
+        if not tokens:
+            return None
+        k = min(self.shingle, len(tokens))
+        shingles = {" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+        x = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # a < 2^31, x < 2^32 -> tích < 2^63, không tràn uint64
+        return ((x[:, None] * self._a + self._b) % _PRIME).min(axis=0)
+
+    def signatures(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        return [self.signature(text_preprocessing(t)) for t in texts]
+
+    def _band_keys(self, sig: np.ndarray) -> np.ndarray:
+        bands = sig.reshape(self.bands, self.rows_per_band)
+        keys = _FNV_OFFSET ^ np.arange(self.bands, dtype=np.uint64)
+        for j in range(self.rows_per_band):
+            keys = (keys ^ bands[:, j]) * _FNV_PRIME
+        return keys
+
+    # ---------- lookup ----------
+    def _candidates(self, keys: np.ndarray) -> np.ndarray:
+        found: List[int] = []
+        if self._keys.size:
+            lo = np.searchsorted(self._keys, keys, side="left")
+            hi = np.searchsorted(self._keys, keys, side="right")
+            for l, h in zip(lo.tolist(), hi.tolist()):
+                if h > l:
+                    found.extend(self._key_rows[l:min(h, l + _MAX_BUCKET)].tolist())
+        for key in keys.tolist():
+            found.extend(self._delta.get(key, ())[:_MAX_BUCKET])
+        return np.unique(np.asarray(found, dtype=np.int32))
+
+    def match(self, sig: np.ndarray) -> Optional[Tuple[int, float]]:
+        """(row bài gốc, Jaccard ước lượng) nếu có bài gần giống trong index."""
+        cands = self._candidates(self._band_keys(sig))
+        if not cands.size:
+            return None
+        low = (sig & 0xFFFF).astype(np.uint16)
+        sims = (self.sigs[cands] == low).mean(axis=1)
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            return None
+        return int(self.canonical[cands[best]]), float(sims[best])
+
+    # ---------- update ----------
+    def _grow(self):
+        cap = self.sigs.shape[0] * 2
+        sigs = np.zeros((cap, self.num_perm), dtype=np.uint16)
+        sigs[: self.size] = self.sigs[: self.size]
+        canonical = np.zeros(cap, dtype=np.int32)
+        canonical[: self.size] = self.canonical[: self.size]
+        self.sigs, self.canonical = sigs, canonical
+
+    def add(self, news_id: str, sig: np.ndarray, canonical_row: Optional[int] = None) -> int:
+        if self.size == self.sigs.shape[0]:
+            self._grow()
+        row = self.size
+        self.sigs[row] = (sig & 0xFFFF).astype(np.uint16)
+        self.canonical[row] = row if canonical_row is None else canonical_row
+        self.ids.append(str(news_id))
+        self.size += 1
+        # Chỉ bài gốc cần có trong LSH: bản trùng luôn trỏ về bài gốc
+        if canonical_row is None:
+            for key in self._band_keys(sig).tolist():
+                self._delta.setdefault(key, []).append(row)
+            self._delta_count += self.bands
+            if self._delta_count >= _MERGE_EVERY:
+                self._merge_delta()
+        self.dirty = True
+        return row
+
+    def _merge_delta(self):
+        if not self._delta:
+            return
+        keys = np.fromiter((k for k, rows in self._delta.items() for _ in rows), dtype=np.uint64)
+        rows = np.fromiter((r for rs in self._delta.values() for r in rs), dtype=np.int32)
+        keys = np.concatenate([self._keys, keys])
+        rows = np.concatenate([self._key_rows, rows])
+        order = np.argsort(keys, kind="stable")
+        self._keys, self._key_rows = keys[order], rows[order]
+        self._delta.clear()
+        self._delta_count = 0
+
+    # ---------- snapshot ----------
+    def save(self, path=DEDUP_SNAPSHOT_PATH):
+        self._merge_delta()
+        path = str(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez(
+            tmp,
+            params=np.array([self.num_perm, self.bands, self.shingle], dtype=np.int64),
+            sigs=self.sigs[: self.size],
+            canonical=self.canonical[: self.size],
+            ids=np.array(self.ids, dtype=str),
+            keys=self._keys,
+            key_rows=self._key_rows,
+            watermark=np.array(
+                [self.watermark[0].isoformat(), self.watermark[1]] if self.watermark else [], dtype=str
+            ),
+        )
+        os.replace(tmp, path)
+        self.dirty = False
+
+    def load(self, path=DEDUP_SNAPSHOT_PATH) -> bool:
+        try:
+            data = np.load(str(path))
+        except FileNotFoundError:
+            return False
+        with data:
+            if data["params"].tolist() != [self.num_perm, self.bands, self.shingle]:
+                print("Dedup snapshot ignored: parameters changed")
+                return False
+            sigs = data["sigs"]
+            self.size = sigs.shape[0]
+            self.sigs = np.zeros((max(1024, self.size * 2), self.num_perm), dtype=np.uint16)
+            self.sigs[: self.size] = sigs
+            self.canonical = np.zeros(self.sigs.shape[0], dtype=np.int32)
+            self.canonical[: self.size] = data["canonical"]
+            self.ids = data["ids"].tolist()
+            self._keys, self._key_rows = data["keys"], data["key_rows"]
+            wm = data["watermark"].tolist()
+            self.watermark = (datetime.fromisoformat(wm[0]), wm[1]) if wm else None
+        return True
+
+
+class DuplicateDetector:
+    """Quét bài mới theo (published_time, id), ghi news_duplicate và chép sentiment."""
+
+    def __init__(self, index: MinHashIndex):
+        self.index = index
+
+    async def process_batch(self, pool, batch: int = DEDUP_BATCH) -> int:
+        params: list = [batch]
+        where = "published_time IS NOT NULL"
+        if self.index.watermark is not None:
+            params += list(self.index.watermark)
+            where += " AND (published_time, id) > ($2, $3)"
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                f"""
+                SELECT id, title, description, published_time
+                FROM news
+                WHERE {where}
+                ORDER BY published_time, id
+                LIMIT $1
+                """,
+                *params,
+            )
+        if not rows:
+            return 0
+
+        texts = [f"{r['title'] or ''} {r['description'] or ''}".strip() for r in rows]
+        sigs = await run_in_threadpool(self.index.signatures, texts)
+
+        dups = []
+        for r, sig in zip(rows, sigs):
+            news_id = str(r["id"])
+            if sig is None:
+                continue
+            hit = self.index.match(sig)
+            if hit is None:
+                self.index.add(news_id, sig)
+            else:
+                canonical_row, sim = hit
+                self.index.add(news_id, sig, canonical_row)
+                dups.append((news_id, self.index.ids[canonical_row], sim))
+
+        if dups:
+            async with pool.acquire() as conn:
+                await conn.executemany(
+                    """
+                    INSERT INTO news_duplicate (news_id, canonical_id, similarity)
+                    VALUES ($1, $2, $3)
+                    ON CONFLICT (news_id) DO NOTHING
+                    """,
+                    dups,
+                )
+            await reuse_canonical_scores(pool, [d[0] for d in dups])
+
+        last = rows[-1]
+        self.index.watermark = (last["published_time"], str(last["id"]))
+        self.index.dirty = True
+        return len(rows)
+
+    async def run(self, pool, interval: float = DEDUP_INTERVAL):
+        await asyncio.to_thread(self.index.load)
+        while True:
+            try:
+                done = await self.process_batch(pool)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Dedup error: {e}")
+                done = 0
+            if done < DEDUP_BATCH:
+                # Đã bắt kịp -> snapshot rồi chờ bài mới
+                if self.index.dirty:
+                    try:
+                        await asyncio.to_thread(self.index.save)
+                    except OSError as e:
+                        print(f"Dedup snapshot failed: {e}")
+                await asyncio.sleep(interval)
+
+
+duplicate_index = MinHashIndex()
+duplicate_detector = DuplicateDetector(duplicate_index)
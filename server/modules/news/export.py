@@ -0,0 +1,185 @@
+# server/modules/news/export.py
+"""
+Export toàn bộ kết quả lọc (cùng bộ lọc với list_news) dạng stream.
+
+- Đọc bằng server-side cursor trong transaction read-only (REPEATABLE READ ->
+  snapshot nhất quán), mỗi lần lấy EXPORT_FETCH_SIZE dòng -> bộ nhớ không phụ
+  thuộc kích thước kết quả.
+- Thứ tự cố định (published_time, id); mỗi dòng luôn có hai cột này nên client
+  tiếp tục được từ dòng cuối đã nhận bằng after_time/after_id. Bài chưa có
+  published_time không được export.
+- Định dạng: ndjson, csv, parquet (cần pyarrow; mỗi batch là một row group).
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Iterable, List, Optional
+
+from server.modules.news.service import ALLOWED_FIELDS, build_news_filters
+
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "2000"))
+
+EXPORT_FIELDS = ALLOWED_FIELDS | {"article"}
+SENTIMENT_FIELDS = ("pos", "neg", "neu", "model_version")
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def export_columns(fields: Optional[Iterable[str]], include_sentiment: bool) -> List[str]:
+    cols = [f for f in (fields or []) if f in EXPORT_FIELDS] or sorted(ALLOWED_FIELDS)
+    # Cột checkpoint luôn có mặt
+    for key in ("published_time", "id"):
+        if key not in cols:
+            cols.insert(0, key)
+    if include_sentiment:
+        cols += list(SENTIMENT_FIELDS)
+    return cols
+
+
+def build_export_query(
+    columns: List[str],
+    sections: Optional[List[str]] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    q: Optional[str] = None,
+    collapse_duplicates: bool = False,
+    after: Optional[tuple] = None,
+):
+    where_parts, params = build_news_filters(sections, date_from, date_to, q, collapse_duplicates)
+    where_parts.append("news.published_time IS NOT NULL")
+    if after is not None:
+        params += list(after)
+        where_parts.append(f"(news.published_time, news.id) > (${len(params) - 1}, ${len(params)})")
+
+    include_sentiment = any(c in SENTIMENT_FIELDS for c in columns)
+    select_sql = ", ".join(f"s.{c}" if c in SENTIMENT_FIELDS else f"news.{c}" for c in columns)
+    join_sql = "LEFT JOIN news_sentiment s ON s.news_id = news.id" if include_sentiment else ""
+    sql = f"""
+        SELECT {select_sql}
+        FROM news
+        {join_sql}
+        WHERE {' AND '.join(where_parts)}
+        ORDER BY news.published_time, news.id
+    """
+    return sql, params
+
+
+async def _iter_batches(pool, sql: str, params: list) -> AsyncIterator[list]:
+    async with pool.acquire() as conn:
+        async with conn.transaction(readonly=True, isolation="repeatable_read"):
+            cursor = await conn.cursor(sql, *params)
+            while True:
+                rows = await cursor.fetch(EXPORT_FETCH_SIZE)
+                if not rows:
+                    return
+                yield rows
+                if len(rows) < EXPORT_FETCH_SIZE:
+                    return
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def stream_ndjson(pool, sql, params, columns):
+    async for rows in _iter_batches(pool, sql, params):
+        yield "".join(json.dumps({c: _plain(r[c]) for c in columns}, default=str) + "\n" for r in rows).encode("utf-8")
+
+
+async def stream_csv(pool, sql, params, columns):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    async for rows in _iter_batches(pool, sql, params):
+        for r in rows:
+            writer.writerow(["" if r[c] is None else _plain(r[c]) for c in columns])
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """File-like tối thiểu cho pyarrow: gom bytes đã ghi để generator đẩy ra ngay."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out = b"".join(self.chunks)
+        self.chunks.clear()
+        return out
+
+
+def _parquet_schema(pa, columns: List[str]):
+    types = {
+        "published_time": pa.timestamp("us", tz="UTC"),
+        "view_count": pa.int64(),
+        "pos": pa.float64(),
+        "neg": pa.float64(),
+        "neu": pa.float64(),
+    }
+    return pa.schema([(c, types.get(c, pa.string())) for c in columns])
+
+
+def require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise ExportError("Parquet export requires pyarrow")
+
+
+async def stream_parquet(pool, sql, params, columns):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(pa, columns)
+    text_cols = {f.name for f in schema if f.type == pa.string()}
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+    try:
+        async for rows in _iter_batches(pool, sql, params):
+            data = {
+                c: [str(r[c]) if c in text_cols and r[c] is not None else r[c] for r in rows]
+                for c in columns
+            }
+            writer.write_table(pa.Table.from_pydict(data, schema=schema))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
+
+
+STREAMERS = {"ndjson": stream_ndjson, "csv": stream_csv, "parquet": stream_parquet}
@@ -0,0 +1,246 @@
+# server/modules/news/ingest.py
+"""
+Nạp bài viết hàng loạt (NDJSON) cho scraper.
+
+Mỗi dòng là một object JSON: url (bắt buộc), title, description, article,
+section, thumbnail, published_time, id (tuỳ chọn), pos/neg/neu (tuỳ chọn, điểm
+sentiment đã tính sẵn). Dòng được chuẩn hoá giống read path (section dạng
+"Parent / Child", slug lấy từ url) rồi gom thành batch:
+
+    COPY -> bảng tạm news_ingest  ->  một INSERT ... ON CONFLICT (url) DO UPDATE
+
+Cần unique index trên news(url) (NEWS_URL_UNIQUE_SQL, tạo lúc khởi động khi
+NEWS_INSTALL_INDEXES=true); thiếu index -> IngestUnavailable (503).
+
+Mỗi batch commit riêng; quá max_rows dòng hợp lệ thì dừng đọc, vẫn trả 200 với
+truncated=true và next_line (dòng đầu tiên chưa nạp) để scraper gửi tiếp phần còn lại.
+"""
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional
+
+import asyncpg
+
+from server.modules.sentiment.service import store_scores
+
+NEWS_URL_UNIQUE_SQL = "CREATE UNIQUE INDEX IF NOT EXISTS news_url_key ON news (url)"
+
+_COLUMNS = ("ord", "id", "title", "url", "description", "article", "section", "thumbnail", "published_time")
+
+_STAGE_SQL = """
+    CREATE TEMP TABLE news_ingest (
+        ord             INT,
+        id              TEXT,
+        title           TEXT,
+        url             TEXT,
+        description     TEXT,
+        article         TEXT,
+        section         TEXT,
+        thumbnail       TEXT,
+        published_time  TIMESTAMPTZ
+    ) ON COMMIT DROP
+"""
+
+# Trùng url trong cùng batch -> giữ dòng cuối; không ghi đè cột bằng NULL, không đụng id/view_count
+_MERGE_SQL = """
+    INSERT INTO news (id, title, url, description, article, section, thumbnail, published_time)
+    SELECT DISTINCT ON (url) id, title, url, description, article, section, thumbnail, published_time
+    FROM news_ingest
+    ORDER BY url, ord DESC
+    ON CONFLICT (url) DO UPDATE SET
+        title          = COALESCE(EXCLUDED.title, news.title),
+        description    = COALESCE(EXCLUDED.description, news.description),
+        article        = COALESCE(EXCLUDED.article, news.article),
+        section        = COALESCE(EXCLUDED.section, news.section),
+        thumbnail      = COALESCE(EXCLUDED.thumbnail, news.thumbnail),
+        published_time = COALESCE(EXCLUDED.published_time, news.published_time)
+    RETURNING id, url, (xmax = 0) AS inserted
+"""
+
+
+class IngestError(ValueError):
+    pass
+
+
+class IngestUnavailable(RuntimeError):
+    pass
+
+
+async def install_url_index(pool):
+    async with pool.acquire() as conn:
+        try:
+            await conn.execute(NEWS_URL_UNIQUE_SQL)
+        except asyncpg.UniqueViolationError as e:
+            # Bảng đã có url trùng: không chặn startup, ingest sẽ trả 503 tới khi dọn xong
+            print(f"news_url_key not created (duplicate urls): {e}")
+
+
+def canonical_section(raw: Optional[str]) -> Optional[str]:
+    """' World/  China ' -> 'World / China' (chuẩn hoá khoảng trắng và '/', giữ chữ hoa/thường)."""
+    parts = [" ".join(p.split()) for p in (raw or "").split("/")]
+    return " / ".join(p for p in parts if p) or None
+
+
+def _slug_from_url(url: str) -> str:
+    # import muộn: news.router import module này
+    from server.modules.news.router import slugify
+    return slugify(url.rstrip("/").split("/")[-1])
+
+
+def _parse_time(value) -> Optional[datetime]:
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)):
+        try:
+            return datetime.fromtimestamp(value, tz=timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            # epoch quá lớn / NaN -> lỗi của dòng, không phải của cả request
+            raise IngestError(f"invalid published_time: {value!r}")
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        raise IngestError(f"invalid published_time: {value!r}")
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _text(obj: dict, key: str) -> Optional[str]:
+    v = obj.get(key)
+    if v is None:
+        return None
+    v = str(v).strip()
+    return v or None
+
+
+def _article(obj: dict) -> Optional[str]:
+    v = obj.get("article")
+    if v is None:
+        return None
+    if not isinstance(v, str):
+        # COPY sẽ lỗi giữa request (sau khi các batch trước đã commit) -> loại từ đây
+        raise IngestError("article must be a string")
+    return v or None
+
+
+def normalize_row(obj) -> dict:
+    if not isinstance(obj, dict):
+        raise IngestError("line is not a JSON object")
+    url = _text(obj, "url")
+    if not url:
+        raise IngestError("url is required")
+    if not _slug_from_url(url):
+        raise IngestError("url has no usable slug")
+
+    row = {
+        # id ổn định theo url khi scraper không gửi -> nạp lại không tạo bài mới
+        "id": _text(obj, "id") or hashlib.sha1(url.encode("utf-8")).hexdigest(),
+        "title": _text(obj, "title"),
+        "url": url,
+        "description": _text(obj, "description"),
+        "article": _article(obj),
+        "section": canonical_section(obj.get("section")),
+        "thumbnail": _text(obj, "thumbnail"),
+        "published_time": _parse_time(obj.get("published_time")),
+    }
+    if all(obj.get(k) is not None for k in ("pos", "neg", "neu")):
+        try:
+            row["scores"] = {k: float(obj[k]) for k in ("pos", "neg", "neu")}
+        except (TypeError, ValueError):
+            raise IngestError("pos/neg/neu must be numbers")
+    return row
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes]):
+    """Body stream -> (số dòng, bytes) cho từng dòng khác rỗng."""
+    buf = b""
+    line_no = 0
+    async for chunk in chunks:
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield line_no, line
+    if buf.strip():
+        yield line_no + 1, buf
+
+
+async def merge_batch(pool, rows: List[dict]) -> dict:
+    started = time.perf_counter()
+    records = [
+        (i, r["id"], r["title"], r["url"], r["description"], r["article"], r["section"], r["thumbnail"], r["published_time"])
+        for i, r in enumerate(rows)
+    ]
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(_STAGE_SQL)
+            await conn.copy_records_to_table("news_ingest", records=records, columns=_COLUMNS)
+            try:
+                merged = await conn.fetch(_MERGE_SQL)
+            except asyncpg.InvalidColumnReferenceError:
+                # ON CONFLICT (url) không có unique index tương ứng
+                raise IngestUnavailable("news(url) has no unique index (set NEWS_INSTALL_INDEXES=true)")
+
+    # Điểm sentiment gửi kèm -> ghi luôn (id thật lấy theo url vì bài cũ giữ id cũ)
+    ids_by_url = {m["url"]: m["id"] for m in merged}
+    scores = [
+        {"id": ids_by_url[r["url"]], **r["scores"]}
+        for r in rows if "scores" in r and r["url"] in ids_by_url
+    ]
+    if scores:
+        await store_scores(pool, list({s["id"]: s for s in scores}.values()))
+
+    seconds = time.perf_counter() - started
+    inserted = sum(1 for m in merged if m["inserted"])
+    return {
+        "rows": len(rows),
+        "inserted": inserted,
+        "updated": len(merged) - inserted,
+        "seconds": round(seconds, 4),
+        "rows_per_sec": round(len(rows) / seconds, 1) if seconds > 0 else None,
+    }
+
+
+async def ingest_ndjson(pool, chunks: AsyncIterator[bytes], batch_size: int, max_rows: int, max_errors: int = 100):
+    batches: List[dict] = []
+    errors: List[dict] = []
+    pending: List[dict] = []
+    accepted = rejected = 0
+    next_line = None
+    started = time.perf_counter()
+
+    async for line_no, line in iter_ndjson_lines(chunks):
+        if accepted >= max_rows:
+            # Các batch trước đã commit -> dừng ở đây thay vì báo lỗi cho cả request
+            next_line = line_no
+            break
+        try:
+            row = normalize_row(json.loads(line))
+        except (ValueError, IngestError) as e:
+            rejected += 1
+            if len(errors) < max_errors:
+                errors.append({"line": line_no, "error": str(e)})
+            continue
+        accepted += 1
+        pending.append(row)
+        if len(pending) >= batch_size:
+            batches.append(await merge_batch(pool, pending))
+            pending = []
+
+    if pending:
+        batches.append(await merge_batch(pool, pending))
+
+    seconds = time.perf_counter() - started
+    return {
+        "rows": accepted,
+        "inserted": sum(b["inserted"] for b in batches),
+        "updated": sum(b["updated"] for b in batches),
+        "rejected": rejected,
+        "truncated": next_line is not None,
+        "next_line": next_line,
+        "seconds": round(seconds, 4),
+        "rows_per_sec": round(accepted / seconds, 1) if seconds > 0 else None,
+        "batches": batches,
+        "errors": errors,
+    }
@@ -0,0 +1,220 @@
+# server/modules/news/related.py
+"""
+Index "bài liên quan" trong bộ nhớ.
+
+Mỗi bài (title + description) -> vector trung bình embedding của model sentiment
+(embed_texts), chuẩn hoá L2 và lưu trong một ma trận float32 liền khối. Truy vấn
+top-k cosine = một phép nhân ma trận-vector + argpartition, không query DB.
+
+Index được nạp từ DB lúc khởi động (RELATED_MAX_ARTICLES bài mới nhất) rồi
+cập nhật tăng dần theo (published_time, id) mỗi RELATED_REFRESH_INTERVAL giây. Khi đầy,
+các bài cũ nhất bị bỏ bớt. Khi model sentiment đổi version (vector không còn cùng
+không gian), index được dựng lại ở nền rồi mới thay thế index cũ.
+"""
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from server.modules.ai.service import embed_texts_with_version, model_registry
+
+RELATED_ENABLED = os.getenv("RELATED_ENABLED", "false").lower() in ("1", "true", "yes")
+RELATED_MAX_ARTICLES = int(os.getenv("RELATED_MAX_ARTICLES", "200000"))
+RELATED_REFRESH_INTERVAL = float(os.getenv("RELATED_REFRESH_INTERVAL", "60"))
+RELATED_BATCH = int(os.getenv("RELATED_BATCH", "2000"))
+RELATED_CACHE_SIZE = int(os.getenv("RELATED_CACHE_SIZE", "4096"))
+
+_META_COLS = ("id", "title", "url", "section", "thumbnail", "published_time")
+
+
+def _meta(row) -> dict:
+    item = {c: row[c] for c in _META_COLS}
+    item["id"] = str(item["id"])
+    url = item.get("url")
+    item["slug"] = url.rstrip("/").split("/")[-1] if url else None
+    return item
+
+
+class RelatedIndex:
+    def __init__(self, max_articles: int = RELATED_MAX_ARTICLES):
+        self.max_articles = max_articles
+        self.vectors: Optional[np.ndarray] = None   # (capacity, dim), chỉ [:size] có dữ liệu
+        self.size = 0
+        self.meta: List[dict] = []
+        self.rows: Dict[str, int] = {}
+        self.watermark = None                       # (published_time, id) lớn nhất đã index
+        self.model_version: Optional[str] = None    # version model sinh ra các vector
+        self.ready = False
+        self.stale = False
+        # Kết quả theo (id, k); xoá mỗi khi index thay đổi
+        self._cache: "OrderedDict[tuple, List[dict]]" = OrderedDict()
+
+    # ---------- update ----------
+    def _ensure_capacity(self, extra: int, dim: int):
+        need = self.size + extra
+        if self.vectors is None:
+            self.vectors = np.zeros((max(need, 1024), dim), dtype=np.float32)
+        elif need > self.vectors.shape[0]:
+            grown = np.zeros((max(need, self.vectors.shape[0] * 2), dim), dtype=np.float32)
+            grown[: self.size] = self.vectors[: self.size]
+            self.vectors = grown
+
+    def _evict_oldest(self, count: int):
+        # Hàng được thêm theo published_time tăng dần -> các hàng đầu là bài cũ nhất
+        keep = self.size - count
+        self.vectors[:keep] = self.vectors[count: self.size]
+        self.meta = self.meta[count:]
+        self.size = keep
+        self.rows = {m["id"]: i for i, m in enumerate(self.meta)}
+
+    def add(self, metas: List[dict], vectors: np.ndarray):
+        """Thêm / cập nhật bài; `vectors` đã chuẩn hoá L2, cùng thứ tự với `metas`."""
+        self._cache.clear()
+        fresh = []
+        for meta, vec in zip(metas, vectors):
+            row = self.rows.get(meta["id"])
+            if row is not None:
+                self.vectors[row] = vec
+                self.meta[row] = meta
+            else:
+                fresh.append((meta, vec))
+        if not fresh:
+            return
+
+        overflow = self.size + len(fresh) - self.max_articles
+        if overflow > 0:
+            if self.size:
+                self._evict_oldest(min(self.size, max(overflow, self.max_articles // 10)))
+            fresh = fresh[-self.max_articles:]
+
+        self._ensure_capacity(len(fresh), vectors.shape[1])
+        for meta, vec in fresh:
+            self.vectors[self.size] = vec
+            self.meta.append(meta)
+            self.rows[meta["id"]] = self.size
+            self.size += 1
+
+    # ---------- query ----------
+    def related(self, news_id: str, k: int = 10) -> Optional[List[dict]]:
+        """None nếu bài chưa có trong index."""
+        row = self.rows.get(str(news_id))
+        if row is None:
+            return None
+        key = (str(news_id), k)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        matrix = self.vectors[: self.size]
+        scores = matrix @ matrix[row]
+        scores[row] = -np.inf
+        k = min(k, self.size - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        out = []
+        for i in top:
+            if not np.isfinite(scores[i]) or scores[i] <= 0:
+                break
+            item = dict(self.meta[i])
+            item["score"] = float(scores[i])
+            out.append(item)
+
+        self._cache[key] = out
+        if len(self._cache) > RELATED_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return out
+
+    # ---------- nạp từ DB ----------
+    async def _load_batch(self, rows) -> int:
+        if not rows:
+            return 0
+        texts = [f"{r['title'] or ''} {r['description'] or ''}".strip() for r in rows]
+        version, vectors = await run_in_threadpool(embed_texts_with_version, texts)
+        if self.model_version is None:
+            self.model_version = version
+        elif version != self.model_version:
+            # Model vừa swap giữa chừng: run() sẽ dựng lại toàn bộ index ở vòng sau
+            self.model_version = version
+            self.stale = True
+        self.add([_meta(r) for r in rows], vectors)
+        # rows luôn theo (published_time, id) tăng dần -> dòng cuối là mốc keyset mới
+        newest = (rows[-1]["published_time"], str(rows[-1]["id"]))
+        self.watermark = newest if self.watermark is None else max(self.watermark, newest)
+        return len(rows)
+
+    async def load_initial(self, pool):
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT id, title, description, url, section, thumbnail, published_time
+                FROM (
+                    SELECT id, title, description, url, section, thumbnail, published_time
+                    FROM news
+                    WHERE published_time IS NOT NULL
+                    ORDER BY published_time DESC
+                    LIMIT $1
+                ) t
+                ORDER BY published_time ASC, id ASC
+                """,
+                self.max_articles,
+            )
+        for start in range(0, len(rows), RELATED_BATCH):
+            await self._load_batch(rows[start: start + RELATED_BATCH])
+
+    async def refresh(self, pool) -> int:
+        """Index các bài sau watermark theo keyset (published_time, id)."""
+        total = 0
+        while True:
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(
+                    """
+                    SELECT id, title, description, url, section, thumbnail, published_time
+                    FROM news
+                    WHERE (published_time, id) > ($1, $2)
+                    ORDER BY published_time ASC, id ASC
+                    LIMIT $3
+                    """,
+                    *self.watermark,
+                    RELATED_BATCH,
+                )
+            if not rows:
+                return total
+            total += await self._load_batch(rows)
+
+    def _adopt(self, other: "RelatedIndex"):
+        self.vectors, self.size, self.meta, self.rows = other.vectors, other.size, other.meta, other.rows
+        self.watermark, self.model_version, self.stale = other.watermark, other.model_version, other.stale
+        self._cache.clear()
+
+    async def rebuild(self, pool):
+        """Dựng index mới bằng model hiện tại; truy vấn vẫn dùng index cũ tới khi xong."""
+        fresh = RelatedIndex(self.max_articles)
+        await fresh.load_initial(pool)
+        self._adopt(fresh)
+        print(f"Related index rebuilt for model {self.model_version} ({self.size} articles)")
+
+    async def run(self, db, interval: float = RELATED_REFRESH_INTERVAL):
+        while True:
+            try:
+                if self.watermark is None:
+                    # Chưa nạp (hoặc bảng news đang rỗng)
+                    await self.load_initial(db.reader())
+                    self.ready = True
+                elif self.stale or model_registry.active_version() not in (None, self.model_version):
+                    await self.rebuild(db.reader())
+                else:
+                    await self.refresh(db.reader())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Related index error: {e}")
+            await asyncio.sleep(interval)
+
+
+related_index = RelatedIndex()
@@ -1,11 +1,34 @@
 from typing import Optional, List, Iterable
 from datetime import datetime
-from fastapi import APIRouter, Request, Query, HTTPException, status
-from server.modules.news.service import list_news, get_news_by_id
-from server.modules.news.schemas import NewsListResponse, SectionItem, ChildSection, NewsDetailItemOut
+from fastapi import APIRouter, Depends, Request, Query, HTTPException, status
+from fastapi.responses import StreamingResponse
+from server.modules.news.service import list_news, get_news_by_id, get_news_batch, NEWS_BATCH_MAX
+from server.database import get_read_pool, get_write_pool
+from server.deadline import DeadlineExceeded, query_timeout
+from server.singleflight import SingleFlight, uses_primary
+import asyncio
+import asyncpg
+from server.modules.news.schemas import NewsListResponse, NewsItemOut, SectionItem, ChildSection, NewsDetailItemOut, TrendingResponse, RelatedResponse, NewsBatchResponse
+from server.modules.news.trending import trending_index
+from server.modules.news.related import RELATED_ENABLED, related_index
+from server.modules.news.ingest import IngestUnavailable, ingest_ndjson
+from server.modules.news.export import EXPORT_FORMATS, STREAMERS, ExportError, build_export_query, export_columns, require_pyarrow
+from server.dependencies import require_api_bot, require_auth
+from server.ratelimit import limiter
+from server.http_cache import conditional_json, trusted_json
+import os
 from urllib.parse import unquote
 router = APIRouter(prefix="/news", tags=["News"])
 
+NEWS_INGEST_BATCH = int(os.getenv("NEWS_INGEST_BATCH", "5000"))
+NEWS_INGEST_MAX_ROWS = int(os.getenv("NEWS_INGEST_MAX_ROWS", "500000"))
+
+_NEWS_ITEM_FIELDS = tuple(NewsItemOut.model_fields)
+
+# Gộp các request giống hệt nhau đang chạy cùng lúc (trang section viral, nav...)
+news_list_flight = SingleFlight("news_list")
+sections_nav_flight = SingleFlight("sections_nav")
+
 def _parse_fields_csv(raw: Optional[str]) -> Optional[List[str]]:
     if not raw:
         return None
@@ -31,6 +54,14 @@ def _parse_fields_csv(raw: Optional[str]) -> Optional[List[str]]:
 #             out.append(v)
 #     return out or None
 
+def _news_item_out(row: dict) -> dict:
+    """Dòng SQL (cột whitelist) -> đúng shape NewsItemOut, khỏi validate lại từng item."""
+    item = dict.fromkeys(_NEWS_ITEM_FIELDS)
+    item.update(row)
+    url = row.get("url")
+    item["slug"] = url.rstrip("/").split("/")[-1] if url else None
+    return item
+
 def _normalize_sections(sections):
     """
     Chuẩn hoá section:
@@ -90,6 +121,9 @@ async def get_news(
     order_dir: Optional[str] = Query(
         "DESC", description="Sort direction: ASC | DESC"
     ),
+    collapse: bool = Query(
+        False, description="Hide near-duplicate copies of the same story (keep the original)"
+    ),
 ):
     # Parse and normalize query params
     field_list = _parse_fields_csv(fields)
@@ -98,32 +132,37 @@ async def get_news(
     order_dir_norm = (order_dir or "DESC").upper()
     if order_dir_norm not in ("ASC", "DESC"):
         order_dir_norm = "DESC"
+    q_norm = q.strip() if q else None
+
+    async def load(shared_request):
+        # --- Lấy dữ liệu từ service ---
+        data = await list_news(
+            request=shared_request,
+            fields=field_list,
+            sections=section_list_norm,
+            date_from=date_from,
+            date_to=date_to,
+            q=q_norm,
+            limit=limit,
+            offset=offset,
+            order_by=order_by,
+            order_dir=order_dir_norm,
+            collapse_duplicates=collapse,
+        )
 
-    # --- Lấy dữ liệu từ service ---
-    data = await list_news(
-        request=request,
-        fields=field_list,
-        sections=section_list_norm,
-        date_from=date_from,
-        date_to=date_to,
-        q=q.strip() if q else None,
-        limit=limit,
-        offset=offset,
-        order_by=order_by,
-        order_dir=order_dir_norm,
-    )
-
-    # --- Tự động sinh slug từ URL ---
-    items = data.get("items", [])
-    for item in items:
-        url = item.get("url")
-        if url:
-            parts = url.rstrip("/").split("/")
-            item["slug"] = parts[-1] if parts else None
-        else:
-            item["slug"] = None
+        # --- Dựng luôn shape output (kèm slug từ URL) ---
+        data["items"] = [_news_item_out(r) for r in data.get("items", [])]
+        return data
 
-    return data
+    key = (
+        tuple(field_list or ()),
+        tuple(section_list_norm or ()),
+        date_from, date_to, q_norm, limit, offset, order_by, order_dir_norm, collapse,
+        uses_primary(request),
+    )
+    data = await news_list_flight.do(key, request, load)
+    # Dữ liệu từ SQL whitelist + _news_item_out -> bỏ validate, encode bằng orjson
+    return trusted_json(request, data)
 
 from typing import List, Dict, Any, Union
 import re
@@ -205,40 +244,175 @@ def build_sections_nav(items: List[Union[Dict[str, Any], str]]) -> List[SectionI
     response_model=List[SectionItem],
 )
 async def get_sections_nav(request: Request):
-    response_data = await list_news(
-        request=request,
-        fields=["section"],
-        sections=None,
-        date_from=None,
-        date_to=None,
-        q=None,
-        limit=500,
-        offset=0,
-        order_by="published_time",
-        order_dir="DESC",
-    )
+    async def load(shared_request):
+        response_data = await list_news(
+            request=shared_request,
+            fields=["section"],
+            sections=None,
+            date_from=None,
+            date_to=None,
+            q=None,
+            limit=500,
+            offset=0,
+            order_by="published_time",
+            order_dir="DESC",
+        )
+
+        # list_news returns a dict {'items': [...]}, pass the items list to build_sections_nav
+        news_items = response_data.get("items", [])
+        return build_sections_nav(news_items)
 
-    # list_news returns a dict {'items': [...]}, pass the items list to build_sections_nav
-    news_items = response_data.get("items", [])
-    nav = build_sections_nav(news_items)
-    return nav
+    nav = await sections_nav_flight.do(("sections", uses_primary(request)), request, load)
+    return conditional_json(request, nav, List[SectionItem])
 
 @router.post("/{news_id}/seen", summary="Increase view count for a news item")
 async def increase_view(news_id: str, request: Request):
-    pool = request.app.state.pool
+    pool = get_write_pool(request)
+    # Lấy kèm vài cột hiển thị để trending trả kết quả mà không cần query lại
     sql = """
         UPDATE news
         SET view_count = COALESCE(view_count, 0) + 1
         WHERE id = $1
-        RETURNING view_count;
+        RETURNING view_count, title, url, section, thumbnail, published_time;
     """
     async with pool.acquire() as conn:
-        new_count = await conn.fetchval(sql, news_id)
+        row = await conn.fetchrow(sql, news_id, timeout=query_timeout(request))
 
-    if new_count is None:
+    if row is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="News not found")
 
-    return {"id": news_id, "view_count": new_count}
+    url = row["url"]
+    trending_index.record_view(news_id, {
+        "id": news_id,
+        "title": row["title"],
+        "url": url,
+        "section": row["section"],
+        "thumbnail": row["thumbnail"],
+        "published_time": row["published_time"].isoformat() if row["published_time"] else None,
+        "slug": url.rstrip("/").split("/")[-1] if url else None,
+    })
+
+    return {"id": news_id, "view_count": row["view_count"]}
+
+@router.get(
+    "/trending",
+    summary="Trending news (time-decayed views, served from memory)",
+    response_model=TrendingResponse,
+)
+async def get_trending(
+    request: Request,
+    section: Optional[str] = Query(
+        None, description="Section slug, e.g. world hoặc world/china; bỏ trống = tất cả"
+    ),
+    limit: int = Query(10, ge=1, le=100, description="Số bài trả về"),
+):
+    section_norm = unquote(section).strip("/") if section else None
+    data = {"section": section_norm, "items": trending_index.top(section_norm, limit)}
+    return conditional_json(request, data, TrendingResponse)
+
+@router.post(
+    "/ingest",
+    summary="Bulk upsert news from an NDJSON body (one article per line)",
+)
+async def ingest_news(request: Request, principal: dict = Depends(require_api_bot)):
+    async with limiter.admit(principal, "ingest_news"):
+        # Quá NEWS_INGEST_MAX_ROWS: 200 với truncated/next_line (các batch đã nạp vẫn giữ)
+        try:
+            return await ingest_ndjson(
+                get_write_pool(request), request.stream(), NEWS_INGEST_BATCH, NEWS_INGEST_MAX_ROWS
+            )
+        except IngestUnavailable as e:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+@router.get(
+    "/batch",
+    summary="Look up many news items by ids and/or slugs in one query",
+    response_model=NewsBatchResponse,
+)
+async def get_news_batch_route(
+    request: Request,
+    ids: Optional[str] = Query(None, description="CSV of ids"),
+    slugs: Optional[str] = Query(None, description="CSV of slugs (hoặc path/URL đầy đủ)"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields, e.g. id,title,url"),
+):
+    id_list = [s.strip() for s in (ids or "").split(",") if s.strip()]
+    slug_list = [s.strip() for s in (slugs or "").split(",") if s.strip()]
+    if not id_list and not slug_list:
+        raise HTTPException(status_code=400, detail="Cần ít nhất một id hoặc slug")
+    if len(id_list) + len(slug_list) > NEWS_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Tối đa {NEWS_BATCH_MAX} id/slug mỗi request")
+    data = await get_news_batch(request, id_list, slug_list, _parse_fields_csv(fields))
+    return conditional_json(request, data, NewsBatchResponse)
+
+@router.get(
+    "/export",
+    summary="Stream every matching news row (NDJSON / CSV / Parquet) from a server-side cursor",
+    response_class=StreamingResponse,
+)
+async def export_news(
+    request: Request,
+    format: str = Query("ndjson", description="ndjson | csv | parquet"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields (id, published_time luôn có)"),
+    sections: Optional[str] = Query(None, description="Same as /api/news"),
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    q: Optional[str] = Query(None),
+    collapse: bool = Query(False, description="Hide near-duplicate copies"),
+    include_sentiment: bool = Query(False, description="Add stored pos/neg/neu/model_version"),
+    after_time: Optional[datetime] = Query(None, description="Resume after this published_time (with after_id)"),
+    after_id: Optional[str] = Query(None, description="Resume after this id (with after_time)"),
+    principal: dict = Depends(require_auth),
+):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if (after_time is None) != (after_id is None):
+        raise HTTPException(status_code=400, detail="after_time và after_id phải đi cùng nhau")
+    try:
+        if format == "parquet":
+            require_pyarrow()
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    columns = export_columns(_parse_fields_csv(fields), include_sentiment)
+    sql, params = build_export_query(
+        columns,
+        sections=_normalize_sections(sections),
+        date_from=date_from,
+        date_to=date_to,
+        q=q.strip() if q else None,
+        collapse_duplicates=collapse,
+        after=(after_time, after_id) if after_time is not None else None,
+    )
+
+    # Slot in-flight giữ suốt thời gian stream (cursor mở tới khi export xong)
+    body = limiter.admit_stream(
+        principal, "export_news", STREAMERS[format](get_read_pool(request), sql, params, columns)
+    )
+    filename = f"news-export.{format}"
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get(
+    "/{news_id}/related",
+    summary="Related news (embedding similarity, served from memory)",
+    response_model=RelatedResponse,
+)
+async def get_related(
+    news_id: str,
+    request: Request,
+    limit: int = Query(10, ge=1, le=50, description="Số bài trả về"),
+):
+    if not RELATED_ENABLED:
+        raise HTTPException(status_code=503, detail="Related index is disabled")
+    items = related_index.related(news_id, limit)
+    if items is None:
+        if not related_index.ready:
+            raise HTTPException(status_code=503, detail="Related index is loading", headers={"Retry-After": "10"})
+        raise HTTPException(status_code=404, detail="News not indexed")
+    return conditional_json(request, {"id": news_id, "items": items}, RelatedResponse)
 
 """
 Author: Thắng
@@ -250,7 +424,7 @@ Author: Thắng
     response_model=NewsDetailItemOut,
 )
 async def get_news_detail(slug: str, request: Request):
-    pool = request.app.state.pool
+    pool = get_read_pool(request)
 
     # Làm sạch slug, bỏ domain nếu người dùng dán full URL
     normalized_slug = slug.strip("/")
@@ -278,7 +452,9 @@ async def get_news_detail(slug: str, request: Request):
 
     try:
         async with pool.acquire() as conn:
-            row = await conn.fetchrow(sql, normalized_slug)
+            row = await conn.fetchrow(sql, normalized_slug, timeout=query_timeout(request))
+    except (HTTPException, DeadlineExceeded, asyncio.TimeoutError, asyncpg.exceptions.QueryCanceledError):
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -299,4 +475,4 @@ async def get_news_detail(slug: str, request: Request):
     else:
         news["slug"] = None
 
-    return news
\ No newline at end of file
+    return conditional_json(request, news, NewsDetailItemOut)
\ No newline at end of file
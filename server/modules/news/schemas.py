@@ -28,6 +28,44 @@ class NewsListResponse(BaseModel):
     page: PageInfo
     meta: MetaInfo
 
+class TrendingItemOut(BaseModel):
+    id: str
+    title: Optional[str] = None
+    url: Optional[str] = None
+    section: Optional[str] = None
+    thumbnail: Optional[str] = None
+    published_time: Optional[datetime] = None
+    slug: Optional[str] = None
+    score: float = Field(..., description="Lượt xem đã giảm dần theo thời gian")
+
+class TrendingResponse(BaseModel):
+    section: Optional[str] = None
+    items: List[TrendingItemOut]
+
+class RelatedItemOut(BaseModel):
+    id: str
+    title: Optional[str] = None
+    url: Optional[str] = None
+    section: Optional[str] = None
+    thumbnail: Optional[str] = None
+    published_time: Optional[datetime] = None
+    slug: Optional[str] = None
+    score: float = Field(..., description="Cosine similarity (title + description)")
+
+class RelatedResponse(BaseModel):
+    id: str
+    items: List[RelatedItemOut]
+
+class NewsBatchItem(BaseModel):
+    id: Optional[str] = Field(None, description="id được yêu cầu (nếu tra theo id)")
+    slug: Optional[str] = Field(None, description="slug được yêu cầu (nếu tra theo slug)")
+    found: bool
+    item: Optional[NewsItemOut] = None
+
+class NewsBatchResponse(BaseModel):
+    items: List[NewsBatchItem]
+    meta: MetaInfo
+
 class ChildSection(BaseModel):
     label: str = Field(..., examples=["China"])
     href: str  = Field(..., examples=["/china"])
@@ -2,6 +2,9 @@
 from typing import Iterable, Optional, List, Tuple
 from datetime import datetime
 from fastapi import Request
+from server.database import get_read_pool
+from server.deadline import query_timeout
+import os
 import re
 # Whitelist các cột cho phép SELECT & SORT
 ALLOWED_FIELDS = {
@@ -9,6 +12,27 @@ ALLOWED_FIELDS = {
 }
 ALLOWED_SORT = {"published_time", "title", "section", "id", "view_count"}
 
+NEWS_BATCH_MAX = int(os.getenv("NEWS_BATCH_MAX", "100"))
+
+# slug = đoạn cuối của url; index biểu thức để tra theo slug không phải quét bảng
+SLUG_SQL = "regexp_replace(rtrim(url, '/'), '^.*/', '')"
+NEWS_SLUG_INDEX_SQL = f"CREATE INDEX IF NOT EXISTS news_url_slug_idx ON news (({SLUG_SQL}))"
+# Tạo index phụ cho bảng news lúc khởi động (opt-in, giống SENTIMENT_INSTALL_SCHEMA)
+NEWS_INSTALL_INDEXES = os.getenv("NEWS_INSTALL_INDEXES", "false").lower() in ("1", "true", "yes")
+
+async def install_indexes(pool):
+    async with pool.acquire() as conn:
+        await conn.execute(NEWS_SLUG_INDEX_SQL)
+
+# Bảng news_duplicate là opt-in (DEDUP_INSTALL_SCHEMA); chưa có bảng -> collapse bị bỏ qua
+_duplicate_table_ready = False
+
+async def detect_duplicate_table(pool) -> bool:
+    global _duplicate_table_ready
+    async with pool.acquire() as conn:
+        _duplicate_table_ready = bool(await conn.fetchval("SELECT to_regclass('news_duplicate') IS NOT NULL"))
+    return _duplicate_table_ready
+
 def _normalize_fields(fields: Optional[Iterable[str]]) -> List[str]:
     """
     Giữ lại những cột hợp lệ theo whitelist; nếu rỗng → trả bộ mặc định.
@@ -43,29 +67,26 @@ def normalize_section(section: str) -> str:
     s = re.sub(r"\s+/+\s+", " / ", s)  # đảm bảo chỉ 1 khoảng trắng xung quanh /
     return s.strip()
 
-async def list_news(
-    request: Request,
-    fields: Optional[Iterable[str]] = None,
-    sections: Optional[List[str]] = None,   # đã normalize ở router
+def section_match_sql(pattern: str, column: str = "section") -> str:
+    """Điều kiện khớp section (bỏ ký tự ngoài a-z0-9/, so khớp chứa); `pattern` là biểu thức SQL, vd. $1."""
+    return f"""
+            regexp_replace(
+                lower(replace({column}, '&', 'and')),
+                '[^a-z0-9/]', '', 'g'
+            ) ILIKE '%' || regexp_replace(
+                lower(replace({pattern}, '&', 'and')),
+                '[^a-z0-9/]', '', 'g'
+            ) || '%'
+        """
+
+def build_news_filters(
+    sections: Optional[List[str]] = None,
     date_from: Optional[datetime] = None,
     date_to: Optional[datetime] = None,
     q: Optional[str] = None,
-    limit: int = 20,
-    offset: int = 0,
-    order_by: Optional[str] = "published_time",
-    order_dir: Optional[str] = "DESC",
-):
-    # Chuẩn hoá tối thiểu
-    q = (q or "").strip() or None
-    order_dir = (order_dir or "DESC").upper()
-
-    pool = request.app.state.pool
-
-    # 1) SELECT
-    select_cols = _normalize_fields(fields)
-    select_sql = ", ".join(select_cols)
-
-    # 2) WHERE + params
+    collapse_duplicates: bool = False,
+) -> Tuple[List[str], List[object]]:
+    """Điều kiện WHERE (chưa ghép) + params dùng chung cho list_news và export."""
     where_parts: List[str] = []
     params: List[object] = []
 
@@ -78,15 +99,7 @@ async def list_news(
         sec = normalized_sections[0]
         params.append(sec)
 
-        where_parts.append(f"""
-            regexp_replace(
-                lower(replace(section, '&', 'and')),
-                '[^a-z0-9/]', '', 'g'
-            ) ILIKE '%' || regexp_replace(
-                lower(replace(${len(params)}, '&', 'and')),
-                '[^a-z0-9/]', '', 'g'
-            ) || '%'
-        """)
+        where_parts.append(section_match_sql(f"${len(params)}"))
 
     if date_from:
         params.append(date_from)
@@ -107,13 +120,45 @@ async def list_news(
             params.append(like); t_idx = len(params)
             params.append(like); d_idx = len(params)
             params.append(like); id_idx = len(params)
-            print(f"LIKE conditions: title={like}, description={like}, id={like}")
             where_like_parts.append(
                 f"(title ILIKE ${t_idx} OR description ILIKE ${d_idx} OR CAST(id AS TEXT) ILIKE ${id_idx})"
             )
 
         # 🔄 Chuyển sang tìm kiếm rộng (chỉ cần khớp 1 từ khóa)
-        where_parts.append("(" + " OR ".join(where_like_parts) + ")")
+        if where_like_parts:
+            where_parts.append("(" + " OR ".join(where_like_parts) + ")")
+
+    if collapse_duplicates and _duplicate_table_ready:
+        # Ẩn bản trùng, chỉ giữ bài gốc (xem server/modules/news/dedup.py)
+        where_parts.append("NOT EXISTS (SELECT 1 FROM news_duplicate d WHERE d.news_id = news.id)")
+
+    return where_parts, params
+
+async def list_news(
+    request: Request,
+    fields: Optional[Iterable[str]] = None,
+    sections: Optional[List[str]] = None,   # đã normalize ở router
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    q: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    order_by: Optional[str] = "published_time",
+    order_dir: Optional[str] = "DESC",
+    collapse_duplicates: bool = False,
+):
+    # Chuẩn hoá tối thiểu
+    q = (q or "").strip() or None
+    order_dir = (order_dir or "DESC").upper()
+
+    pool = get_read_pool(request)
+
+    # 1) SELECT
+    select_cols = _normalize_fields(fields)
+    select_sql = ", ".join(select_cols)
+
+    # 2) WHERE + params
+    where_parts, params = build_news_filters(sections, date_from, date_to, q, collapse_duplicates)
 
     # ✅ Ghép WHERE SQL cuối cùng (ngoài if)
     where_sql = f"WHERE {' AND '.join(where_parts)}" if where_parts else ""
@@ -136,9 +181,9 @@ async def list_news(
     count_sql = f"SELECT COUNT(*) FROM news {where_sql}"
 
     async with pool.acquire() as conn:
-        rows = await conn.fetch(sql, *params)
+        rows = await conn.fetch(sql, *params, timeout=query_timeout(request))
         items = [dict(r) for r in rows]
-        total = await conn.fetchval(count_sql, *params)
+        total = await conn.fetchval(count_sql, *params, timeout=query_timeout(request))
 
     return {
         "items": items,
@@ -147,7 +192,7 @@ async def list_news(
     }
 
 async def get_news_by_id(request: Request, news_id: str):
-    pool = request.app.state.pool
+    pool = get_read_pool(request)
     sql = """
         SELECT 
             id,
@@ -163,6 +208,68 @@ async def get_news_by_id(request: Request, news_id: str):
         LIMIT 1;
     """
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(sql, news_id)
+        row = await conn.fetchrow(sql, news_id, timeout=query_timeout(request))
 
     return dict(row) if row else None
+
+
+def slug_from_path(value: str) -> str:
+    """'https://site/a/b/slug/' hoặc 'a/b/slug' -> 'slug'."""
+    v = (value or "").strip().strip("/")
+    if "://" in v:
+        v = v.split("://", 1)[-1]
+    return v.rsplit("/", 1)[-1]
+
+async def get_news_batch(
+    request: Request,
+    ids: Optional[List[str]] = None,
+    slugs: Optional[List[str]] = None,
+    fields: Optional[Iterable[str]] = None,
+):
+    """
+    Tra nhiều bài bằng một query: nhánh `id = ANY(...)` (primary key) UNION ALL nhánh
+    slug `= ANY(...)` (index news_url_slug_idx); nhánh nào không có giá trị thì bỏ.
+    Slug khớp chính xác đoạn cuối của url (khác trang chi tiết dùng ILIKE '%slug%');
+    slug trùng nhiều bài -> lấy bài mới nhất.
+    Trả về đúng thứ tự yêu cầu (id trước, rồi slug); bài không tìm thấy -> found=False.
+    """
+    ids = [str(i).strip() for i in ids or [] if str(i).strip()]
+    slug_pairs = [(s, slug_from_path(s)) for s in slugs or [] if s and s.strip("/ ")]
+    slug_keys = [key for _, key in slug_pairs]
+
+    select_cols = _normalize_fields(fields)
+    # id/url/published_time cần để ghép kết quả theo request
+    query_cols = list(dict.fromkeys(select_cols + ["id", "url", "published_time"]))
+
+    rows = []
+    if ids or slug_keys:
+        pool = get_read_pool(request)
+        select = f"SELECT {', '.join(query_cols)}, {SLUG_SQL} AS _slug FROM news"
+        branches, params = [], []
+        # OR giữa id và biểu thức slug buộc Postgres quét cả bảng -> tách hai nhánh
+        if ids:
+            params.append(list(set(ids)))
+            branches.append(f"({select} WHERE id = ANY(${len(params)}::text[]))")
+        if slug_keys:
+            params.append(list(set(slug_keys)))
+            branches.append(f"({select} WHERE {SLUG_SQL} = ANY(${len(params)}::text[]))")
+        sql = " UNION ALL ".join(branches) + " ORDER BY published_time DESC NULLS LAST"
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(sql, *params, timeout=query_timeout(request))
+
+    by_id, by_slug = {}, {}
+    for r in rows:
+        item = {c: r[c] for c in select_cols}
+        item["slug"] = r["_slug"] or None
+        by_id.setdefault(str(r["id"]), item)
+        by_slug.setdefault(r["_slug"], item)
+
+    results = []
+    for i in ids:
+        item = by_id.get(i)
+        results.append({"id": i, "slug": None, "found": item is not None, "item": item})
+    for raw, key in slug_pairs:
+        item = by_slug.get(key)
+        results.append({"id": None, "slug": raw, "found": item is not None, "item": item})
+
+    return {"items": results, "meta": {"fields": select_cols}}
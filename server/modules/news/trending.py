@@ -0,0 +1,206 @@
+# server/modules/news/trending.py
+"""
+Index "trending now" trong bộ nhớ, cập nhật từ increase_view.
+
+Điểm mỗi bài = tổng lượt xem giảm dần theo hàm mũ (half-life TRENDING_HALF_LIFE).
+Để không phải decay lại toàn bộ bài mỗi lần, điểm được lưu ở "thang gốc" t0:
+mỗi lượt xem tại t cộng exp((t - t0) / tau). Điểm ở thang gốc chỉ tăng, nên thứ
+tự giữa các bài không đổi theo thời gian và top-K của từng section có thể duy trì
+tăng dần (chỉ bài vừa được xem mới có thể vào top). Khi exponent quá lớn thì
+rebase t0.
+
+Mỗi worker giữ index riêng và snapshot định kỳ ra đĩa để restart không mất state.
+"""
+import asyncio
+import bisect
+import json
+import math
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from server.config import TRENDING_SNAPSHOT_PATH
+
+TRENDING_HALF_LIFE = float(os.getenv("TRENDING_HALF_LIFE", str(6 * 3600)))   # giây
+TRENDING_TOP_K = int(os.getenv("TRENDING_TOP_K", "100"))                    # số bài giữ cho mỗi section
+TRENDING_MAX_TRACKED = int(os.getenv("TRENDING_MAX_TRACKED", "50000"))
+TRENDING_SNAPSHOT_INTERVAL = float(os.getenv("TRENDING_SNAPSHOT_INTERVAL", "60"))
+
+ALL_SECTIONS = "all"
+_REBASE_EXPONENT = 50.0
+
+
+def _slug(label: str) -> str:
+    # import muộn: news.router import module này
+    from server.modules.news.router import slugify
+    return slugify(label)
+
+
+def section_keys(section: Optional[str]) -> List[str]:
+    """'World / China' -> ['all', 'world', 'world/china']"""
+    keys = [ALL_SECTIONS]
+    parts = [p.strip() for p in (section or "").split("/") if p.strip()]
+    if parts:
+        parent = _slug(parts[0])
+        if parent:
+            keys.append(parent)
+            if len(parts) >= 2:
+                child = _slug(parts[1])
+                if child:
+                    keys.append(f"{parent}/{child}")
+    return keys
+
+
+class _TopK:
+    """List (score, id) sắp tăng dần, tối đa k phần tử."""
+
+    __slots__ = ("k", "entries", "scores")
+
+    def __init__(self, k: int):
+        self.k = k
+        self.entries: List[Tuple[float, str]] = []
+        self.scores: Dict[str, float] = {}
+
+    def offer(self, news_id: str, score: float):
+        old = self.scores.get(news_id)
+        if old is not None:
+            del self.entries[bisect.bisect_left(self.entries, (old, news_id))]
+        elif len(self.entries) >= self.k:
+            if score <= self.entries[0][0]:
+                return
+            _, evicted = self.entries.pop(0)
+            del self.scores[evicted]
+        bisect.insort(self.entries, (score, news_id))
+        self.scores[news_id] = score
+
+    def top(self, n: int) -> List[Tuple[float, str]]:
+        return self.entries[:-n - 1:-1] if n > 0 else []
+
+
+class TrendingIndex:
+    def __init__(self, half_life: float = TRENDING_HALF_LIFE, k: int = TRENDING_TOP_K,
+                 max_tracked: int = TRENDING_MAX_TRACKED):
+        self.tau = half_life / math.log(2)
+        self.k = k
+        self.max_tracked = max_tracked
+        self.t0 = time.time()
+        self.scores: Dict[str, float] = {}
+        self.meta: Dict[str, dict] = {}
+        self.tops: Dict[str, _TopK] = {}
+
+    # ---------- update ----------
+    def _rebase(self, now: float):
+        factor = math.exp(-(now - self.t0) / self.tau)
+        self.t0 = now
+        self.scores = {i: s * factor for i, s in self.scores.items()}
+        for top in self.tops.values():
+            top.entries = [(s * factor, i) for s, i in top.entries]
+            top.scores = {i: s * factor for i, s in top.scores.items()}
+
+    def _prune(self):
+        # Bỏ 10% bài điểm thấp nhất, trừ bài đang nằm trong top-K của section nào đó
+        pinned = set()
+        for top in self.tops.values():
+            pinned.update(top.scores)
+        candidates = sorted((s, i) for i, s in self.scores.items() if i not in pinned)
+        for _, news_id in candidates[: max(1, len(self.scores) // 10)]:
+            self.scores.pop(news_id, None)
+            self.meta.pop(news_id, None)
+
+    def record_view(self, news_id: str, meta: dict, now: Optional[float] = None, weight: float = 1.0):
+        now = time.time() if now is None else now
+        if (now - self.t0) / self.tau > _REBASE_EXPONENT:
+            self._rebase(now)
+
+        news_id = str(news_id)
+        score = self.scores.get(news_id, 0.0) + weight * math.exp((now - self.t0) / self.tau)
+        self.scores[news_id] = score
+        self.meta[news_id] = meta
+
+        for key in section_keys(meta.get("section")):
+            top = self.tops.get(key)
+            if top is None:
+                top = self.tops[key] = _TopK(self.k)
+            top.offer(news_id, score)
+
+        if len(self.scores) > self.max_tracked:
+            self._prune()
+
+    # ---------- query ----------
+    def top(self, section: Optional[str] = None, n: int = 10, now: Optional[float] = None) -> List[dict]:
+        key = ALL_SECTIONS
+        if section:
+            key = "/".join(_slug(p) for p in section.strip("/").split("/") if p.strip())
+        top = self.tops.get(key)
+        if top is None:
+            return []
+        now = time.time() if now is None else now
+        decay = math.exp(-(now - self.t0) / self.tau)
+        out = []
+        for score, news_id in top.top(n):
+            item = dict(self.meta.get(news_id) or {"id": news_id})
+            item["score"] = score * decay
+            out.append(item)
+        return out
+
+    # ---------- snapshot ----------
+    def snapshot(self) -> dict:
+        return {
+            "half_life": self.tau * math.log(2),
+            "t0": self.t0,
+            "items": [[i, s, self.meta.get(i)] for i, s in self.scores.items()],
+        }
+
+    def restore(self, data: dict):
+        saved_t0 = float(data.get("t0", self.t0))
+        for news_id, score, meta in data.get("items", []):
+            # Đưa điểm về thang t0 hiện tại
+            score = float(score) * math.exp((saved_t0 - self.t0) / self.tau)
+            if score <= 0:
+                continue
+            self.scores[news_id] = score
+            self.meta[news_id] = meta or {"id": news_id}
+            for key in section_keys((meta or {}).get("section")):
+                top = self.tops.get(key)
+                if top is None:
+                    top = self.tops[key] = _TopK(self.k)
+                top.offer(news_id, score)
+
+    @staticmethod
+    def _write(data: dict, path):
+        path = str(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp, path)
+
+    def save(self, path=TRENDING_SNAPSHOT_PATH):
+        self._write(self.snapshot(), path)
+
+    async def save_async(self, path=TRENDING_SNAPSHOT_PATH):
+        # snapshot() đọc self.scores -> chạy trên event loop (cùng thread với record_view),
+        # chỉ phần ghi file đưa sang thread
+        await asyncio.to_thread(self._write, self.snapshot(), path)
+
+    def load(self, path=TRENDING_SNAPSHOT_PATH) -> bool:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.restore(json.load(f))
+            return True
+        except FileNotFoundError:
+            return False
+        except (ValueError, TypeError) as e:
+            print(f"Trending snapshot ignored: {e}")
+            return False
+
+    async def run_snapshots(self, interval: float = TRENDING_SNAPSHOT_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.save_async()
+            except Exception as e:
+                print(f"Trending snapshot failed: {e}")
+
+
+trending_index = TrendingIndex()
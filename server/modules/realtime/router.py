@@ -0,0 +1,33 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from server.modules.realtime.service import event_stream
+from server.modules.news.router import _normalize_sections
+
+router = APIRouter(prefix="/realtime", tags=["Realtime"])
+
+@router.get(
+    "/news",
+    summary="Server-Sent Events feed of newly published news",
+    response_class=StreamingResponse,
+)
+async def stream_news(
+    request: Request,
+    sections: Optional[str] = Query(
+        None, description="CSV of sections to follow, e.g. technology,world/china"
+    ),
+    sentiment: bool = Query(False, description="Include stored pos/neg/neu for each new article (null until scored)"),
+):
+    feed = getattr(request.app.state, "news_feed", None)
+    if feed is None:
+        raise HTTPException(status_code=503, detail="Realtime feed is disabled")
+
+    if feed.full():
+        raise HTTPException(status_code=503, detail="Too many subscribers", headers={"Retry-After": "5"})
+
+    section_list = _normalize_sections(sections.split(",")) if sections else None
+    return StreamingResponse(
+        event_stream(feed, section_list, sentiment),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,236 @@
+# server/modules/realtime/service.py
+"""
+Feed realtime bài viết mới qua một kết nối Postgres LISTEN dùng chung cho mỗi worker.
+
+Trigger `news_notify_insert` (xem NEWS_NOTIFY_TRIGGER_SQL) gửi pg_notify khi có
+bài mới; NewsFeed nhận một lần rồi fan-out tới mọi subscriber SSE trong worker.
+Subscriber lọc theo section và có thể nhận kèm sentiment: điểm đã lưu trong
+news_sentiment (backfill / ingest), đọc một query cho cả loạt event đang chờ;
+bài chưa được chấm -> sentiment = null. Fan-out không chạy model.
+"""
+import asyncio
+import json
+import os
+import re
+from typing import List, Optional, Set
+
+import asyncpg
+
+from server.database import DATABASE_URL, DB_STATEMENT_CACHE_MODE, get_ssl_context
+from server.metrics import REALTIME_DROPPED, REALTIME_EVENTS, REALTIME_SUBSCRIBERS
+from server.modules.news.service import normalize_section
+
+REALTIME_ENABLED = os.getenv("REALTIME_ENABLED", "false").lower() in ("1", "true", "yes")
+# LISTEN cần session cố định -> không đi qua PgBouncer transaction pooling
+DATABASE_LISTEN_URL = os.getenv("DATABASE_LISTEN_URL") or DATABASE_URL
+if REALTIME_ENABLED and DB_STATEMENT_CACHE_MODE == "pgbouncer" and not os.getenv("DATABASE_LISTEN_URL"):
+    # DATABASE_URL trỏ tới PgBouncer: LISTEN không bao giờ nhận được NOTIFY
+    print("Realtime feed disabled: set DATABASE_LISTEN_URL to a direct Postgres/session-pooled URL")
+    REALTIME_ENABLED = False
+REALTIME_INSTALL_TRIGGER = os.getenv("REALTIME_INSTALL_TRIGGER", "false").lower() in ("1", "true", "yes")
+REALTIME_MAX_SUBSCRIBERS = int(os.getenv("REALTIME_MAX_SUBSCRIBERS", "5000"))
+REALTIME_QUEUE_SIZE = int(os.getenv("REALTIME_QUEUE_SIZE", "100"))
+_DISPATCH_BATCH = 100   # số event tối đa gom lại cho một lần đọc điểm sentiment
+REALTIME_HEARTBEAT = float(os.getenv("REALTIME_HEARTBEAT", "15"))
+
+NEWS_CHANNEL = "news_events"
+
+NEWS_NOTIFY_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_news_insert() RETURNS trigger AS $$
+BEGIN
+    -- payload pg_notify tối đa 8000 byte -> cắt bớt các trường dài
+    PERFORM pg_notify('{NEWS_CHANNEL}', json_build_object(
+        'id', NEW.id,
+        'title', left(NEW.title, 500),
+        'url', NEW.url,
+        'section', NEW.section,
+        'thumbnail', NEW.thumbnail,
+        'published_time', NEW.published_time,
+        'description', left(NEW.description, 1000)
+    )::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS news_notify_insert ON news;
+CREATE TRIGGER news_notify_insert
+    AFTER INSERT ON news
+    FOR EACH ROW EXECUTE FUNCTION notify_news_insert();
+"""
+
+
+def section_key(section: str) -> str:
+    """Cùng quy tắc so khớp với list_news (bỏ ký tự ngoài a-z0-9/)."""
+    return re.sub(r"[^a-z0-9/]", "", normalize_section(section).replace("&", "and"))
+
+
+class Subscriber:
+    __slots__ = ("queue", "sections", "sentiment")
+
+    def __init__(self, sections: Optional[List[str]], sentiment: bool):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=REALTIME_QUEUE_SIZE)
+        self.sections = [section_key(s) for s in sections or [] if s] or None
+        self.sentiment = sentiment
+
+    def matches(self, event_section_key: str) -> bool:
+        if not self.sections:
+            return True
+        return any(s in event_section_key for s in self.sections)
+
+    def offer(self, frame: str):
+        if self.queue.full():
+            # Client chậm: bỏ event cũ nhất thay vì chặn cả feed
+            self.queue.get_nowait()
+            REALTIME_DROPPED.inc()
+        self.queue.put_nowait(frame)
+
+
+class NewsFeed:
+    def __init__(self, pool=None, dsn: str = DATABASE_LISTEN_URL, channel: str = NEWS_CHANNEL):
+        self.pool = pool                 # đọc điểm sentiment đã lưu
+        self.dsn = dsn
+        self.channel = channel
+        self.subscribers: Set[Subscriber] = set()
+        self._conn: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._events: asyncio.Queue = asyncio.Queue(maxsize=1000)
+
+    # ---------- subscribe ----------
+    def full(self) -> bool:
+        return len(self.subscribers) >= REALTIME_MAX_SUBSCRIBERS
+
+    def subscribe(self, sections: Optional[List[str]] = None, sentiment: bool = False) -> Subscriber:
+        if self.full():
+            raise OverflowError("Too many realtime subscribers")
+        sub = Subscriber(sections, sentiment)
+        self.subscribers.add(sub)
+        REALTIME_SUBSCRIBERS.set(len(self.subscribers))
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        self.subscribers.discard(sub)
+        REALTIME_SUBSCRIBERS.set(len(self.subscribers))
+
+    # ---------- LISTEN ----------
+    def _on_notify(self, conn, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        try:
+            self._events.put_nowait(event)
+        except asyncio.QueueFull:
+            REALTIME_DROPPED.inc()
+
+    async def _listen_forever(self):
+        backoff = 1.0
+        while True:
+            try:
+                self._conn = await asyncpg.connect(self.dsn, ssl=get_ssl_context())
+                if REALTIME_INSTALL_TRIGGER:
+                    await self._conn.execute(NEWS_NOTIFY_TRIGGER_SQL)
+                closed = asyncio.Event()
+                self._conn.add_termination_listener(lambda _c: closed.set())
+                await self._conn.add_listener(self.channel, self._on_notify)
+                backoff = 1.0
+                await closed.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Realtime listener error: {e}")
+            finally:
+                if self._conn is not None and not self._conn.is_closed():
+                    await self._conn.close()
+                self._conn = None
+            # Mất kết nối -> thử lại với backoff
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    async def _dispatch_forever(self):
+        while True:
+            events = [await self._events.get()]
+            while not self._events.empty() and len(events) < _DISPATCH_BATCH:
+                events.append(self._events.get_nowait())
+            scores = await self._stored_scores(events) if any(s.sentiment for s in self.subscribers) else {}
+            for event in events:
+                await self._fanout(event, scores)
+
+    async def _stored_scores(self, events: List[dict]) -> dict:
+        ids = [str(e["id"]) for e in events if e.get("id") is not None]
+        if self.pool is None or not ids:
+            return {}
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(
+                    "SELECT news_id, pos, neg, neu, model_version FROM news_sentiment WHERE news_id = ANY($1::text[])",
+                    ids,
+                )
+        except Exception as e:
+            # Chưa cài schema sentiment / DB bận -> gửi event không kèm điểm
+            print(f"Realtime sentiment error: {e}")
+            return {}
+        return {
+            r["news_id"]: {"pos": r["pos"], "neg": r["neg"], "neu": r["neu"], "model_version": r["model_version"]}
+            for r in rows
+        }
+
+    async def _fanout(self, event: dict, scores: dict):
+        REALTIME_EVENTS.inc()
+        key = section_key(event.get("section") or "")
+        targets = [s for s in self.subscribers if s.matches(key)]
+        if not targets:
+            return
+
+        plain = {k: v for k, v in event.items() if k != "description"}
+        plain["slug"] = (event.get("url") or "").rstrip("/").split("/")[-1] or None
+
+        with_sentiment = None
+        if any(s.sentiment for s in targets):
+            with_sentiment = dict(plain)
+            with_sentiment["sentiment"] = scores.get(str(event.get("id")))
+
+        # Serialize một lần cho mọi subscriber
+        frame_plain = _sse_frame(plain)
+        frame_sentiment = _sse_frame(with_sentiment) if with_sentiment is not None else None
+        for sub in targets:
+            sub.offer(frame_sentiment if sub.sentiment else frame_plain)
+
+    async def start(self):
+        self._task = asyncio.gather(self._listen_forever(), self._dispatch_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+
+def _sse_frame(event: dict) -> str:
+    return f"id: {event.get('id')}\nevent: news\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def event_stream(feed: NewsFeed, sections: Optional[List[str]] = None, sentiment: bool = False):
+    """
+    Sinh SSE; gửi comment heartbeat để proxy không đóng kết nối rảnh. Subscribe ngay
+    trong generator: client ngắt trước khi body chạy thì không để lại subscriber mồ côi.
+    """
+    try:
+        sub = feed.subscribe(sections, sentiment)
+    except OverflowError:
+        # Đã kiểm tra feed.full() ở router; chỉ xảy ra khi nhiều client vào cùng lúc
+        yield "retry: 5000\nevent: error\ndata: too many subscribers\n\n"
+        return
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                frame = await asyncio.wait_for(sub.queue.get(), timeout=REALTIME_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield frame
+    finally:
+        feed.unsubscribe(sub)
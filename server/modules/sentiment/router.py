@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from server.modules.sentiment.schemas import Interval, SentimentSeriesResponse
+from server.modules.sentiment.service import sentiment_timeseries, INTERVAL_SECONDS, SENTIMENT_MAX_BUCKETS
+from server.modules.news.router import _normalize_sections
+
+router = APIRouter(prefix="/sentiment", tags=["Sentiment"])
+
+@router.get(
+    "/timeseries",
+    summary="Bucketed sentiment statistics from stored scores (no model run)",
+    response_model=SentimentSeriesResponse,
+)
+async def get_sentiment_timeseries(
+    request: Request,
+    interval: Interval = Query("day", description="Bucket size: hour | day | week"),
+    date_from: Optional[datetime] = Query(None, description="Mặc định: 30 ngày trước"),
+    date_to: Optional[datetime] = Query(None, description="Mặc định: hiện tại"),
+    sections: Optional[str] = Query(
+        None, description="CSV of sections, e.g. technology,world/china"
+    ),
+    by_section: bool = Query(False, description="Trả một series riêng cho mỗi section"),
+):
+    # Không có timezone -> coi là UTC (rollup lưu timestamptz)
+    if date_from and date_from.tzinfo is None:
+        date_from = date_from.replace(tzinfo=timezone.utc)
+    if date_to and date_to.tzinfo is None:
+        date_to = date_to.replace(tzinfo=timezone.utc)
+    date_to = date_to or datetime.now(timezone.utc)
+    date_from = date_from or date_to - timedelta(days=30)
+    if date_from >= date_to:
+        raise HTTPException(status_code=400, detail="date_from phải nhỏ hơn date_to")
+    if (date_to - date_from).total_seconds() / INTERVAL_SECONDS[interval] > SENTIMENT_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Khoảng thời gian quá dài cho interval={interval}")
+
+    section_list = _normalize_sections(sections.split(",")) if sections else None
+    return await sentiment_timeseries(request, interval, date_from, date_to, section_list, by_section)
@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+Interval = Literal["hour", "day", "week"]
+
+class SentimentBucket(BaseModel):
+    bucket: datetime = Field(..., description="Đầu bucket (date_trunc theo interval)")
+    section: Optional[str] = Field(None, description="Section (khi by_section=true)")
+    count: int = Field(..., description="Số bài đã chấm điểm trong bucket")
+    pos: float
+    neg: float
+    neu: float
+
+class SentimentSeriesResponse(BaseModel):
+    interval: Interval
+    date_from: datetime
+    date_to: datetime
+    sections: Optional[List[str]] = None
+    buckets: List[SentimentBucket]
@@ -0,0 +1,260 @@
+# server/modules/sentiment/service.py
+"""
+Điểm sentiment lưu trong DB + rollup theo giờ để vẽ biểu đồ mà không chạy model.
+
+- news_sentiment: điểm pos/neg/neu của từng bài (một dòng / bài, kèm model_version).
+- sentiment_rollup_hourly: (giờ, section) -> count + tổng pos/neg/neu. Tổng cộng
+  dồn được nên day/week chỉ là SUM trên các bucket giờ.
+- Worker backfill chấm điểm các bài chưa có điểm theo batch; mỗi batch ghi điểm
+  rồi tính lại đúng những bucket (giờ, section) bị ảnh hưởng (rollup tăng dần).
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import List, Optional
+
+import asyncpg
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+
+from server.config import DEFAULT_MODEL
+from server.database import get_read_pool
+from server.deadline import query_timeout
+from server.modules.ai.schemas import NewsInput
+from server.modules.ai.service import classify_news
+from server.modules.news.service import normalize_section, section_match_sql
+
+SENTIMENT_MODEL_VERSION = os.getenv("SENTIMENT_MODEL_VERSION") or DEFAULT_MODEL
+SENTIMENT_INSTALL_SCHEMA = os.getenv("SENTIMENT_INSTALL_SCHEMA", "false").lower() in ("1", "true", "yes")
+SENTIMENT_BACKFILL_ENABLED = os.getenv("SENTIMENT_BACKFILL_ENABLED", "false").lower() in ("1", "true", "yes")
+SENTIMENT_BACKFILL_BATCH = int(os.getenv("SENTIMENT_BACKFILL_BATCH", "64"))
+SENTIMENT_BACKFILL_INTERVAL = float(os.getenv("SENTIMENT_BACKFILL_INTERVAL", "30"))
+# Giới hạn số bucket trả về cho một request
+SENTIMENT_MAX_BUCKETS = int(os.getenv("SENTIMENT_MAX_BUCKETS", "5000"))
+
+INTERVAL_SECONDS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+
+SENTIMENT_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS news_sentiment (
+    news_id        TEXT PRIMARY KEY REFERENCES news(id) ON DELETE CASCADE,
+    pos            DOUBLE PRECISION NOT NULL,
+    neg            DOUBLE PRECISION NOT NULL,
+    neu            DOUBLE PRECISION NOT NULL,
+    model_version  TEXT NOT NULL,
+    classified_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS sentiment_rollup_hourly (
+    bucket   TIMESTAMPTZ NOT NULL,
+    section  TEXT NOT NULL,
+    n        BIGINT NOT NULL,
+    sum_pos  DOUBLE PRECISION NOT NULL,
+    sum_neg  DOUBLE PRECISION NOT NULL,
+    sum_neu  DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (bucket, section)
+);
+"""
+
+# Tính lại các bucket (giờ, section) chứa những bài trong $1
+_REFRESH_ROLLUP_SQL = """
+    WITH touched AS (
+        SELECT DISTINCT date_trunc('hour', published_time) AS bucket, COALESCE(section, '') AS section
+        FROM news
+        WHERE id = ANY($1::text[]) AND published_time IS NOT NULL
+    )
+    INSERT INTO sentiment_rollup_hourly (bucket, section, n, sum_pos, sum_neg, sum_neu)
+    SELECT t.bucket, t.section, count(*), sum(s.pos), sum(s.neg), sum(s.neu)
+    FROM touched t
+    JOIN news n
+      ON n.published_time >= t.bucket AND n.published_time < t.bucket + interval '1 hour'
+     AND COALESCE(n.section, '') = t.section
+    JOIN news_sentiment s ON s.news_id = n.id
+    GROUP BY t.bucket, t.section
+    ON CONFLICT (bucket, section) DO UPDATE
+    SET n = EXCLUDED.n, sum_pos = EXCLUDED.sum_pos, sum_neg = EXCLUDED.sum_neg, sum_neu = EXCLUDED.sum_neu
+"""
+
+_REBUILD_ROLLUP_SQL = """
+    INSERT INTO sentiment_rollup_hourly (bucket, section, n, sum_pos, sum_neg, sum_neu)
+    SELECT date_trunc('hour', n.published_time), COALESCE(n.section, ''), count(*), sum(s.pos), sum(s.neg), sum(s.neu)
+    FROM news n
+    JOIN news_sentiment s ON s.news_id = n.id
+    WHERE n.published_time IS NOT NULL
+    GROUP BY 1, 2
+"""
+
+
+async def install_schema(pool):
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(SENTIMENT_SCHEMA_SQL)
+            if not await conn.fetchval("SELECT EXISTS (SELECT 1 FROM sentiment_rollup_hourly)"):
+                await conn.execute(_REBUILD_ROLLUP_SQL)
+
+
+async def rebuild_rollups(pool):
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("TRUNCATE sentiment_rollup_hourly")
+            await conn.execute(_REBUILD_ROLLUP_SQL)
+
+
+async def store_scores(pool, scores: List[dict], model_version: str = SENTIMENT_MODEL_VERSION):
+    """scores: [{"id", "pos", "neg", "neu"}] -> upsert news_sentiment + cập nhật rollup."""
+    if not scores:
+        return
+    ids = [str(s["id"]) for s in scores]
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(
+                """
+                INSERT INTO news_sentiment (news_id, pos, neg, neu, model_version, classified_at)
+                SELECT * , now()
+                FROM unnest($1::text[], $2::float8[], $3::float8[], $4::float8[], $5::text[])
+                ON CONFLICT (news_id) DO UPDATE
+                SET pos = EXCLUDED.pos, neg = EXCLUDED.neg, neu = EXCLUDED.neu,
+                    model_version = EXCLUDED.model_version, classified_at = EXCLUDED.classified_at
+                """,
+                ids,
+                [float(s["pos"]) for s in scores],
+                [float(s["neg"]) for s in scores],
+                [float(s["neu"]) for s in scores],
+                [model_version] * len(scores),
+            )
+            await conn.execute(_REFRESH_ROLLUP_SQL, ids)
+
+
+async def reuse_canonical_scores(pool, news_ids: List[str]) -> set:
+    """
+    Bài là bản trùng (news_duplicate) của bài đã có điểm -> chép điểm của bài gốc
+    thay vì chạy model. Trả về tập id đã được chép.
+    """
+    if not news_ids:
+        return set()
+    ids = [str(i) for i in news_ids]
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                rows = await conn.fetch(
+                    """
+                    INSERT INTO news_sentiment (news_id, pos, neg, neu, model_version, classified_at)
+                    SELECT d.news_id, s.pos, s.neg, s.neu, s.model_version, now()
+                    FROM news_duplicate d
+                    JOIN news_sentiment s ON s.news_id = d.canonical_id
+                    WHERE d.news_id = ANY($1::text[])
+                    ON CONFLICT (news_id) DO NOTHING
+                    RETURNING news_id
+                    """,
+                    ids,
+                )
+                copied = [r["news_id"] for r in rows]
+                if copied:
+                    await conn.execute(_REFRESH_ROLLUP_SQL, copied)
+    except asyncpg.exceptions.UndefinedTableError:
+        # Chưa bật phát hiện bài trùng (server/modules/news/dedup.py)
+        return set()
+    return set(copied)
+
+
+async def backfill_once(pool, batch: int = SENTIMENT_BACKFILL_BATCH) -> int:
+    """Chấm điểm một batch bài chưa có điểm (mới nhất trước). Trả về số bài đã xử lý."""
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT n.id, n.title, n.description
+            FROM news n
+            WHERE NOT EXISTS (SELECT 1 FROM news_sentiment s WHERE s.news_id = n.id)
+            ORDER BY n.published_time DESC NULLS LAST
+            LIMIT $1
+            """,
+            batch,
+        )
+    if not rows:
+        return 0
+
+    # Bản trùng của bài đã chấm -> dùng lại điểm, chỉ chạy model cho phần còn lại
+    reused = await reuse_canonical_scores(pool, [r["id"] for r in rows])
+    rows = [r for r in rows if str(r["id"]) not in reused]
+    if not rows:
+        return len(reused)
+
+    result = await run_in_threadpool(
+        classify_news,
+        [NewsInput(title=r["title"] or "", description=r["description"] or "") for r in rows],
+    )
+    await store_scores(
+        pool,
+        [{"id": r["id"], "pos": p.pos, "neg": p.neg, "neu": p.neu} for r, p in zip(rows, result.news)],
+        model_version=result.model_version or SENTIMENT_MODEL_VERSION,
+    )
+    return len(rows) + len(reused)
+
+
+async def run_backfill(pool, interval: float = SENTIMENT_BACKFILL_INTERVAL, batch: int = SENTIMENT_BACKFILL_BATCH):
+    while True:
+        try:
+            done = await backfill_once(pool, batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Sentiment backfill error: {e}")
+            done = 0
+        # Còn tồn -> chạy batch tiếp ngay; hết thì chờ bài mới
+        if done < batch:
+            await asyncio.sleep(interval)
+
+
+async def sentiment_timeseries(
+    request: Request,
+    interval: str,
+    date_from: datetime,
+    date_to: datetime,
+    sections: Optional[List[str]] = None,
+    by_section: bool = False,
+):
+    """
+    Gộp rollup giờ thành bucket hour/day/week. Có `sections`: lọc theo section
+    (cùng quy tắc khớp với list_news); by_section=true -> một series cho mỗi section.
+    """
+    pool = get_read_pool(request)
+    params: List[object] = [interval, date_from, date_to]
+    section_list = [normalize_section(s) for s in sections or [] if s] or None
+
+    from_sql = "sentiment_rollup_hourly r"
+    where_parts = ["r.bucket >= date_trunc($1::text, $2::timestamptz)", "r.bucket < $3::timestamptz"]
+    group_col = "r.section" if by_section else "NULL::text"
+    if section_list:
+        params.append(section_list)
+        match = section_match_sql("f.section_filter", "r.section")
+        if by_section:
+            from_sql += f" JOIN unnest(${len(params)}::text[]) AS f(section_filter) ON {match}"
+            group_col = "f.section_filter"
+        else:
+            # Một bucket có thể khớp nhiều filter -> chỉ đếm một lần
+            where_parts.append(
+                f"EXISTS (SELECT 1 FROM unnest(${len(params)}::text[]) AS f(section_filter) WHERE {match})"
+            )
+
+    sql = f"""
+        SELECT date_trunc($1::text, r.bucket) AS bucket,
+               {group_col} AS section,
+               SUM(r.n)::bigint AS count,
+               SUM(r.sum_pos) / SUM(r.n) AS pos,
+               SUM(r.sum_neg) / SUM(r.n) AS neg,
+               SUM(r.sum_neu) / SUM(r.n) AS neu
+        FROM {from_sql}
+        WHERE {' AND '.join(where_parts)}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        LIMIT {SENTIMENT_MAX_BUCKETS}
+    """
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(sql, *params, timeout=query_timeout(request))
+
+    return {
+        "interval": interval,
+        "date_from": date_from,
+        "date_to": date_to,
+        "sections": section_list,
+        "buckets": [dict(r) for r in rows],
+    }
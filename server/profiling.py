@@ -0,0 +1,197 @@
+# server/profiling.py
+"""
+Profiling theo từng request, bật theo yêu cầu.
+
+Chỉ request của principal `api_bot` (X-API-Key hợp lệ) có header
+`X-Profile: sampled | deterministic` mới bị profile:
+
+- sampled: thread nền lấy mẫu stack của mọi thread (kể cả threadpool chạy
+  model.predict) mỗi PROFILE_SAMPLE_INTERVAL giây, lưu dạng folded stacks
+  (`.folded`, mở bằng speedscope / flamegraph.pl).
+- deterministic: cProfile trên thread event loop, lưu `.prof` (pstats/snakeviz).
+  Mỗi process chỉ một profile deterministic tại một thời điểm (request khác nhận
+  409); profile cũng ghi lại các coroutine khác chạy xen trong lúc đó.
+
+Profile được ghi vào PROFILE_DIR, giữ tối đa PROFILE_MAX_FILES file (ring).
+Response trả header `X-Profile-Id` để tải về qua /api/health/profiles/{id}.
+Khi PROFILING_ENABLED=false middleware không được gắn vào app.
+"""
+import asyncio
+import cProfile
+import marshal
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from server.config import PROFILE_DIR
+from server.dependencies import is_service_api_key
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+PROFILE_MODES = {"sampled": ".folded", "deterministic": ".prof"}
+_PROFILE_ID_RE = re.compile(r"^[A-Za-z0-9_.\-]+$")
+
+# cProfile gắn vào thread event loop dùng chung -> hai profile cùng lúc sẽ đè nhau
+_deterministic_slot = threading.Lock()
+
+
+class _StackSampler:
+    """Lấy mẫu stack của tất cả thread (trừ chính nó) theo chu kỳ."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(tid, str(tid)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self) -> bytes:
+        lines = [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+        return ("\n".join(lines) + "\n").encode()
+
+
+class ProfileStore:
+    """Ring buffer trên đĩa: giữ `max_files` profile mới nhất."""
+
+    def __init__(self, directory: Path, max_files: int):
+        self.directory = Path(directory)
+        self.max_files = max_files
+
+    def new_id(self, method: str, path: str, mode: str) -> str:
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-")[:60] or "root"
+        return f"{int(time.time() * 1000)}_{method.lower()}_{slug}_{uuid.uuid4().hex[:8]}{PROFILE_MODES[mode]}"
+
+    def _files(self) -> List[Path]:
+        if not self.directory.exists():
+            return []
+        suffixes = set(PROFILE_MODES.values())
+        # Tên file bắt đầu bằng timestamp (ms) -> sort theo tên = sort theo thời gian
+        return sorted(
+            (p for p in self.directory.iterdir() if p.suffix in suffixes),
+            key=lambda p: p.name,
+        )
+
+    def save(self, profile_id: str, data: bytes):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / profile_id).write_bytes(data)
+        files = self._files()
+        for old in files[:-self.max_files]:
+            old.unlink(missing_ok=True)
+
+    def list(self) -> List[Dict]:
+        out = []
+        for p in reversed(self._files()):
+            st = p.stat()
+            out.append({"id": p.name, "size": st.st_size, "created_at": st.st_mtime})
+        return out
+
+    def path(self, profile_id: str) -> Optional[Path]:
+        if not _PROFILE_ID_RE.match(profile_id):
+            return None
+        p = self.directory / profile_id
+        return p if p.is_file() else None
+
+
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_MAX_FILES)
+
+
+def _requested_mode(scope) -> Optional[str]:
+    mode = None
+    api_key = None
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile":
+            mode = value.decode("latin-1").strip().lower()
+        elif name == b"x-api-key":
+            api_key = value
+    if mode is None:
+        return None
+    if mode in ("1", "true"):
+        mode = "sampled"
+    if mode not in PROFILE_MODES or not is_service_api_key(api_key):
+        return None
+    return mode
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        mode = _requested_mode(scope)
+        if mode is None:
+            return await self.app(scope, receive, send)
+
+        if mode == "deterministic" and not _deterministic_slot.acquire(blocking=False):
+            await send({
+                "type": "http.response.start",
+                "status": 409,
+                "headers": [(b"content-type", b"application/json"), (b"retry-after", b"5")],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"A deterministic profile is already running"}'})
+            return
+
+        profile_id = profile_store.new_id(scope["method"], scope["path"], mode)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        if mode == "deterministic":
+            try:
+                prof = cProfile.Profile()
+                prof.enable()
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    prof.disable()
+                await asyncio.to_thread(_save_cprofile, profile_id, prof)
+            finally:
+                _deterministic_slot.release()
+        else:
+            sampler = _StackSampler(PROFILE_SAMPLE_INTERVAL)
+            sampler.start()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                sampler.stop()
+                await asyncio.to_thread(profile_store.save, profile_id, sampler.dump())
+
+
+def _save_cprofile(profile_id: str, prof: cProfile.Profile):
+    # Cùng định dạng với Profile.dump_stats() -> đọc được bằng pstats/snakeviz
+    prof.create_stats()
+    profile_store.save(profile_id, marshal.dumps(prof.stats))
@@ -0,0 +1,208 @@
+# server/ratelimit.py
+"""
+Token-bucket rate limit + admission control cho các endpoint AI tốn tài nguyên.
+
+- Bucket theo principal mà require_auth trả về (role:sub).
+- Mỗi route có cost riêng (vd. classify_news: cost = số bài trong batch).
+- Hai priority class: `bot` (role api_bot) và `interactive` (user / anonymous),
+  mỗi class có rate, burst và giới hạn in-flight riêng.
+- Hết token -> 429, vượt in-flight -> 503; cả hai đều kèm Retry-After để
+  request bị loại ngay thay vì xếp hàng làm chậm các route khác (vd. /api/news).
+"""
+import math
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from fastapi import HTTPException
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "50000"))
+
+# Cost cho mỗi đơn vị công việc; route batch nhân với số item trong batch
+ROUTE_COSTS: Dict[str, float] = {
+    "classify_news": 0.5,
+    "fetch_and_classify_news": 0.2,
+    "analyze_news": 20.0,
+    "chatbot": 10.0,
+    "ingest_news": 1.0,
+    "export_news": 20.0,
+    "classify_job": 0.01,
+}
+
+
+class LimitClass:
+    __slots__ = ("name", "rate", "burst", "max_inflight")
+
+    def __init__(self, name: str, rate: float, burst: float, max_inflight: int):
+        self.name = name
+        self.rate = rate                # token/giây
+        self.burst = burst              # dung lượng bucket
+        self.max_inflight = max_inflight
+
+
+def _limit_class_from_env(name: str, rate: float, burst: float, max_inflight: int) -> LimitClass:
+    prefix = f"RATE_LIMIT_{name.upper()}_"
+    return LimitClass(
+        name,
+        rate=float(os.getenv(prefix + "RATE", rate)),
+        burst=float(os.getenv(prefix + "BURST", burst)),
+        max_inflight=int(os.getenv(prefix + "INFLIGHT", max_inflight)),
+    )
+
+
+LIMIT_CLASSES: Dict[str, LimitClass] = {
+    "bot": _limit_class_from_env("bot", rate=200.0, burst=2000.0, max_inflight=8),
+    "interactive": _limit_class_from_env("interactive", rate=10.0, burst=200.0, max_inflight=16),
+}
+
+
+def priority_class(principal: dict) -> str:
+    return "bot" if principal.get("role") == "api_bot" else "interactive"
+
+
+def principal_key(principal: dict) -> str:
+    return f"{principal.get('role') or 'anonymous'}:{principal.get('sub') or '-'}"
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class _Slot:
+    """Một slot in-flight đã giữ; release() chỉ có tác dụng lần đầu."""
+    __slots__ = ("limiter", "cls", "released", "__weakref__")
+
+    def __init__(self, limiter: "RateLimiter", cls: LimitClass):
+        self.limiter = limiter
+        self.cls = cls
+        self.released = False
+
+    def release(self):
+        with self.limiter._lock:
+            if self.released:
+                return
+            self.released = True
+            self.limiter._inflight[self.cls.name] -= 1
+
+
+class RateLimiter:
+    def __init__(self, classes: Dict[str, LimitClass], max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.classes = classes
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self._inflight: Dict[str, int] = {name: 0 for name in classes}
+        self._lock = threading.Lock()
+        self.shed = {"rate_limited": 0, "overloaded": 0}
+
+    def try_consume(self, key: str, cls: LimitClass, cost: float) -> float:
+        """Trừ `cost` token; trả 0 nếu được phép, ngược lại số giây cần chờ."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = _Bucket(cls.burst, now)
+                self._buckets[key] = bucket
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket.tokens = min(cls.burst, bucket.tokens + (now - bucket.updated) * cls.rate)
+                bucket.updated = now
+
+            # Batch lớn hơn burst: chỉ cho qua khi bucket đầy, phần vượt thành "nợ"
+            needed = min(cost, cls.burst)
+            if bucket.tokens >= needed:
+                bucket.tokens -= cost
+                return 0.0
+            return (needed - bucket.tokens) / cls.rate if cls.rate > 0 else 60.0
+
+    def _reserve(self, cls: LimitClass):
+        with self._lock:
+            if self._inflight[cls.name] >= cls.max_inflight:
+                self.shed["overloaded"] += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Server busy, please retry later",
+                    headers={"Retry-After": "1"},
+                )
+            self._inflight[cls.name] += 1
+
+    def _release(self, cls: LimitClass):
+        with self._lock:
+            self._inflight[cls.name] -= 1
+
+    def _charge(self, principal: dict, cls: LimitClass, route: str, units: int):
+        cost = ROUTE_COSTS.get(route, 1.0) * max(units, 1)
+        wait = self.try_consume(principal_key(principal), cls, cost)
+        if wait > 0:
+            with self._lock:
+                self.shed["rate_limited"] += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Rate limit exceeded",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+
+    @asynccontextmanager
+    async def admit(self, principal: dict, route: str, units: int = 0):
+        if not RATE_LIMIT_ENABLED:
+            yield
+            return
+
+        cls = self.classes[priority_class(principal)]
+        self._reserve(cls)
+        try:
+            self._charge(principal, cls, route, units)
+            yield
+        finally:
+            self._release(cls)
+
+    def admit_stream(self, principal: dict, route: str, body: AsyncIterator, units: int = 0) -> AsyncIterator:
+        """
+        Như admit() cho StreamingResponse: 429/503 được quyết định ngay (trước khi gửi
+        header); slot in-flight giữ từ đây và chuyển cho generator trả về, nhả khi stream
+        kết thúc -> export dài vẫn tính vào giới hạn in-flight.
+        """
+        if not RATE_LIMIT_ENABLED:
+            return body
+        cls = self.classes[priority_class(principal)]
+        self._reserve(cls)
+        slot = _Slot(self, cls)
+        try:
+            self._charge(principal, cls, route, units)
+        except BaseException:
+            slot.release()
+            raise
+        stream = self._hold(slot, body)
+        # Body không bao giờ được iterate (client ngắt trước khi response chạy): finally của
+        # generator không chạy -> nhả slot khi generator bị thu gom
+        weakref.finalize(stream, slot.release)
+        return stream
+
+    @staticmethod
+    async def _hold(slot: _Slot, body: AsyncIterator):
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            slot.release()
+            aclose = getattr(body, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def inflight(self, name: Optional[str] = None):
+        if name is not None:
+            return self._inflight.get(name, 0)
+        return dict(self._inflight)
+
+
+limiter = RateLimiter(LIMIT_CLASSES)
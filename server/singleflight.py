@@ -0,0 +1,87 @@
+# server/singleflight.py
+"""
+Gộp các request giống hệt nhau đang chạy đồng thời (singleflight).
+
+Request đầu tiên với một key khởi chạy công việc trong một task riêng; các
+request cùng key tới sau chỉ chờ kết quả của task đó. Công việc dùng một
+request "chia sẻ" (cùng app/header, Deadline riêng không giới hạn thời gian)
+nên không phụ thuộc vào việc request dẫn đầu bị huỷ. Khi mọi request chờ đều
+đã rời đi (client ngắt / hết deadline), task bị huỷ và Deadline chung bị
+cancel để bỏ luôn phần inference còn lại.
+
+Kết quả được dùng chung giữa các request -> không được sửa đổi sau khi trả về.
+"""
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from server.database import READ_YOUR_WRITES_HEADER
+from server.deadline import Deadline
+from server.metrics import SINGLEFLIGHT_CALLS
+
+
+class _SharedRequest:
+    """Bản sao tối thiểu của Request mà các service cần (app, headers, state)."""
+
+    def __init__(self, request, deadline: Deadline):
+        self.app = request.app
+        self.headers = request.headers
+        self.cookies = request.cookies
+        self.client = request.client
+        self.state = SimpleNamespace(
+            deadline=deadline,
+            read_primary=getattr(request.state, "read_primary", False),
+        )
+
+
+class _Call:
+    __slots__ = ("task", "deadline", "waiters")
+
+    def __init__(self, task: asyncio.Task, deadline: Deadline):
+        self.task = task
+        self.deadline = deadline
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def _forget(self, key: Hashable, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(self, key: Hashable, request, fn: Callable[[Any], Awaitable[Any]]):
+        """`fn(shared_request)` chỉ chạy một lần cho mỗi key đang in-flight."""
+        call = self._calls.get(key)
+        if call is None:
+            deadline = Deadline(None)
+            task = asyncio.ensure_future(fn(_SharedRequest(request, deadline)))
+            call = _Call(task, deadline)
+            self._calls[key] = call
+            task.add_done_callback(lambda _t, k=key, c=call: self._forget(k, c))
+            SINGLEFLIGHT_CALLS.labels(self.name, "leader").inc()
+        else:
+            SINGLEFLIGHT_CALLS.labels(self.name, "follower").inc()
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Không còn ai chờ -> huỷ công việc chung
+                call.deadline.cancel()
+                call.task.cancel()
+                self._forget(key, call)
+
+    def inflight(self) -> int:
+        return len(self._calls)
+
+
+def uses_primary(request) -> bool:
+    """Request đọc từ primary (read-your-writes) phải tách key khỏi request đọc replica."""
+    if getattr(request.state, "read_primary", False):
+        return True
+    return request.headers.get(READ_YOUR_WRITES_HEADER, "").lower() in ("1", "true")